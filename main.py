@@ -1,14 +1,32 @@
-from src.warehouse import WarehouseGenerator
-from src.obstacle_avoid import Obstacle_Avoidance
-
-def main():
-    warehouse_simulation = WarehouseGenerator()
-
-    rl_agent = Obstacle_Avoidance(warehouse_simulation,warehouse_simulation.robots,warehouse_simulation.order_allocator)
-    rl_agent.train(episodes=100, max_steps=1000, num_orders_per_episode=2)
-    rl_agent.save_q_tables()
-    
-    warehouse_simulation.run(use_rl=True, rl_agent=rl_agent)
-
-if __name__ == "__main__":
-    main()
+import argparse
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+
+def main():
+    parser = argparse.ArgumentParser(description="AI-powered retail warehouse robotic simulation")
+    parser.add_argument('--headless', action='store_true', help="run without a display for --ticks ticks")
+    parser.add_argument('--ticks', type=int, default=5000)
+    parser.add_argument('--episodes', type=int, default=100, help="RL training episodes, 0 to skip training")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--record', help="write a trace of the run to this file")
+    parser.add_argument('--plan-budget-ms', type=float, help="planning time per tick; searches degrade instead of overrunning it")
+    args = parser.parse_args()
+
+    warehouse_simulation = WarehouseGenerator(seed=args.seed)
+    warehouse_simulation.planning_budget_ms = args.plan_budget_ms
+
+    rl_agent = None
+    if args.episodes:
+        rl_agent = Obstacle_Avoidance(warehouse_simulation,warehouse_simulation.robots,warehouse_simulation.order_allocator)
+        rl_agent.train(episodes=args.episodes, max_steps=1000, num_orders_per_episode=2)
+        rl_agent.save_q_tables()
+        rl_agent.freeze_policy()
+
+    if args.headless:
+        summary = warehouse_simulation.run_headless(args.ticks, use_rl=rl_agent is not None, rl_agent=rl_agent, record_file=args.record)
+        print(summary)
+    else:
+        warehouse_simulation.run(use_rl=rl_agent is not None, rl_agent=rl_agent, record_file=args.record)
+
+if __name__ == "__main__":
+    main()
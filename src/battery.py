@@ -0,0 +1,142 @@
+import math
+import numpy as np
+
+class Battery_Model:
+    # Charge levels for the whole fleet live in one array indexed by robot position in
+    # warehouse.robots. Driving drain is computed once per tick from the change in positions and
+    # docked robots are topped up with a mask, so bookkeeping stays a few array ops per tick.
+    def __init__(self, warehouse, capacity=1000.0, drain_per_px=0.05, drain_per_pick=1.0, charge_rate=1.0,
+                 low_threshold=0.2, reserve=0.1, resume_threshold=0.95):
+        self.warehouse = warehouse
+        self.capacity = capacity
+        self.drain_per_px = drain_per_px
+        self.drain_per_pick = drain_per_pick
+        self.charge_rate = charge_rate  # Per tick while docked
+        self.low_threshold = low_threshold  # Idle robots below this fraction go and charge
+        self.reserve = reserve  # Fraction that must be left after an order's estimated energy
+        self.resume_threshold = resume_threshold
+        self.levels = np.zeros(0)
+        self.last_positions = np.zeros((0, 2))
+        self.docked = np.zeros(0, dtype=bool)
+        self.charger_queues = [[] for _ in warehouse.chargers]
+        self.wait_start = {}
+        self.approaching = set()
+
+    def sync(self, robots):
+        # New robots join fully charged; removed robots drop off the end
+        count = len(robots)
+        if count == len(self.levels):
+            return
+        if count < len(self.levels):
+            self.levels = self.levels[:count]
+            self.last_positions = self.last_positions[:count]
+            self.docked = self.docked[:count]
+            return
+        added = robots[len(self.levels):]
+        self.levels = np.concatenate([self.levels, np.full(len(added), self.capacity)])
+        self.last_positions = np.concatenate([self.last_positions, np.array([robot.position for robot in added], dtype=float).reshape(-1, 2)])
+        self.docked = np.concatenate([self.docked, np.zeros(len(added), dtype=bool)])
+
+    def tick(self, positions):
+        self.sync(self.warehouse.robots)
+        if not len(positions):
+            return
+        moved = np.hypot(*(positions - self.last_positions).T)
+        self.levels -= moved * self.drain_per_px
+        self.levels[self.docked] += self.charge_rate
+        np.clip(self.levels, 0.0, self.capacity, out=self.levels)
+        self.last_positions = positions
+        self.warehouse.metrics.set('fleet_charge_mean', float(self.levels.mean() / self.capacity))
+        self.warehouse.metrics.set('robots_charging', int(self.docked.sum()))
+
+    def index(self, robot):
+        return robot.id - 1
+
+    def level(self, robot):
+        self.sync(self.warehouse.robots)
+        return self.levels[self.index(robot)]
+
+    def is_empty(self, robot):
+        return self.level(robot) <= 0.0
+
+    def pick(self, robot, count=1):
+        self.sync(self.warehouse.robots)
+        i = self.index(robot)
+        self.levels[i] = max(0.0, self.levels[i] - count * self.drain_per_pick)
+
+    def order_energy(self, robot, order):
+        # Nearest-neighbour tour from the checkout side through the order's slots, plus the drive
+        # there from the robot's position and on to the nearest charger afterwards
+        slotting = self.warehouse.slotting
+        slot_distances = slotting.slot_distances()
+        slots = {self.warehouse.products[item] for item in order['items'] if item in self.warehouse.products}
+        slots = [slot for slot in slots if slot in slot_distances]
+        tour = slotting.tour_estimate(slots, slot_distances)
+        x, y = robot.position
+        charger = min(self.charger_fronts(), key=lambda front: math.dist(front, (x, y)), default=(x, y))
+        approach = math.dist((x, y), charger)
+        return (tour + 2 * approach) * self.drain_per_px + len(order['items']) * self.drain_per_pick
+
+    def should_charge(self, robot, order=None):
+        level = self.level(robot)
+        if not self.charger_queues:
+            return False
+        if order is None:
+            return level < self.low_threshold * self.capacity
+        if level >= self.resume_threshold * self.capacity:
+            return False  # Charging would not get it any fuller
+        return level - self.order_energy(robot, order) < self.reserve * self.capacity
+
+    def charger_fronts(self):
+        return [(charger.centerx, charger.bottom + 15) for charger in self.warehouse.chargers]
+
+    def queue_position(self, charger, rank):
+        # The docked robot sits in front of the charger; waiting robots line up beside it
+        x, y = self.charger_fronts()[charger]
+        return (x + rank * 25, y)
+
+    def send_to_charger(self, robot):
+        fronts = self.charger_fronts()
+        charger = min(range(len(fronts)), key=lambda c: (len(self.charger_queues[c]), math.dist(fronts[c], robot.position)))
+        queue = self.charger_queues[charger]
+        queue.append(robot.id)
+        robot.charger = charger
+        robot.state = 'charging'
+        robot.current_path = robot.route_to(self.queue_position(charger, len(queue) - 1))
+        robot.target_index = 0
+        self.wait_start[robot.id] = self.warehouse.tick
+        self.warehouse.metrics.inc('charge_trips')
+
+    def update_charging(self, robot):
+        # Called once the robot has reached its spot in the queue
+        queue = self.charger_queues[robot.charger]
+        i = self.index(robot)
+        if queue[0] != robot.id:
+            return
+        front = self.queue_position(robot.charger, 0)
+        if not self.docked[i]:
+            # Move up to the front once; the planner may stop short of it next to the charger
+            if robot.id not in self.approaching and math.dist(robot.position, front) > self.warehouse.grid_size:
+                self.approaching.add(robot.id)
+                robot.current_path = robot.route_to(front)
+                robot.target_index = 0
+                return
+            self.approaching.discard(robot.id)
+            self.docked[i] = True
+            self.warehouse.metrics.observe('charger_wait_ticks', self.warehouse.tick - self.wait_start.pop(robot.id, self.warehouse.tick))
+        if self.levels[i] >= self.resume_threshold * self.capacity:
+            self.docked[i] = False
+            queue.pop(0)
+            robot.charger = None
+            robot.state = 'idle'
+            robot.current_path = []
+            robot.target_index = 0
+
+    def reset(self):
+        self.levels = np.zeros(0)
+        self.last_positions = np.zeros((0, 2))
+        self.docked = np.zeros(0, dtype=bool)
+        self.charger_queues = [[] for _ in self.warehouse.chargers]
+        self.wait_start = {}
+        self.approaching = set()
+        self.sync(self.warehouse.robots)
@@ -0,0 +1,147 @@
+import os
+import time
+from collections import namedtuple
+from src.pathfinding import Pathfinding
+from src.tsp_solver import TSP_Solver
+from src.robot import plan_route
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+Robot_Position = namedtuple('Robot_Position', 'id position')  # All the planners need to know about other robots
+
+class Planning_World:
+    # Read-only copy of what path planning reads from the warehouse: the navigation grid and the
+    # planner's cost settings. Small enough to ship with each job, and workers keep one planner per
+    # world key so their path caches carry over between bursts on an unchanged floor. With a
+    # Shared_World only its handle travels and workers attach to the grids instead.
+    def __init__(self, warehouse, key, shared_world=None):
+        pathfinding = warehouse.pathfinding
+        self.key = key
+        self.grid_size = warehouse.grid_size
+        self.grid_width = warehouse.grid_width
+        self.grid_height = warehouse.grid_height
+        self.grid_version = warehouse.grid_version
+        self.world_handle = None if shared_world is None else shared_world.handle
+        self.navigation_grid = warehouse.navigation_grid.copy() if shared_world is None else None
+        self.robot_radius = pathfinding.robot_radius
+        self.clearance_weight = pathfinding.clearance_weight
+        self.max_clearance = pathfinding.max_clearance
+        self.traffic_cost = None if pathfinding.traffic_cost is None else pathfinding.traffic_cost.copy()
+        self.traffic_epoch = pathfinding.traffic_epoch
+
+    def planners(self, shared_world=None):
+        pathfinding = Pathfinding(shared_world or self, self.robot_radius, self.clearance_weight, self.max_clearance)
+        if shared_world is not None:
+            pathfinding.cspace_cache[(shared_world.robot_radius, shared_world.grid_version)] = shared_world.cspace_grid
+        pathfinding.traffic_cost = self.traffic_cost
+        pathfinding.traffic_epoch = self.traffic_epoch
+        return pathfinding, TSP_Solver(pathfinding)
+
+_worker_planners = {}
+_worker_world = {}
+
+def _attached_world(handle):
+    if handle is None:
+        return None
+    from src.shared_world import Shared_World
+    if handle.key not in _worker_world:
+        for world in _worker_world.values():
+            world.close()
+        _worker_world.clear()
+        _worker_world[handle.key] = Shared_World.attach(handle)
+    return _worker_world[handle.key]
+
+def _plan_in_worker(world, robot_id, position, locations, robots, deadline=None):
+    if world.key not in _worker_planners:
+        _worker_planners.clear()
+        _worker_planners[world.key] = world.planners(_attached_world(world.world_handle))
+    pathfinding, tsp_solver = _worker_planners[world.key]
+    pathfinding.drain_tiers()
+    tsp_solver.drain_tiers()
+    route = plan_route(pathfinding, tsp_solver, robot_id, position, locations, robots, deadline=deadline)
+    return route, pathfinding.drain_tiers(), tsp_solver.drain_tiers()
+
+class Bulk_Planner:
+    # Plans the tours and paths for a burst of newly assigned orders together. Without a pool (the
+    # default) or for bursts smaller than min_batch each order is planned inline as before; with
+    # start_pool() the orders fan out to worker processes and the results are applied in assignment
+    # order, so the outcome does not depend on which worker finishes first.
+    def __init__(self, warehouse, min_batch=2):
+        self.warehouse = warehouse
+        self.min_batch = min_batch
+        self.executor = None
+        self.serial = 0
+        self.world = None
+        self.use_shared_memory = False
+        self.shared_world = None
+
+    def start_pool(self, workers=None, context='spawn', use_shared_memory=True):
+        import multiprocessing  # Pool support is only loaded by the runs that use it
+        from concurrent.futures import ProcessPoolExecutor
+        self.close()
+        self.use_shared_memory = use_shared_memory
+        workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(context))
+        for future in [self.executor.submit(os.getpid) for _ in range(workers)]:
+            future.result()  # Pay the worker start-up now rather than on the first burst
+        logger.info("Bulk planner started with %d workers", workers)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.release_shared_world()
+
+    def release_shared_world(self):
+        if self.shared_world is not None:
+            self.shared_world.close()
+            self.shared_world = None
+
+    def reset(self):
+        # The floor may have changed in ways grid_version alone does not show (a reset or restore)
+        self.serial += 1
+        self.world = None
+
+    def current_world(self):
+        pathfinding = self.warehouse.pathfinding
+        key = (self.serial, self.warehouse.grid_version, self.warehouse.slotting_version, pathfinding.traffic_epoch,
+               pathfinding.clearance_weight)
+        if self.world is None or self.world.key != key:
+            shared_world = None
+            if self.use_shared_memory:
+                shared_key = key[:3]  # Floor and slotting; traffic and weights travel with each job
+                if self.shared_world is None or self.shared_world.handle.key != shared_key:
+                    from src.shared_world import Shared_World
+                    self.release_shared_world()
+                    self.shared_world = Shared_World.create(self.warehouse, shared_key)
+                shared_world = self.shared_world
+            self.world = Planning_World(self.warehouse, key, shared_world)
+        return self.world
+
+    def start_orders(self, assignments, robots=None):
+        jobs = [(robot, robot.begin_order(order)) for robot, order in assignments]
+        if self.executor is None or len(jobs) < self.min_batch:
+            for robot, locations in jobs:
+                robot.plan_pick_route(locations, robots)
+            return
+        start = time.perf_counter()
+        world = self.current_world()
+        others = None if robots is None else [Robot_Position(robot.id, robot.position) for robot in robots]
+        deadline = self.warehouse.plan_deadline  # perf_counter is system-wide, so workers can check it too
+        futures = [self.executor.submit(_plan_in_worker, world, robot.id, robot.position, locations, others, deadline)
+                   for robot, locations in jobs]
+        for (robot, locations), future in zip(jobs, futures):
+            try:
+                route, path_tiers, tsp_tiers = future.result()
+                robot.apply_pick_route(*route)
+                for counts, tiers in ((self.warehouse.pathfinding.tier_counts, path_tiers), (self.warehouse.tsp_solver.tier_counts, tsp_tiers)):
+                    for tier, count in tiers.items():
+                        counts[tier] += count
+            except Exception as e:
+                logger.warning("Bulk planning failed for robot %s, planning inline: %s", robot.id, e)
+                robot.plan_pick_route(locations, robots)
+        metrics = self.warehouse.metrics
+        metrics.inc('bulk_plan_batches')
+        metrics.observe('bulk_plan_orders', len(jobs))
+        metrics.observe('bulk_plan_ms', (time.perf_counter() - start) * 1000)
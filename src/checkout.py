@@ -0,0 +1,108 @@
+import math
+
+class Checkout_Scheduler:
+    # Each checkout serves one robot at a time at its dock and holds a short line of queue slots
+    # beside it. Robots book a service window when they finish picking: the checkout with the
+    # earliest projected start among those the order allows, given travel time and the windows
+    # already booked there. Robots beyond the queue slots wait at holding spots on the far side of
+    # the dock until a slot frees.
+    def __init__(self, warehouse, service_ticks=90, queue_slots=3, slot_spacing=25, speed=2.0):
+        self.warehouse = warehouse
+        self.service_ticks = service_ticks
+        self.queue_slots = queue_slots
+        self.slot_spacing = slot_spacing
+        self.speed = speed  # Pixels per tick, for arrival estimates
+        self.reset()
+
+    def reset(self):
+        count = len(self.warehouse.checkouts)
+        self.lines = [[] for _ in range(count)]  # Robot ids in booking order; the first is served next
+        self.booked_until = [0] * count  # End tick of the last booked window per checkout
+        self.bookings = {}  # Robot id -> (checkout, booked tick, planned start)
+        self.service_end = {}  # Robot id -> tick its service finishes
+        self.ranks = {}  # Robot id -> line position its current path leads to
+
+    def dock_position(self, checkout):
+        rect = self.warehouse.checkouts[checkout]
+        return (rect.centerx, rect.centery - 40)
+
+    def slot_position(self, checkout, rank):
+        x, y = self.dock_position(checkout)
+        return (x - rank * self.slot_spacing, y)
+
+    def hold_position(self, checkout, rank):
+        x, y = self.dock_position(checkout)
+        return (x + (rank - self.queue_slots) * self.slot_spacing, y)
+
+    def book(self, robot, order):
+        tick = self.warehouse.tick
+        allowed = order.get('checkouts') or range(len(self.lines))
+        best = None
+        for checkout in allowed:
+            eta = tick + math.dist(robot.position, self.dock_position(checkout)) * 1.3 / self.speed
+            start = max(eta, self.booked_until[checkout])
+            if best is None or start < best[0]:
+                best = (start, checkout)
+        start, checkout = best
+        self.booked_until[checkout] = start + self.service_ticks
+        self.lines[checkout].append(robot.id)
+        self.bookings[robot.id] = (checkout, tick, start)
+        order['checkout'] = checkout
+        robot.assigned_checkout = checkout
+        robot.current_path = []
+        robot.target_index = 0
+        self.publish(checkout)
+        self.route(robot)
+        return checkout
+
+    def route(self, robot):
+        # Send the robot to its current spot in line, or to a holding spot if the line is full
+        checkout = robot.assigned_checkout
+        rank = self.lines[checkout].index(robot.id)
+        if self.ranks.get(robot.id) == rank:
+            return
+        self.ranks[robot.id] = rank
+        spot = self.slot_position(checkout, rank) if rank <= self.queue_slots else self.hold_position(checkout, rank)
+        robot.current_path = robot.route_to(spot)
+        robot.target_index = 0
+
+    def update(self, robot):
+        # Called each tick once the robot's path has run out; True when service has finished
+        checkout = robot.assigned_checkout
+        line = self.lines[checkout]
+        tick = self.warehouse.tick
+        if line[0] != robot.id:
+            self.route(robot)
+            return False
+        if robot.id not in self.service_end:
+            if self.ranks.get(robot.id) != 0:
+                self.route(robot)
+                return False
+            _, booked, planned = self.bookings[robot.id]
+            self.service_end[robot.id] = tick + self.service_ticks
+            metrics = self.warehouse.metrics
+            metrics.observe('checkout_wait_ticks', tick - booked)
+            metrics.observe('checkout_window_slip_ticks', max(0, tick - planned))
+            return False
+        if tick < self.service_end[robot.id]:
+            return False
+        line.pop(0)
+        del self.service_end[robot.id]
+        del self.bookings[robot.id]
+        self.ranks.pop(robot.id, None)
+        # Windows were estimates; never plan ahead of what the line actually needs
+        self.booked_until[checkout] = max(self.booked_until[checkout], tick) if line else tick
+        self.warehouse.metrics.observe('checkout_service_ticks', self.service_ticks)
+        self.warehouse.metrics.inc(f'checkout_{checkout + 1}_served')
+        self.publish(checkout)
+        return True
+
+    def in_service(self, robot):
+        return robot.id in self.service_end
+
+    def waiting(self, robot):
+        # Booked and standing at its spot in line, at the dock or at a holding spot
+        return robot.id in self.bookings and robot.target_index >= len(robot.current_path)
+
+    def publish(self, checkout):
+        self.warehouse.metrics.set(f'checkout_{checkout + 1}_queue', len(self.lines[checkout]))
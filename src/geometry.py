@@ -0,0 +1,96 @@
+class Rect:
+    # Integer axis-aligned rectangle with the part of the pygame.Rect interface the simulation uses,
+    # so layout, pathfinding and training never need pygame. Coordinates truncate to ints like
+    # pygame's, and it is a 4-sequence, so pygame.draw and pygame.Rect accept it when rendering.
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, *args):
+        if len(args) == 1:
+            args = tuple(args[0])
+        if len(args) == 2:
+            args = (*args[0], *args[1])
+        if len(args) != 4:
+            raise TypeError("Rect takes (x, y, width, height), ((x, y), (width, height)) or a rect-like sequence")
+        self.x, self.y, self.width, self.height = (int(value) for value in args)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.width, self.height))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.width, self.height)[index]
+
+    def __eq__(self, other):
+        try:
+            return tuple(self) == tuple(other) and len(other) == 4
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None  # Mutable, like pygame.Rect
+
+    def __repr__(self):
+        return f"<rect({self.x}, {self.y}, {self.width}, {self.height})>"
+
+    def __getstate__(self):
+        return tuple(self)
+
+    def __setstate__(self, state):
+        self.x, self.y, self.width, self.height = state
+
+    def copy(self):
+        return Rect(self.x, self.y, self.width, self.height)
+
+    @property
+    def left(self):
+        return self.x
+
+    @property
+    def top(self):
+        return self.y
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    @property
+    def w(self):
+        return self.width
+
+    @property
+    def h(self):
+        return self.height
+
+    @property
+    def centerx(self):
+        return self.x + self.width // 2
+
+    @property
+    def centery(self):
+        return self.y + self.height // 2
+
+    @property
+    def center(self):
+        return (self.centerx, self.centery)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def collidepoint(self, x, y=None):
+        if y is None:
+            x, y = x
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def colliderect(self, other):
+        x, y, width, height = other
+        return self.x < x + width and x < self.x + self.width and self.y < y + height and y < self.y + self.height
+
+    def inflate(self, dx, dy):
+        dx, dy = int(dx), int(dy)
+        return Rect(self.x - dx // 2, self.y - dy // 2, self.width + dx, self.height + dy)
@@ -0,0 +1,37 @@
+import logging
+import time
+
+class Rate_Limit_Filter(logging.Filter):
+    # Token bucket per message template: bursts of the same event (e.g. item picks across a large
+    # fleet) are capped at `rate` records per second; suppressed counts are reported on the next one
+    def __init__(self, rate=5.0, burst=20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        key = record.msg
+        tokens, last, suppressed = self.buckets.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now, suppressed + 1)
+            return False
+        self.buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+def get_logger(name, level=logging.INFO, rate=5.0, burst=20):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s', '%H:%M:%S'))
+        handler.addFilter(Rate_Limit_Filter(rate, burst))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,216 @@
+import csv
+import json
+import os
+import threading
+import time
+import numpy as np
+
+class Counter:
+    def __init__(self, name, help_text=''):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    def __init__(self, name, help_text=''):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+class Streaming_Histogram:
+    # Cumulative counts over fixed bucket bounds for the whole run, plus a fixed-size ring of the
+    # most recent observations for windowed mean and quantiles. Memory never grows with run length.
+    def __init__(self, name, buckets, window=1024, help_text=''):
+        self.name = name
+        self.help_text = help_text
+        self.bounds = np.asarray(buckets, dtype=float)
+        self.bucket_counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.window = np.zeros(window)
+        self.window_size = 0
+        self.window_position = 0
+
+    def observe(self, value):
+        self.bucket_counts[np.searchsorted(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.window[self.window_position] = value
+        self.window_position = (self.window_position + 1) % len(self.window)
+        self.window_size = min(self.window_size + 1, len(self.window))
+
+    def summary(self):
+        recent = self.window[:self.window_size]
+        if not len(recent):
+            return {'count': self.count, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+        return {'count': self.count, 'mean': float(recent.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.export_interval = None
+        self.json_path = None
+        self.csv_path = None
+        self.csv_fields = None  # Header of the block being appended to, once known
+        self.last_export_tick = 0
+        self.server = None
+        self.last_collisions = 0
+        self.rate_start = (0, 0)
+        self.histogram('order_cycle_ticks', help_text='Ticks from order creation to checkout')
+        self.histogram('order_wait_ticks', help_text='Ticks an order waited before assignment')
+        self.histogram('repaths_per_order', (0, 1, 2, 5, 10, 20, 50), help_text='Path replans per completed order')
+        self.histogram('blocked_ticks_per_order', help_text='Ticks a robot spent blocked per completed order')
+        self.histogram('blocked_robots_per_tick', (0, 1, 2, 4, 8, 16, 32), help_text='Robots blocked by another robot each tick')
+
+    def counter(self, name, help_text=''):
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help_text)
+        return self.counters[name]
+
+    def gauge(self, name, help_text=''):
+        if name not in self.gauges:
+            self.gauges[name] = Gauge(name, help_text)
+        return self.gauges[name]
+
+    def histogram(self, name, buckets=(1, 5, 10, 50, 100, 500, 1000, 5000), window=1024, help_text=''):
+        if name not in self.histograms:
+            self.histograms[name] = Streaming_Histogram(name, buckets, window, help_text)
+        return self.histograms[name]
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counter(name).inc(amount)
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histogram(name).observe(value)
+
+    def set(self, name, value):
+        with self.lock:
+            self.gauge(name).set(value)
+
+    def order_completed(self, order, tick):
+        self.inc('orders_completed')
+        self.observe('order_cycle_ticks', tick - order.get('created_tick', tick))
+        self.observe('order_wait_ticks', order.get('assigned_tick', tick) - order.get('created_tick', tick))
+        self.observe('repaths_per_order', order.get('repaths', 0))
+        self.observe('blocked_ticks_per_order', order.get('blocked_ticks', 0))
+
+    def record_tick(self, warehouse, rate_window=600):
+        robots = warehouse.robots
+        if robots:
+            busy = sum(robot.state != 'idle' for robot in robots)
+            self.set('robot_utilization', busy / len(robots))
+        collisions = self.counter('collisions').value
+        self.observe('blocked_robots_per_tick', collisions - self.last_collisions)
+        self.last_collisions = collisions
+        # How often planning had to settle for a degraded result under a deadline
+        for prefix, solver in (('path', warehouse.pathfinding), ('tsp', warehouse.tsp_solver)):
+            for tier, count in solver.drain_tiers().items():
+                self.inc(f'{prefix}_tier_{tier}', count)
+        # Pick rate over a sliding span of ticks, reported as picks per 1000 ticks
+        picks = self.counter('items_picked').value
+        if warehouse.tick - self.rate_start[0] >= rate_window:
+            self.set('pick_rate_per_1k_ticks', 1000 * (picks - self.rate_start[1]) / (warehouse.tick - self.rate_start[0]))
+            self.rate_start = (warehouse.tick, picks)
+        self.maybe_export(warehouse.tick)
+
+    def snapshot(self):
+        with self.lock:
+            data = {'timestamp': time.time()}
+            data.update({name: counter.value for name, counter in self.counters.items()})
+            data.update({name: gauge.value for name, gauge in self.gauges.items()})
+            for name, histogram in self.histograms.items():
+                for key, value in histogram.summary().items():
+                    data[f"{name}_{key}"] = value
+            return data
+
+    def configure_export(self, interval_ticks=600, json_path=None, csv_path=None):
+        self.export_interval = interval_ticks
+        self.json_path = json_path
+        self.csv_path = csv_path
+        self.csv_fields = None
+
+    def restart_ticks(self):
+        # The warehouse tick went back to 0 (an R reset) while the metrics carry on; re-base the
+        # export interval and pick-rate window on the new clock so neither stalls until it catches up
+        self.last_export_tick = 0
+        self.rate_start = (0, self.counter('items_picked').value)
+
+    def maybe_export(self, tick):
+        if not self.export_interval or tick - self.last_export_tick < self.export_interval:
+            return
+        self.last_export_tick = tick
+        data = self.snapshot()
+        data['tick'] = tick
+        if self.json_path:
+            with open(self.json_path, 'w') as f:
+                json.dump(data, f, indent=2)
+        if self.csv_path:
+            # New metrics appearing mid-run start a fresh header block rather than misaligning columns.
+            # The file is only read for its last header once, when appending to one from an earlier run.
+            fields = sorted(data)
+            if self.csv_fields is None and os.path.exists(self.csv_path):
+                with open(self.csv_path, 'r', newline='') as f:
+                    for row in csv.reader(f):
+                        if row and row[0] == 'fields':
+                            self.csv_fields = row[1:]
+            with open(self.csv_path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if fields != self.csv_fields:
+                    writer.writerow(['fields'] + fields)
+                    self.csv_fields = fields
+                writer.writerow(['values'] + [data[field] for field in fields])
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            for name, counter in self.counters.items():
+                lines += [f"# HELP {name} {counter.help_text or name}", f"# TYPE {name} counter", f"{name} {counter.value}"]
+            for name, gauge in self.gauges.items():
+                lines += [f"# HELP {name} {gauge.help_text or name}", f"# TYPE {name} gauge", f"{name} {gauge.value}"]
+            for name, histogram in self.histograms.items():
+                lines += [f"# HELP {name} {histogram.help_text or name}", f"# TYPE {name} histogram"]
+                cumulative = np.cumsum(histogram.bucket_counts)
+                for bound, count in zip(histogram.bounds, cumulative):
+                    lines.append(f'{name}_bucket{{le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum {histogram.total}")
+                lines.append(f"{name}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only runs with the endpoint pay for it
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -1,18 +1,27 @@
 import math
 import random
-from collections import defaultdict
 import ast
 import time
+import numpy as np
+from collections import defaultdict, deque
+from src.q_table import Q_Table, Shared_Q_Table, Robot_Q_Table
+from src.tile_coding import Tile_Coded_Q, Tile_Greedy_Policy
+from src.replay_buffer import Replay_Buffer, Prioritized_Replay_Buffer
+from src.vector_env import Batched_Obstacle_Avoidance
+from src.logger import get_logger
+
+logger = get_logger(__name__)
 
 class Obstacle_Avoidance:
-    def __init__(self, warehouse_env, robot, order_alloc, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.3):
+    def __init__(self, warehouse_env, robot, order_alloc, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.3,
+                 shared_q=False, robot_offsets=False, value_backend='table'):
         self.warehouse = warehouse_env
         self.robot = robot
         self.order_alloc = order_alloc
         self.alpha = learning_rate      
         self.gamma = discount_factor     
         self.epsilon = exploration_rate  
-        self.q_table = defaultdict(lambda: defaultdict(float))  
+        self.q_table = Q_Table(8)  
         self.grid_size = 10  
         
         self.actions = [
@@ -37,35 +46,150 @@ class Obstacle_Avoidance:
         }
         self.robot_rewards = {i+1: 0 for i in range(len(self.warehouse.robots))}
 
-        self.episode_rewards = []
-        self.collision_counts = []
-        self.items_collected = []
-        self.orders_completed = []
-        self.robot_q_tables = {i+1: defaultdict(lambda: defaultdict(float)) for i in range(len(self.warehouse.robots))}
+        # Shared mode: every robot learns into one table (plus optional small per-robot corrections)
+        # instead of relearning the same aisles in a table of its own
+        self.shared_q_mode = shared_q
+        self.robot_offsets = robot_offsets
+        self.shared_q = None
+        # 'table' keeps one Q row per distinct state; 'tiles' is a fixed-size linear model over tile-coded features
+        if value_backend not in ('table', 'tiles'):
+            raise ValueError(f"Unknown value backend {value_backend!r}")
+        if value_backend == 'tiles' and robot_offsets:
+            raise ValueError("Per-robot offsets need the 'table' backend")
+        self.value_backend = value_backend
+
+        self.history_window = 1000  # Episode history is capped; long runs keep only the latest episodes
+        self.episode_rewards = deque(maxlen=self.history_window)
+        self.collision_counts = deque(maxlen=self.history_window)
+        self.items_collected = deque(maxlen=self.history_window)
+        self.orders_completed = deque(maxlen=self.history_window)
+        self.robot_q_tables = self.create_q_tables()
+        self.build_static_state_table()
+        self.warehouse.layout_listeners.append(self.on_layout_change)
+
+        self.replay = None
+        self.replay_batch_size = 32
+        self.replay_interval = 4
+        self.pending_replays = 0
+
+        self.inference_mode = False
+        self.greedy_policy = {}
+        self.decision_budget = 0.0005  # Seconds per robot decision
+        self.decision_times = deque(maxlen=1000)
+        self.inference_stats = {'decisions': 0, 'fallbacks': 0, 'overruns': 0, 'budget_skips': 0}
+
+    def enable_replay(self, capacity=100000, batch_size=32, replay_interval=4, prioritized=False, alpha=0.6, beta=0.4):
+        # Every transition still gets its online update; in addition one batch of stored
+        # transitions is replayed for every replay_interval new ones
+        if prioritized:
+            self.replay = Prioritized_Replay_Buffer(capacity, alpha, beta)
+        else:
+            self.replay = Replay_Buffer(capacity)
+        self.replay_batch_size = batch_size
+        self.replay_interval = replay_interval
+        self.pending_replays = 0
+
+    def store_transitions(self, robot_ids, state_ids, actions, rewards, next_state_ids):
+        if self.replay is None:
+            return
+        self.replay.add_batch(robot_ids, state_ids, actions, rewards, next_state_ids)
+        self.pending_replays += len(state_ids)
+        while self.pending_replays >= self.replay_interval and len(self.replay) >= self.replay_batch_size:
+            self.pending_replays -= self.replay_interval
+            self.replay_batch()
+
+    def replay_batch(self):
+        replay = self.replay
+        indices, weights = replay.sample(self.replay_batch_size)
+        robot_ids = replay.robot_ids[indices]
+        td_errors = np.zeros(len(indices))
+        for robot_id in np.unique(robot_ids):
+            rows = robot_ids == robot_id
+            batch = indices[rows]
+            td_errors[rows] = self.robot_q_tables[int(robot_id)].update(
+                replay.states[batch], replay.actions[batch], replay.rewards[batch],
+                replay.next_states[batch], self.alpha, self.gamma, weights[rows])
+        replay.update_priorities(indices, td_errors)
+
+    def build_static_state_table(self, rows=None):
+        # Obstacles only move through live layout edits, so the obstacle part of the state is looked
+        # up per navigation cell: the coarse cells of the first three obstacles within 100 px of the
+        # cell centre, already sorted. Also records which obstacle rects touch each cell. `rows`
+        # limits the refresh to a band of grid rows after an edit.
+        warehouse = self.warehouse
+        size = warehouse.grid_size
+        centers = np.array([obstacle.center for obstacle in warehouse.obstacles], dtype=float).reshape(-1, 2)
+        obstacle_cells = (centers / [warehouse.width, warehouse.height] * self.grid_size).astype(np.int64)
+        if rows is None:
+            self.static_obstacle_table = np.zeros((warehouse.grid_height, warehouse.grid_width, 3, 2), dtype=np.int64)
+            self.static_obstacle_counts = np.zeros((warehouse.grid_height, warehouse.grid_width), dtype=np.int64)
+            rows = range(warehouse.grid_height)
+        table = self.static_obstacle_table
+        counts = self.static_obstacle_counts
+        table[rows.start:rows.stop] = 0
+        counts[rows.start:rows.stop] = 0
+        cell_x = np.arange(warehouse.grid_width) * size + size / 2
+        for gy in rows:
+            if not len(centers):
+                break
+            dx = cell_x[:, None] - centers[:, 0]
+            dy = gy * size + size / 2 - centers[:, 1]
+            within = dx * dx + dy * dy < 100 ** 2
+            order = np.argsort(~within, axis=1, kind='stable')[:, :3]
+            selected = np.take_along_axis(within, order, axis=1)
+            for gx in np.flatnonzero(selected[:, 0]):
+                picked = sorted(map(tuple, obstacle_cells[order[gx][selected[gx]]].tolist()))
+                counts[gy, gx] = len(picked)
+                table[gy, gx, :len(picked)] = picked
+
+        self.obstacles_by_cell = defaultdict(list)
+        for obstacle in warehouse.obstacles:
+            rows, cols = warehouse.rect_cells(obstacle)
+            for gy in range(rows.start, rows.stop):
+                for gx in range(cols.start, cols.stop):
+                    self.obstacles_by_cell[(gy, gx)].append(obstacle)
+
+    def on_layout_change(self, rect):
+        if rect is None:
+            self.build_static_state_table()
+            return
+        size = self.warehouse.grid_size
+        # Obstacle centres within 100 px of a cell centre affect its row, so pad the band by that
+        first = max(0, int((rect.top - 100) // size))
+        last = min(self.warehouse.grid_height, int((rect.bottom + 100) // size) + 1)
+        self.build_static_state_table(range(first, last))
+
+    def hits_obstacle(self, x, y):
+        cell = (int(y // self.warehouse.grid_size), int(x // self.warehouse.grid_size))
+        return any(obstacle.collidepoint(x, y) for obstacle in self.obstacles_by_cell.get(cell, ()))
+
+    def create_q_tables(self):
+        if self.value_backend == 'tiles':
+            if self.shared_q_mode:
+                self.shared_q = Tile_Coded_Q(len(self.actions))
+                return {robot.id: self.shared_q for robot in self.warehouse.robots}
+            return {robot.id: Tile_Coded_Q(len(self.actions)) for robot in self.warehouse.robots}
+        if not self.shared_q_mode:
+            return {robot.id: Q_Table(len(self.actions)) for robot in self.warehouse.robots}
+        self.shared_q = Shared_Q_Table(len(self.actions))
+        return {robot.id: Robot_Q_Table(self.shared_q, self.robot_offsets) for robot in self.warehouse.robots}
             
     def discretize_state(self, robot):
         x, y = robot.position
         grid_x = int(x / self.warehouse.width * self.grid_size)
         grid_y = int(y / self.warehouse.height * self.grid_size)
         
-        nearest_obstacles = []
-        for obstacle in self.warehouse.obstacles:
-            obs_x, obs_y = obstacle.center
-            dist = math.sqrt((x - obs_x)**2 + (y - obs_y)**2)
-            if dist < 100:  
-                obs_grid_x = int(obs_x / self.warehouse.width * self.grid_size)
-                obs_grid_y = int(obs_y / self.warehouse.height * self.grid_size)
-                nearest_obstacles.append((obs_grid_x - grid_x, obs_grid_y - grid_y))
+        cell_x = min(max(int(x // self.warehouse.grid_size), 0), self.warehouse.grid_width - 1)
+        cell_y = min(max(int(y // self.warehouse.grid_size), 0), self.warehouse.grid_height - 1)
+        nearest_obstacles = tuple((int(obs_x) - grid_x, int(obs_y) - grid_y)
+                                  for obs_x, obs_y in self.static_obstacle_table[cell_y, cell_x, :self.static_obstacle_counts[cell_y, cell_x]])
         
         nearest_robots = []
-        for other_robot in self.warehouse.robots:
-            if other_robot.id != robot.id:
-                other_x, other_y = other_robot.position
-                dist = math.sqrt((x - other_x)**2 + (y - other_y)**2)
-                if dist < 100:  
-                    other_grid_x = int(other_x / self.warehouse.width * self.grid_size)
-                    other_grid_y = int(other_y / self.warehouse.height * self.grid_size)
-                    nearest_robots.append((other_grid_x - grid_x, other_grid_y - grid_y))
+        for other_robot in sorted(self.warehouse.robots_within(robot, (x, y), 100), key=lambda r: r.id):
+            other_x, other_y = other_robot.position
+            other_grid_x = int(other_x / self.warehouse.width * self.grid_size)
+            other_grid_y = int(other_y / self.warehouse.height * self.grid_size)
+            nearest_robots.append((other_grid_x - grid_x, other_grid_y - grid_y))
         
         if robot.current_path and robot.target_index < len(robot.current_path):
             target = robot.current_path[robot.target_index]
@@ -81,7 +205,7 @@ class Obstacle_Avoidance:
             (grid_x, grid_y),
             target_pos,
             robot_state,
-            tuple(sorted(nearest_obstacles[:3])),  
+            nearest_obstacles,  
             tuple(sorted(nearest_robots[:2]))     
         )        
         return state
@@ -96,18 +220,10 @@ class Obstacle_Avoidance:
             new_y = y + dy * speed
             
             if (0 < new_x < self.warehouse.width and 0 < new_y < self.warehouse.height):
-                collision = False
-                for obstacle in self.warehouse.obstacles:
-                    if obstacle.collidepoint(new_x, new_y):
-                        collision = True
-                        break
+                collision = self.hits_obstacle(new_x, new_y)
                 
                 if not collision:
-                    for other_robot in self.warehouse.robots:
-                        if other_robot.id != robot.id:
-                            if math.dist((new_x, new_y), other_robot.position) < 2 * robot.radius:
-                                collision = True
-                                break
+                    collision = bool(self.warehouse.robots_within(robot, (new_x, new_y), 2 * robot.radius))
                     
                     if not collision:
                         valid_actions.append(i)
@@ -117,19 +233,24 @@ class Obstacle_Avoidance:
         
         return valid_actions
     
-    def choose_action(self, robot):
-        state = self.discretize_state(robot)
-        valid_actions = self.get_valid_actions(robot)
+    def choose_action(self, robot, state=None, valid_actions=None):
+        if state is None:
+            state = self.discretize_state(robot)
+        if valid_actions is None:
+            valid_actions = self.get_valid_actions(robot)
         
         if random.random() < self.epsilon:
             return random.choice(valid_actions)
         else:
             q_table = self.robot_q_tables[robot.id]
             
-            if state not in q_table or not any(q_table[state][a] != 0 for a in valid_actions):
+            if state not in q_table:
+                return random.choice(valid_actions)
+            row = q_table[state]
+            if not any(row[a] != 0 for a in valid_actions):
                 return random.choice(valid_actions)
             
-            q_values = [q_table[state][a] for a in valid_actions]
+            q_values = [row[a] for a in valid_actions]
             max_q = max(q_values)
             best_actions = [action for i, action in enumerate(valid_actions) if q_values[i] == max_q]
             return random.choice(best_actions)
@@ -140,40 +261,24 @@ class Obstacle_Avoidance:
         if old_position == new_position:
             reward += self.rewards['idle']
         
-        collision = False
-        for obstacle in self.warehouse.obstacles:
-            if obstacle.collidepoint(new_position[0], new_position[1]):
-                reward += self.rewards['collision']
-                collision = True
-                break
-        if collision:
+        if self.hits_obstacle(new_position[0], new_position[1]):
+            reward += self.rewards['collision']
             return reward  
         
-        for other_robot in self.warehouse.robots:
-            if other_robot.id != robot.id:
-                if math.dist(new_position, other_robot.position) < 2 * robot.radius:
-                    reward += self.rewards['collision']
-                    return reward  # Early return for collision
+        if self.warehouse.robots_within(robot, new_position, 2 * robot.radius):
+            reward += self.rewards['collision']
+            return reward  # Early return for collision
         
-        if robot.current_order:
-            for item in robot.current_order['items']:
-                if item not in robot.rewarded_items:  
-                    aisle, shelf = self.warehouse.products[item]
-                    if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                        item_pos = self.warehouse.shelf_to_coord[(aisle, shelf)]
-                        if math.dist(new_position, item_pos) < 20:
-                            reward += self.rewards['collect_item']
-                            robot.rewarded_items.append(item)
-
-        for item in robot.rewarded_items:
-            aisle, shelf = self.warehouse.products[item]
-            if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                item_pos = self.warehouse.shelf_to_coord[(aisle, shelf)]
-                if math.dist(new_position, item_pos) < 20:
-                    reward -= 2
+        if robot.current_order and robot.pick_plan is not None:
+            plan = robot.pick_plan
+            near = plan.bits_near(new_position, 20)
+            new_picks = near & ~plan.rewarded
+            reward += self.rewards['collect_item'] * bin(new_picks).count('1')
+            plan.rewarded |= new_picks
+            reward -= 2 * bin(near & plan.rewarded).count('1')  # Loitering at shelves already rewarded
         
         if robot.state == 'checkout' and robot.target_index >= len(robot.current_path) - 1:
-            if robot.current_order:
+            if robot.current_order and not self.warehouse.checkout_scheduler.in_service(robot):
                 checkout_idx = robot.current_order['checkout']
                 checkout_pos = (self.warehouse.checkouts[checkout_idx].centerx, 
                               self.warehouse.checkouts[checkout_idx].centery - 20)
@@ -197,14 +302,20 @@ class Obstacle_Avoidance:
     
     def update_q_value(self, robot, state, action, next_state, reward):
         q_table = self.robot_q_tables[robot.id]
-        current_q = q_table[state][action]
-        next_max_q = max([q_table[next_state][a] for a in range(len(self.actions))], default=0)
-        new_q = current_q + self.alpha * (reward + self.gamma * next_max_q - current_q)
-        q_table[state][action] = new_q
+        state_id, next_state_id = q_table.state_id(state), q_table.state_id(next_state)
+        q_table.update(np.array([state_id]), np.array([action]), np.array([reward], dtype=float), np.array([next_state_id]), self.alpha, self.gamma)
+        if self.replay is not None:
+            self.store_transitions([robot.id], [state_id], [action], [reward], [next_state_id])
     
+    def controls(self, robot):
+        # Idle robots have nowhere to go, charging ones are docked or heading for a charger and
+        # robots waiting at checkout hold the spot the scheduler gave them; an RL move would only
+        # push them off their spot and drain the battery
+        return robot.state not in ('idle', 'charging') and not self.warehouse.checkout_scheduler.waiting(robot)
+
     def act(self, robot):
         state = self.discretize_state(robot)
-        action_idx = self.choose_action(robot)
+        action_idx = self.choose_action(robot, state)
         dx, dy = self.actions[action_idx]
         old_position = robot.position
         
@@ -225,6 +336,75 @@ class Obstacle_Avoidance:
         
         return reward
     
+    def freeze_policy(self, decision_budget=0.0005):
+        # Deployment mode: the learned values become a read-only state -> best action map, and
+        # act_fleet stops exploring, computing rewards and updating values
+        self.greedy_policy = {}
+        for robot_id, table in self.robot_q_tables.items():
+            if isinstance(table, Tile_Coded_Q):
+                # Tile weights generalise to unvisited states, and the visited-state cache is empty
+                # after a load, so the policy reads the weights instead of enumerating states
+                self.greedy_policy[robot_id] = Tile_Greedy_Policy(table)
+                continue
+            values = table.rows(np.arange(len(table)))
+            best_actions = values.argmax(axis=1).tolist()
+            learned = (values != 0).any(axis=1).tolist()
+            self.greedy_policy[robot_id] = {state: best_actions[i] for i, state in enumerate(table.states) if learned[i]}
+        self.decision_budget = decision_budget
+        self.decision_times.clear()
+        self.inference_stats = {'decisions': 0, 'fallbacks': 0, 'overruns': 0, 'budget_skips': 0}
+        self.inference_mode = True
+
+    def unfreeze_policy(self):
+        self.inference_mode = False
+        self.greedy_policy = {}
+
+    def act_greedy(self, robot):
+        # Returns False when the robot should just follow its planned path this tick
+        state = self.discretize_state(robot)
+        action_idx = self.greedy_policy.get(robot.id, {}).get(state)
+        if action_idx is None:
+            return False
+        dx, dy = self.actions[action_idx]
+        new_x = max(robot.radius, min(robot.position[0] + dx * 2, self.warehouse.width - robot.radius))
+        new_y = max(robot.radius, min(robot.position[1] + dy * 2, self.warehouse.height - robot.radius))
+        if self.hits_obstacle(new_x, new_y) or self.warehouse.robots_within(robot, (new_x, new_y), 2 * robot.radius):
+            return False
+        robot.position = (new_x, new_y)
+        return True
+
+    def act_fleet(self, robots):
+        if not self.inference_mode:
+            for robot in robots:
+                if self.controls(robot):
+                    self.act(robot)
+            return
+        
+        tick_start = time.perf_counter()
+        tick_budget = self.decision_budget * len(robots)
+        for robot in robots:
+            if not self.controls(robot):
+                continue
+            start = time.perf_counter()
+            if start - tick_start > tick_budget:
+                # Out of time this tick: the remaining robots stay on their planned paths
+                self.inference_stats['budget_skips'] += 1
+                continue
+            if not self.act_greedy(robot):
+                self.inference_stats['fallbacks'] += 1
+            elapsed = time.perf_counter() - start
+            self.decision_times.append(elapsed)
+            self.inference_stats['decisions'] += 1
+            if elapsed > self.decision_budget:
+                self.inference_stats['overruns'] += 1
+
+    def decision_latency(self):
+        if not self.decision_times:
+            return {'mean_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0, **self.inference_stats}
+        times = np.array(self.decision_times) * 1000
+        return {'mean_ms': float(times.mean()), 'p99_ms': float(np.percentile(times, 99)),
+                'max_ms': float(times.max()), **self.inference_stats}
+    
     def update_learning_parameters(self, episode, total_episodes):
         self.epsilon = max(0.05, 0.9 * (1 - episode / total_episodes))
         self.alpha = max(0.01, 0.1 * (1 - episode / (2 * total_episodes)))
@@ -238,14 +418,15 @@ class Obstacle_Avoidance:
             current_robots = len(self.warehouse.robots)
             for i in range(current_robots, 2):
                 self.warehouse.create_robot()
-            self.robot_q_tables = {i+1: defaultdict(lambda: defaultdict(float)) for i in range(len(self.warehouse.robots))}
+            self.robot_q_tables = self.create_q_tables()
         
         for episode in range(episodes):
             self.warehouse.reset_for_rl_training()
-            self.warehouse.order_queue = []
+            self.warehouse.order_queue.clear()
             for _ in range(num_orders_per_episode):
                 new_order = self.warehouse.order_allocator.generate_order()
                 new_order['checkout'] = random.randint(0, len(self.warehouse.checkouts) - 1)
+                new_order['checkouts'] = [new_order['checkout']]
                 self.warehouse.order_queue.append(new_order)
             
             orders_completed = 0
@@ -255,13 +436,13 @@ class Obstacle_Avoidance:
             
             for robot in self.warehouse.robots:
                 robot.reward = 0
-                robot.rewarded_items = []  # Track items already rewarded
             
             for step in range(max_steps):
+                self.warehouse.index_robots()
                 self.order_alloc.assign_orders_to_robots(self.warehouse.robots,self.warehouse.pathfinding,self.warehouse.tsp_solver)
 
                 for robot in self.warehouse.robots:
-                    if robot.state != 'idle':
+                    if self.controls(robot):
                         reward = self.act(robot)
                         total_reward += reward
                         if reward <= self.rewards['collision']:
@@ -277,12 +458,12 @@ class Obstacle_Avoidance:
                         orders_completed += 1
                 
                 if orders_completed >= num_orders_per_episode:
-                    print(f"Episode {episode + 1}: All {num_orders_per_episode} orders completed in {step+1} steps!")
+                    logger.debug("Episode %d: All %d orders completed in %d steps", episode + 1, num_orders_per_episode, step + 1)
                     break
                 
                 if (len(self.warehouse.order_queue) == 0 and 
                     all(robot.state == 'idle' and not robot.order_queue for robot in self.warehouse.robots)):
-                    print(f"Episode {episode + 1}: Processed all available orders in {step+1} steps.")
+                    logger.debug("Episode %d: Processed all available orders in %d steps", episode + 1, step + 1)
                     break
             
             for robot in self.warehouse.robots:
@@ -309,29 +490,70 @@ class Obstacle_Avoidance:
         print(f"Training completed in {training_time:.2f} seconds")
         print(f"Final exploration rate: {self.epsilon:.4f}")
         
-        avg_reward = sum(self.episode_rewards[-10:]) / 10
-        avg_collisions = sum(self.collision_counts[-10:]) / 10
-        avg_orders = sum(self.orders_completed[-10:]) / 10
+        recent = min(10, len(self.episode_rewards)) or 1
+        avg_reward = sum(list(self.episode_rewards)[-10:]) / recent
+        avg_collisions = sum(list(self.collision_counts)[-10:]) / recent
+        avg_orders = sum(list(self.orders_completed)[-10:]) / recent
         print(f"Final 10 episodes - Avg reward: {avg_reward:.2f}, "
             f"Avg collisions: {avg_collisions:.2f}, "
             f"Avg orders completed: {avg_orders:.2f}/{num_orders_per_episode}")
         
         return {
-            'rewards': self.episode_rewards,
-            'collisions': self.collision_counts,
-            'items_collected': self.items_collected,
-            'orders_completed': self.orders_completed
+            'rewards': list(self.episode_rewards),
+            'collisions': list(self.collision_counts),
+            'items_collected': list(self.items_collected),
+            'orders_completed': list(self.orders_completed)
+        }
+    
+    def train_batched(self, episodes=1000, max_steps=500, num_orders_per_episode=6, num_envs=16):
+        # Same schedule as train, but episodes run num_envs at a time in a Batched_Obstacle_Avoidance
+        print(f"Starting batched training for {episodes} episodes across {num_envs} environments...")
+        start_time = time.time()
+        env = Batched_Obstacle_Avoidance(self, num_envs, num_orders_per_episode, max_steps)
+        completed = 0
+        while completed < episodes:
+            for episode in env.step():
+                if completed >= episodes:
+                    break
+                self.episode_rewards.append(episode['reward'])
+                self.collision_counts.append(episode['collisions'])
+                self.items_collected.append(episode['items_collected'])
+                self.orders_completed.append(episode['orders_completed'])
+                self.update_learning_parameters(completed, episodes)
+                completed += 1
+                if completed % 10 == 0 or completed == 1:
+                    print(f"Episode {completed}/{episodes}, "
+                        f"Reward: {episode['reward']:.2f}, "
+                        f"Collisions: {episode['collisions']}, "
+                        f"Items: {episode['items_collected']}, "
+                        f"Orders: {episode['orders_completed']}/{num_orders_per_episode}, "
+                        f"Epsilon: {self.epsilon:.4f}")
+
+        training_time = time.time() - start_time
+        print(f"Batched training completed in {training_time:.2f} seconds "
+            f"({env.samples / max(training_time, 1e-9):.0f} samples/s)")
+        return {
+            'rewards': list(self.episode_rewards),
+            'collisions': list(self.collision_counts),
+            'items_collected': list(self.items_collected),
+            'orders_completed': list(self.orders_completed)
         }
     
     def save_q_tables(self, filename="robot_q_tables.txt"):
+        if self.value_backend == 'tiles':
+            return self.save_tile_weights(filename)
         try:
             with open(filename, 'w') as f:
                 f.write("# Robot Q-Tables\n")
                 f.write("# Format: robot_id,state,action,q_value\n\n")
-                for robot_id, table in self.robot_q_tables.items():
+                tables = [(robot_id, table.items()) for robot_id, table in self.robot_q_tables.items()]
+                if self.shared_q is not None:
+                    # Robot 0 holds the shared table; robots only list the states they have corrections for
+                    tables = [(0, self.shared_q.items())] + [(robot_id, table.corrected_items()) for robot_id, table in self.robot_q_tables.items()]
+                for robot_id, rows in tables:
                     f.write(f"# Robot {robot_id}\n")
-                    for state, actions in table.items():
-                        for action, value in actions.items():
+                    for state, actions in rows:
+                        for action, value in enumerate(actions.tolist()):
                             if value != 0:  
                                 state_str = str(state).replace(',', ';')
                                 f.write(f"{robot_id},{state_str},{action},{value}\n")
@@ -341,8 +563,12 @@ class Obstacle_Avoidance:
             print(f"Error saving Q-tables: {e}")
     
     def load_q_tables(self, filename="robot_q_tables.txt"):
+        if self.value_backend == 'tiles':
+            return self.load_tile_weights(filename)
         try:
-            self.robot_q_tables = {i+1: defaultdict(lambda: defaultdict(float)) for i in range(len(self.warehouse.robots))}
+            self.robot_q_tables = self.create_q_tables()
+            if self.replay is not None:
+                self.replay.clear()  # Stored state ids refer to the old tables
             with open(filename, 'r') as f:
                 for line in f:
                     line = line.strip()
@@ -358,7 +584,9 @@ class Obstacle_Avoidance:
                         action = int(parts[2])
                         value = float(parts[3])
                         state = ast.literal_eval(state_str)
-                        self.robot_q_tables[robot_id][state][action] = value
+                        table = self.shared_q if robot_id == 0 else self.robot_q_tables.get(robot_id)
+                        if table is not None:
+                            table.set_value(state, action, value)
                     except (ValueError, SyntaxError) as e:
                         print(f"Warning: Could not parse line: {line}")
                         print(f"Error: {e}")
@@ -366,3 +594,28 @@ class Obstacle_Avoidance:
             print(f"Q-tables successfully loaded from {filename}")
         except Exception as e:
             print(f"Error loading Q-tables: {e}")
+
+    def save_tile_weights(self, filename):
+        # Tile weights are saved whole as arrays; robot 0 is the shared model
+        tables = {0: self.shared_q} if self.shared_q is not None else self.robot_q_tables
+        try:
+            with open(filename, 'wb') as f:
+                np.savez(f, robot_ids=np.array(list(tables)), weights=np.stack([table.weights for table in tables.values()]))
+            print(f"Tile weights successfully saved to {filename}")
+        except Exception as e:
+            print(f"Error saving tile weights: {e}")
+
+    def load_tile_weights(self, filename):
+        try:
+            self.robot_q_tables = self.create_q_tables()
+            if self.replay is not None:
+                self.replay.clear()
+            with open(filename, 'rb') as f:
+                data = np.load(f)
+                for robot_id, weights in zip(data['robot_ids'].tolist(), data['weights']):
+                    table = self.shared_q if robot_id == 0 else self.robot_q_tables.get(robot_id)
+                    if table is not None and table.weights.shape == weights.shape:
+                        table.weights[:] = weights
+            print(f"Tile weights successfully loaded from {filename}")
+        except Exception as e:
+            print(f"Error loading tile weights: {e}")
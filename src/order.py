@@ -1,47 +1,115 @@
 import random
+from collections import deque
+
+class Order_Queue:
+    def __init__(self, capacity=None):
+        self.capacity = capacity  # Bound on pending orders; None means unbounded
+        self.by_status = {'pending': {}, 'assigned': {}}  # Dicts keep arrival order per status
+        self.completed_count = 0
+        self.rejected_count = 0
+
+    def __len__(self):
+        return sum(len(orders) for orders in self.by_status.values())
+
+    def __iter__(self):
+        for orders in self.by_status.values():
+            yield from list(orders.values())
+
+    def free_slots(self):
+        if self.capacity is None:
+            return float('inf')
+        return max(0, self.capacity - len(self.by_status['pending']))
+
+    def append(self, order):
+        if not self.free_slots():
+            self.rejected_count += 1
+            return False
+        self.by_status.setdefault(order['status'], {})[order['id']] = order
+        return True
+
+    def pending(self):
+        return list(self.by_status['pending'].values())
+
+    def mark(self, order, status):
+        self.by_status.get(order['status'], {}).pop(order['id'], None)
+        order['status'] = status
+        if status == 'completed':
+            # Completed orders are drained so memory stays flat over long runs
+            self.completed_count += 1
+        else:
+            self.by_status.setdefault(status, {})[order['id']] = order
+
+    def clear(self):
+        for orders in self.by_status.values():
+            orders.clear()
 
 class Order_Allocator:
     def __init__(self, warehouse):
         self.warehouse = warehouse
-    
-    def generate_order(self):
-        num_items = random.randint(1, 10)
-        available_products = list(self.warehouse.products.keys())
-        order_items = random.sample(available_products, num_items)
-        checkout_point = random.randint(0, 2)  
+        self.next_order_id = 1
+
+    def create_order(self, items, checkout=None, checkouts=None):
+        items = [item for item in items if item in self.warehouse.products]
+        if not items:
+            return None
+        num_checkouts = len(self.warehouse.checkouts)
+        if checkouts is not None:
+            checkouts = [c for c in checkouts if 0 <= c < num_checkouts] or None
+        if checkout is None or not 0 <= checkout < num_checkouts:
+            if checkouts is None:
+                checkout = random.randint(0, num_checkouts - 1)
+                checkouts = list(range(num_checkouts))  # Any checkout will do
+            else:
+                checkout = checkouts[0]
         order = {
-            'id': len(self.warehouse.order_queue) + 1,
-            'items': order_items,
-            'checkout': checkout_point,
-            'status': 'pending'  # pending, assigned, completed
+            'id': self.next_order_id,
+            'items': items,
+            'checkout': checkout,  # Preferred until the scheduler books one from 'checkouts'
+            'checkouts': checkouts or [checkout],
+            'status': 'pending',  # pending, assigned, completed
+            'created_tick': self.warehouse.tick
         }
+        self.next_order_id += 1
+        if self.warehouse.recorder:
+            self.warehouse.recorder.record_random_state(self.warehouse.tick, self.next_order_id)
         return order
     
+    def generate_order(self):
+        available_products = self.warehouse.product_names
+        num_items = random.randint(1, min(10, len(available_products)))
+        order_items = random.sample(available_products, num_items)
+        return self.create_order(order_items)
+
+    def ingest_orders(self, order_source):
+        # Only pull as many orders as the queue has room for; the rest stay with the source
+        accepted = []
+        for record in order_source.poll(self.warehouse.tick, self.warehouse.order_queue.free_slots()):
+            order = self.create_order(record['items'], record.get('checkout'), record.get('checkouts'))
+            if self.warehouse.submit_order(order):
+                accepted.append(order)
+        return accepted
+    
     def assign_orders_to_robots(self, robots, pathfinder, tsp_solver):
-        for order in self.warehouse.order_queue:
-            if order['status'] == 'pending':
-                for robot in robots:
-                    if len(robot.order_queue) < 1:
-                        robot.order_queue.append(order)
-                        order['status'] = 'assigned'
-                        if robot.state == 'idle':
-                            robot.current_order = order
-                            robot.state = 'collecting'
-                            robot.items_collected = []
-                            
-                            item_locations = []
-                            for item in order['items']:
-                                aisle, shelf = self.warehouse.products[item]
-                                if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                                    item_locations.append(self.warehouse.shelf_to_coord[(aisle, shelf)])
-                            
-                            route, _ = tsp_solver.solve_tsp(item_locations, robot.position, robot.id, robots)
-                            full_path = []
-                            for i in range(len(route) - 1):
-                                segment = pathfinder.find_path(route[i], route[i+1], robot.id, robots)
-                                full_path.extend(segment[:-1])  
-                            if full_path:
-                                full_path.append(route[-1])  
-                                robot.current_path = full_path
-                                robot.target_index = 0
-                        break
\ No newline at end of file
+        battery = self.warehouse.battery
+        free_robots = deque(robot for robot in robots if len(robot.order_queue) < 1 and robot.state != 'charging')
+        starts = []
+        for order in self.warehouse.order_queue.pending():
+            robot = None
+            while free_robots and robot is None:
+                robot = free_robots.popleft()
+                if battery.should_charge(robot, order):
+                    # Not enough charge to finish this order with a reserve left; charge first
+                    battery.send_to_charger(robot)
+                    robot = None
+            if robot is None:
+                break
+            robot.order_queue.append(order)
+            self.warehouse.order_queue.mark(order, 'assigned')
+            order['assigned_tick'] = self.warehouse.tick
+            if robot.state == 'idle':
+                starts.append((robot, order))
+        # Tours and paths for the whole burst are planned together, possibly across worker processes
+        self.warehouse.bulk_planner.start_orders(starts, robots)
+        for robot in free_robots:
+            if robot.state == 'idle' and battery.should_charge(robot):
+                battery.send_to_charger(robot)
@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+import socket
+import selectors
+from collections import deque
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+def parse_order_record(record):
+    items = record.get('items', [])
+    if isinstance(items, str):
+        items = [item.strip() for item in items.split(';') if item.strip()]
+    checkout = record.get('checkout')
+    checkouts = record.get('checkouts')
+    if isinstance(checkouts, str):
+        checkouts = [c.strip() for c in checkouts.split(';') if c.strip()]
+    tick = record.get('tick')
+    return {
+        'items': list(items),
+        'checkout': int(checkout) if checkout not in (None, '') else None,
+        'checkouts': [int(c) for c in checkouts] if checkouts else None,  # Checkouts the order may be routed to
+        'tick': int(tick) if tick not in (None, '') else 0
+    }
+
+class File_Order_Source:
+    # Replays orders from JSON lines or CSV (columns: tick, items separated by ';', checkout,
+    # optional checkouts separated by ';').
+    # Records are released once the simulation reaches their tick, in file order.
+    def __init__(self, filename, loop=False):
+        self.filename = filename
+        self.loop = loop
+        self.tick_offset = 0
+        self.records = deque(self._read_records())
+        self.exhausted = not self.records
+
+    def _read_records(self):
+        with open(self.filename, 'r', newline='') as f:
+            if self.filename.endswith('.csv'):
+                rows = csv.DictReader(f)
+            else:
+                rows = (json.loads(line) for line in f if line.strip())
+            return [parse_order_record(row) for row in rows]
+
+    def poll(self, tick, max_orders):
+        orders = []
+        while self.records and len(orders) < max_orders:
+            if self.records[0]['tick'] + self.tick_offset > tick:
+                break
+            orders.append(self.records.popleft())
+            if not self.records and self.loop:
+                self.tick_offset = tick + 1
+                self.records.extend(self._read_records())
+        self.exhausted = not self.records
+        return orders
+
+    def close(self):
+        self.records.clear()
+
+class Socket_Order_Source:
+    # Accepts newline-delimited JSON orders over a local TCP port or a Unix socket path.
+    # Sockets are only read while the internal buffer has room, so a fast producer is held back
+    # by TCP flow control instead of growing memory.
+    def __init__(self, host='127.0.0.1', port=0, unix_path=None, max_buffered=256):
+        self.max_buffered = max_buffered
+        self.buffer = deque()
+        self.partial = {}
+        self.unix_path = unix_path
+        self.selector = selectors.DefaultSelector()
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(unix_path)
+            self.address = unix_path
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind((host, port))
+            self.address = self.server.getsockname()
+        self.server.listen()
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.exhausted = False
+
+    def _accept(self):
+        conn, _ = self.server.accept()
+        conn.setblocking(False)
+        self.partial[conn] = b''
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def _drop(self, conn):
+        self.selector.unregister(conn)
+        self.partial.pop(conn, None)
+        conn.close()
+
+    def _parse_lines(self, conn):
+        # Parse buffered lines only while there is room; the rest waits in the partial buffer
+        data = self.partial[conn]
+        while len(self.buffer) < self.max_buffered and b'\n' in data:
+            line, data = data.split(b'\n', 1)
+            if not line.strip():
+                continue
+            try:
+                self.buffer.append(parse_order_record(json.loads(line)))
+            except (ValueError, AttributeError) as e:
+                logger.warning("Could not parse order: %r (%s)", line[:80], e)
+        self.partial[conn] = data
+
+    def _read(self, conn):
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._drop(conn)
+            return
+        if not data:
+            self.partial[conn] += b'\n'
+            self._parse_lines(conn)
+            self._drop(conn)
+            return
+        self.partial[conn] += data
+        self._parse_lines(conn)
+
+    def _pump(self):
+        for conn in list(self.partial):
+            self._parse_lines(conn)
+        while len(self.buffer) < self.max_buffered:
+            readable = [key.fileobj for key, _ in self.selector.select(timeout=0)
+                        if key.fileobj is self.server or b'\n' not in self.partial[key.fileobj]]
+            if not readable:
+                break
+            for sock in readable:
+                if sock is self.server:
+                    self._accept()
+                elif len(self.buffer) < self.max_buffered:
+                    self._read(sock)
+
+    def poll(self, tick, max_orders):
+        self._pump()
+        orders = []
+        while self.buffer and len(orders) < max_orders:
+            orders.append(self.buffer.popleft())
+        return orders
+
+    def close(self):
+        for conn in list(self.partial):
+            self._drop(conn)
+        self.selector.unregister(self.server)
+        self.server.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
@@ -1,14 +1,107 @@
 import math
 import heapq
+import time
+import numpy as np
+from collections import OrderedDict, defaultdict
 
 class Pathfinding:
-    def __init__(self, warehouse):
+    def __init__(self, warehouse, robot_radius=10, clearance_weight=0.0, max_clearance=4,
+                 traffic_weight=1.0, traffic_decay=0.995, traffic_scale=20.0, traffic_interval=60, collision_heat=5.0,
+                 search_weight=2.5, exact_share=0.5):
         self.warehouse =warehouse
+        self.robot_radius = robot_radius
+        self.clearance_weight = clearance_weight  # 0 disables the aisle-centre preference
+        self.max_clearance = max_clearance
+        self.cspace_cache = {}
+        self.clearance_cache = {}
+        self.path_cache = OrderedDict()  # Robot-agnostic A* results with their cell bounding boxes
+        self.path_cache_size = 20000
+        self.directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+        # Decaying heatmap of robot occupancy and collisions. Ticks accumulate into `traffic_window` and
+        # are folded into `traffic_heat` every `traffic_interval` ticks, which also bumps the epoch so
+        # cached paths planned against the old costs are not reused.
+        self.traffic_weight = traffic_weight  # 0 disables congestion costs
+        self.traffic_decay = traffic_decay  # Per tick
+        self.traffic_scale = traffic_scale  # Heat at which a cell reaches the full traffic cost
+        self.traffic_interval = traffic_interval
+        self.collision_heat = collision_heat
+        self.traffic_heat = np.zeros((warehouse.grid_height, warehouse.grid_width), dtype=np.float32)
+        self.traffic_window = np.zeros_like(self.traffic_heat)
+        self.traffic_cost = None
+        self.traffic_epoch = 0
+        self.traffic_ticks = 0
+        self.collision_cells = []
+        self.cost_layer_cache = {}
+        # Anytime planning: with a deadline, exact A* gets exact_share of the time left and weighted
+        # A* (heuristic x search_weight) the rest. tier_counts records which result each search
+        # returned and is drained into the metrics every tick.
+        self.search_weight = search_weight
+        self.exact_share = exact_share
+        self.deadline_check_interval = 64  # Expansions between clock reads; also the least work a search does
+        self.tier_counts = defaultdict(int)
+        self.last_tier = 'exact'  # Tier of the latest find_path result
 
     def distance_between(self, point1, point2):
         return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
 
-    def _find_nearest_navigable_cell(self, grid_pos):
+    def _footprint_offsets(self, radius):
+        # Cell offsets whose square comes within `radius` of a robot centred in the middle cell
+        size = self.warehouse.grid_size
+        reach = int(math.ceil(radius / size + 0.5))
+        offsets = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                gap_x = max(0.0, abs(dx) - 0.5) * size
+                gap_y = max(0.0, abs(dy) - 0.5) * size
+                if math.hypot(gap_x, gap_y) < radius:
+                    offsets.append((dx, dy))
+        return offsets
+
+    def _dilate(self, blocked, offsets):
+        dilated = blocked.copy()
+        height, width = blocked.shape
+        for dx, dy in offsets:
+            if abs(dx) >= width or abs(dy) >= height or (dx == 0 and dy == 0):
+                continue
+            dst_y = slice(max(0, dy), height + min(0, dy))
+            src_y = slice(max(0, -dy), height + min(0, -dy))
+            dst_x = slice(max(0, dx), width + min(0, dx))
+            src_x = slice(max(0, -dx), width + min(0, -dx))
+            dilated[dst_y, dst_x] |= blocked[src_y, src_x]
+        return dilated
+
+    def get_cspace_grid(self, radius=None):
+        # Navigable cells for a robot of this radius: obstacles grown by the robot footprint
+        radius = self.robot_radius if radius is None else radius
+        key = (radius, self.warehouse.grid_version)
+        grid = self.cspace_cache.get(key)
+        if grid is None:
+            self.cspace_cache = {k: v for k, v in self.cspace_cache.items() if k[1] == self.warehouse.grid_version}
+            blocked = ~self.warehouse.navigation_grid
+            grid = ~self._dilate(blocked, self._footprint_offsets(radius)) if radius > 0 else ~blocked
+            self.cspace_cache[key] = grid
+        return grid
+
+    def get_clearance_cost(self, radius=None):
+        # Extra move cost that falls off with distance from the nearest blocked c-space cell
+        radius = self.robot_radius if radius is None else radius
+        key = (radius, self.warehouse.grid_version)
+        cost = self.clearance_cache.get(key)
+        if cost is None:
+            self.clearance_cache = {k: v for k, v in self.clearance_cache.items() if k[1] == self.warehouse.grid_version}
+            blocked = ~self.get_cspace_grid(radius)
+            clearance = np.zeros(blocked.shape, dtype=np.float32)
+            ring = blocked
+            ring_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+            for _ in range(self.max_clearance):
+                ring = self._dilate(ring, ring_offsets)
+                clearance += ~ring
+            cost = (self.max_clearance - clearance) / self.max_clearance
+            self.clearance_cache[key] = cost
+        return cost
+
+    def _find_nearest_navigable_cell(self, grid_pos, grid=None):
+        grid = self.warehouse.navigation_grid if grid is None else grid
         x, y = grid_pos
         max_radius = max(self.warehouse.grid_width, self.warehouse.grid_height)
         
@@ -16,78 +109,323 @@ class Pathfinding:
             for dx in range(-radius, radius+1):
                 for dy in [-radius, radius]: 
                     nx, ny = x + dx, y + dy
-                    if (0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height and self.warehouse.navigation_grid[ny, nx]):
+                    if (0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height and grid[ny, nx]):
                         return (nx, ny)
             
             for dx in [-radius, radius]:  
                 for dy in range(-radius+1, radius): 
                     nx, ny = x + dx, y + dy
-                    if (0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height and self.warehouse.navigation_grid[ny, nx]):
+                    if (0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height and grid[ny, nx]):
                         return (nx, ny)
         return grid_pos
-    
-    def find_path(self, start, end, robot_id=None, robots=None, avoid_robots=True):
-        start_grid = (int(start[0] // self.warehouse.grid_size), int(start[1] // self.warehouse.grid_size))
-        end_grid = (int(end[0] // self.warehouse.grid_size), int(end[1] // self.warehouse.grid_size))
-        if not (0 <= start_grid[0] < self.warehouse.grid_width and 0 <= start_grid[1] < self.warehouse.grid_height):
-            start_grid = (max(0, min(start_grid[0], self.warehouse.grid_width-1)), 
-                        max(0, min(start_grid[1], self.warehouse.grid_height-1)))
-        if not (0 <= end_grid[0] < self.warehouse.grid_width and 0 <= end_grid[1] < self.warehouse.grid_height):
-            end_grid = (max(0, min(end_grid[0], self.warehouse.grid_width-1)), 
-                        max(0, min(end_grid[1], self.warehouse.grid_height-1)))
-        
-        if not self.warehouse.navigation_grid[start_grid[1], start_grid[0]]:
-            start_grid = self._find_nearest_navigable_cell(start_grid)
-        if not self.warehouse.navigation_grid[end_grid[1], end_grid[0]]:
-            end_grid = self._find_nearest_navigable_cell(end_grid)
-        
-        temp_grid = self.warehouse.navigation_grid.copy()
-        if avoid_robots and robot_id is not None and robots is not None:
-            for other_robot in robots:
-                if other_robot.id != robot_id:
-                    rx, ry = other_robot.position
-                    rgx, rgy = int(rx // self.warehouse.grid_size), int(ry // self.warehouse.grid_size)
-                    
-                    radius = 2  # Size of the area to avoid
-                    for dx in range(-radius, radius+1):
-                        for dy in range(-radius, radius+1):
-                            nx, ny = rgx + dx, rgy + dy
-                            if 0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height:
-                                temp_grid[ny, nx] = False
-        
-        # A* algorithm
+
+    def _block_other_robots(self, grid, robot_id, robots):
+        grid = grid.copy()
+        radius = 2  # Size of the area to avoid
+        for other_robot in robots:
+            if other_robot.id != robot_id:
+                rx, ry = other_robot.position
+                rgx, rgy = int(rx // self.warehouse.grid_size), int(ry // self.warehouse.grid_size)
+                grid[max(0, rgy - radius):max(0, rgy + radius + 1), max(0, rgx - radius):max(0, rgx + radius + 1)] = False
+        return grid
+
+    def _cell_center(self, cell):
+        return (cell[0] * self.warehouse.grid_size + self.warehouse.grid_size // 2,
+                cell[1] * self.warehouse.grid_size + self.warehouse.grid_size // 2)
+
+    def _trace_back(self, came_from, current):
+        path = [current]
+        while current in came_from:
+            current = came_from[current]
+            path.append(current)
+        return [self._cell_center(cell) for cell in reversed(path)]
+
+    def _a_star(self, start_grid, end_grid, grid, cost_layer=None, weight=1.0, deadline=None):
+        # With a deadline the search stops once it passes and returns the path to the expanded cell
+        # closest to the goal, so the result need not end at end_grid
         open_set = []
-        heapq.heappush(open_set, (0, start_grid))
+        heapq.heappush(open_set, (weight * self.distance_between(start_grid, end_grid), start_grid))
         came_from = {}
         g_score = {start_grid: 0}
-        f_score = {start_grid: self.distance_between(start_grid, end_grid)}
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+        closed = set()
+        closest, closest_distance = start_grid, float('inf')
         
         while open_set:
             _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
             if current == end_grid:
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                return [(x * self.warehouse.grid_size + self.warehouse.grid_size // 2, 
-                        y * self.warehouse.grid_size + self.warehouse.grid_size // 2) 
-                        for x, y in reversed(path)]
+                return self._trace_back(came_from, current)
+            closed.add(current)
+            if deadline is not None:
+                distance = self.distance_between(current, end_grid)
+                if distance < closest_distance:
+                    closest, closest_distance = current, distance
+                if len(closed) % self.deadline_check_interval == 0 and time.perf_counter() > deadline:
+                    return self._trace_back(came_from, closest)
             
-            for dx, dy in directions:
+            for dx, dy in self.directions:
                 neighbor = (current[0] + dx, current[1] + dy)
-                if (0 <= neighbor[0] < self.warehouse.grid_width and 0 <= neighbor[1] < self.warehouse.grid_height and temp_grid[neighbor[1], neighbor[0]]):
+                if (0 <= neighbor[0] < self.warehouse.grid_width and 0 <= neighbor[1] < self.warehouse.grid_height and grid[neighbor[1], neighbor[0]]):
                     move_cost = 1.4 if abs(dx) + abs(dy) == 2 else 1.0
-                    tentative_g = g_score.get(current, float('inf')) + move_cost
+                    if cost_layer is not None:
+                        move_cost += cost_layer[neighbor[1], neighbor[0]]
+                    tentative_g = g_score[current] + move_cost
                     if tentative_g < g_score.get(neighbor, float('inf')):
                         came_from[neighbor] = current
                         g_score[neighbor] = tentative_g
-                        f_score[neighbor] = tentative_g + self.distance_between(neighbor, end_grid)
-                        if neighbor not in [i[1] for i in open_set]:
-                            heapq.heappush(open_set, (f_score[neighbor], neighbor))
-        return self._generate_fallback_path(start, end, robot_id, robots)
+                        heapq.heappush(open_set, (tentative_g + weight * self.distance_between(neighbor, end_grid), neighbor))
+        return None
+
+    def _anytime_a_star(self, start_grid, end_grid, grid, cost_layer, deadline):
+        # Returns the path and the tier it came from: 'exact', 'weighted', or 'partial' when neither
+        # search reached the goal in time. A partial path is the better of the two prefixes, so every
+        # point on it is a searched free cell; it stops short of the goal and callers have to plan
+        # the rest from its end (find_path leaves last_tier at 'partial' to tell them).
+        if deadline is None:
+            return self._a_star(start_grid, end_grid, grid, cost_layer), 'exact'
+        goal = self._cell_center(end_grid)
+        now = time.perf_counter()
+        path = self._a_star(start_grid, end_grid, grid, cost_layer, deadline=now + max(0.0, deadline - now) * self.exact_share)
+        if path is None or path[-1] == goal:
+            return path, 'exact'
+        prefix = path
+        path = self._a_star(start_grid, end_grid, grid, cost_layer, self.search_weight, deadline)
+        if path is None or path[-1] == goal:
+            return path, 'weighted'
+        return min(prefix, path, key=lambda p: self.distance_between(p[-1], goal)), 'partial'
+
+    def invalidate_region(self, rows, cols, opened):
+        # Called after the cells in rows x cols changed. C-space grids are re-dilated only in a window
+        # around the change; cached paths survive unless they cross it, or unless cells opened, in
+        # which case shorter routes may now exist and the cache is dropped.
+        version = self.warehouse.grid_version
+        height, width = self.warehouse.navigation_grid.shape
+        patched = {}
+        reach = 0
+        for (radius, cached_version), grid in self.cspace_cache.items():
+            if cached_version != version - 1:
+                continue
+            offsets = self._footprint_offsets(radius) if radius > 0 else []
+            radius_reach = max((max(abs(dx), abs(dy)) for dx, dy in offsets), default=0)
+            reach = max(reach, radius_reach)
+            y1, y2 = max(0, rows.start - radius_reach), min(height, rows.stop + radius_reach)
+            x1, x2 = max(0, cols.start - radius_reach), min(width, cols.stop + radius_reach)
+            sy1, sy2 = max(0, y1 - radius_reach), min(height, y2 + radius_reach)
+            sx1, sx2 = max(0, x1 - radius_reach), min(width, x2 + radius_reach)
+            blocked = ~self.warehouse.navigation_grid[sy1:sy2, sx1:sx2]
+            if offsets:
+                blocked = self._dilate(blocked, offsets)
+            grid = grid.copy()
+            grid[y1:y2, x1:x2] = ~blocked[y1 - sy1:y2 - sy1, x1 - sx1:x2 - sx1]
+            patched[(radius, version)] = grid
+        self.cspace_cache = patched
+        self.clearance_cache = {}
+        self.cost_layer_cache = {}
+        if opened:
+            self.path_cache.clear()
+            return
+        x1, x2 = cols.start - reach, cols.stop + reach
+        y1, y2 = rows.start - reach, rows.stop + reach
+        size = self.warehouse.grid_size
+        stale = []
+        for key, (path, (min_x, max_x, min_y, max_y)) in self.path_cache.items():
+            if max_x < x1 or min_x >= x2 or max_y < y1 or min_y >= y2:
+                continue
+            if any(x1 <= x // size < x2 and y1 <= y // size < y2 for x, y in path):
+                stale.append(key)
+        for key in stale:
+            del self.path_cache[key]
+
+    def clear_caches(self):
+        self.cspace_cache = {}
+        self.clearance_cache = {}
+        self.cost_layer_cache = {}
+        self.path_cache.clear()
+
+    def drain_tiers(self):
+        counts = dict(self.tier_counts)
+        self.tier_counts.clear()
+        return counts
+
+    def note_collision(self, position):
+        self.collision_cells.append(position)
+
+    def record_traffic(self, positions):
+        if self.traffic_weight <= 0:
+            return
+        size = self.warehouse.grid_size
+        height, width = self.traffic_window.shape
+        if len(positions):
+            gx = np.clip((positions[:, 0] // size).astype(np.intp), 0, width - 1)
+            gy = np.clip((positions[:, 1] // size).astype(np.intp), 0, height - 1)
+            np.add.at(self.traffic_window, (gy, gx), 1.0)
+        if self.collision_cells:
+            positions = np.array(self.collision_cells, dtype=float)
+            gx = np.clip((positions[:, 0] // size).astype(np.intp), 0, width - 1)
+            gy = np.clip((positions[:, 1] // size).astype(np.intp), 0, height - 1)
+            np.add.at(self.traffic_window, (gy, gx), self.collision_heat)
+            self.collision_cells = []
+        self.traffic_ticks += 1
+        if self.traffic_ticks >= self.traffic_interval:
+            self.traffic_heat *= self.traffic_decay ** self.traffic_ticks
+            self.traffic_heat += self.traffic_window
+            self.traffic_window[:] = 0
+            self.traffic_ticks = 0
+            self.traffic_cost = self.traffic_weight * np.minimum(self.traffic_heat / self.traffic_scale, 1.0)
+            self.traffic_epoch += 1
+            self.cost_layer_cache = {}
+
+    def clear_traffic(self):
+        self.traffic_heat[:] = 0
+        self.traffic_window[:] = 0
+        self.traffic_ticks = 0
+        self.traffic_cost = None
+        self.traffic_epoch += 1
+        self.cost_layer_cache = {}
+
+    def _cost_layer(self, radius=None):
+        key = (radius, self.warehouse.grid_version)
+        if key in self.cost_layer_cache:
+            return self.cost_layer_cache[key]
+        layer = None
+        if self.clearance_weight > 0:
+            layer = self.clearance_weight * self.get_clearance_cost(radius)
+        if self.traffic_cost is not None:
+            layer = self.traffic_cost if layer is None else layer + self.traffic_cost
+        self.cost_layer_cache = {k: v for k, v in self.cost_layer_cache.items() if k[1] == self.warehouse.grid_version}
+        self.cost_layer_cache[key] = layer
+        return layer
+
+    def path_cost(self, path):
+        # Travel length plus the congestion the path runs through, in the same pixel units
+        length = sum(self.distance_between(path[k], path[k+1]) for k in range(len(path)-1))
+        if self.traffic_cost is None or not path:
+            return length
+        size = self.warehouse.grid_size
+        height, width = self.traffic_cost.shape
+        cells = np.array(path, dtype=float) // size
+        gx = np.clip(cells[:, 0].astype(np.intp), 0, width - 1)
+        gy = np.clip(cells[:, 1].astype(np.intp), 0, height - 1)
+        return length + size * float(self.traffic_cost[gy, gx].sum())
     
-    def _try_a_star_path(self, start, end, robot_id, robots, avoid_robots=True):
+    def _entry_costs(self, radius=None):
+        # What _a_star adds on top of the step length to move into each cell; inf where blocked
+        grid = self.get_cspace_grid(radius)
+        layer = self._cost_layer(radius)
+        entry = np.zeros(grid.shape) if layer is None else layer.astype(float)
+        entry[~grid] = np.inf
+        return entry
+
+    def navigable_cell(self, point, radius=None):
+        grid = self.get_cspace_grid(radius)
+        size = self.warehouse.grid_size
+        cell = (min(max(int(point[0] // size), 0), self.warehouse.grid_width - 1),
+                min(max(int(point[1] // size), 0), self.warehouse.grid_height - 1))
+        return cell if grid[cell[1], cell[0]] else self._find_nearest_navigable_cell(cell, grid)
+
+    def cost_to_go(self, goals, radius=None):
+        # Robot-agnostic cost from every cell to each goal (one field per goal, same move costs as
+        # _a_star), relaxed for all goals at once. Where many plans share a fixed set of goals,
+        # distances become lookups and paths a walk down the field instead of one search each.
+        entry = self._entry_costs(radius)
+        height, width = entry.shape
+        fields = np.full((len(goals), height, width), np.inf, dtype=np.float32)
+        entry = entry.astype(np.float32)
+        for k, goal in enumerate(goals):
+            gx, gy = self.navigable_cell(goal, radius)
+            fields[k, gy, gx] = 0.0
+        blocked = ~np.isfinite(entry)
+        shifts = []
+        for dx, dy in self.directions:
+            # Cells in `dst` step by (dx, dy) into the cells in `src`
+            dst = (slice(max(0, -dy), height - max(0, dy)), slice(max(0, -dx), width - max(0, dx)))
+            src = (slice(max(0, dy), height + min(0, dy)), slice(max(0, dx), width + min(0, dx)))
+            shifts.append((dst, src, 1.4 if dx and dy else 1.0))
+        while True:
+            onward = fields + entry
+            relaxed = fields.copy()
+            for (dst_y, dst_x), (src_y, src_x), step in shifts:
+                np.minimum(relaxed[:, dst_y, dst_x], onward[:, src_y, src_x] + step, out=relaxed[:, dst_y, dst_x])
+            relaxed[:, blocked] = np.inf
+            if np.array_equal(relaxed, fields):
+                return fields
+            fields = relaxed
+
+    def descend(self, field, start, radius=None):
+        # Cell-centre path from start down a cost_to_go field to its goal, or None if it cannot reach it
+        entry = self._entry_costs(radius)
+        x, y = self.navigable_cell(start, radius)
+        if not np.isfinite(field[y, x]):
+            return None
+        height, width = field.shape
+        cells = [(x, y)]
+        while field[y, x] > 0:
+            best, best_cost = None, np.inf
+            for dx, dy in self.directions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    cost = field[ny, nx] + entry[ny, nx] + (1.4 if dx and dy else 1.0)
+                    if cost < best_cost:
+                        best, best_cost = (nx, ny), cost
+            if best is None or not field[best[1], best[0]] < field[y, x]:
+                return None
+            x, y = best
+            cells.append(best)
+        return [self._cell_center(cell) for cell in cells]
+
+    def find_path(self, start, end, robot_id=None, robots=None, avoid_robots=True, radius=None, deadline=None):
+        # deadline is a time.perf_counter() value; past it the best path found so far is returned
+        start_grid = (int(start[0] // self.warehouse.grid_size), int(start[1] // self.warehouse.grid_size))
+        end_grid = (int(end[0] // self.warehouse.grid_size), int(end[1] // self.warehouse.grid_size))
+        if not (0 <= start_grid[0] < self.warehouse.grid_width and 0 <= start_grid[1] < self.warehouse.grid_height):
+            start_grid = (max(0, min(start_grid[0], self.warehouse.grid_width-1)), 
+                        max(0, min(start_grid[1], self.warehouse.grid_height-1)))
+        if not (0 <= end_grid[0] < self.warehouse.grid_width and 0 <= end_grid[1] < self.warehouse.grid_height):
+            end_grid = (max(0, min(end_grid[0], self.warehouse.grid_width-1)), 
+                        max(0, min(end_grid[1], self.warehouse.grid_height-1)))
+        
+        avoiding = avoid_robots and robot_id is not None and robots is not None
+        cache_key = (start_grid, end_grid, radius, self.traffic_epoch)
+        if not avoiding and cache_key in self.path_cache:
+            self.path_cache.move_to_end(cache_key)
+            self.last_tier = 'exact'
+            return list(self.path_cache[cache_key][0])
+        
+        # Plan in configuration space first; fall back to the raw grid where the inflated
+        # obstacles close off a passage the robot can still squeeze through
+        for base_grid, cost_layer in ((self.get_cspace_grid(radius), self._cost_layer(radius)),
+                                      (self.warehouse.navigation_grid, None)):
+            path_start, path_end = start_grid, end_grid
+            if not base_grid[path_start[1], path_start[0]]:
+                path_start = self._find_nearest_navigable_cell(path_start, base_grid)
+            if not base_grid[path_end[1], path_end[0]]:
+                path_end = self._find_nearest_navigable_cell(path_end, base_grid)
+            
+            temp_grid = base_grid
+            if avoiding:
+                temp_grid = self._block_other_robots(base_grid, robot_id, robots)
+            
+            path, tier = self._anytime_a_star(path_start, path_end, temp_grid, cost_layer, deadline)
+            if path:
+                self.tier_counts[tier] += 1
+                self.last_tier = tier
+                if tier != 'exact':
+                    return path  # Degraded results are not cached, so the next search can do better
+                if not avoiding:
+                    xs = [x for x, _ in path]
+                    ys = [y for _, y in path]
+                    size = self.warehouse.grid_size
+                    self.path_cache[cache_key] = (path, (min(xs) // size, max(xs) // size, min(ys) // size, max(ys) // size))
+                    if len(self.path_cache) > self.path_cache_size:
+                        self.path_cache.popitem(last=False)
+                    return list(path)
+                return path
+        self.tier_counts['fallback'] += 1
+        self.last_tier = 'fallback'
+        return self._generate_fallback_path(start, end, robot_id, robots, deadline=deadline)
+    
+    def _try_a_star_path(self, start, end, robot_id, robots, avoid_robots=True, radius=None, deadline=None):
         start_grid = (int(start[0] // self.warehouse.grid_size), int(start[1] // self.warehouse.grid_size))
         end_grid = (int(end[0] // self.warehouse.grid_size), int(end[1] // self.warehouse.grid_size))
         
@@ -96,58 +434,20 @@ class Pathfinding:
         if not (0 <= end_grid[0] < self.warehouse.grid_width and 0 <= end_grid[1] < self.warehouse.grid_height):
             return None
         
-        if not self.warehouse.navigation_grid[start_grid[1], start_grid[0]] or not self.warehouse.navigation_grid[end_grid[1], end_grid[0]]:
+        base_grid = self.get_cspace_grid(radius)
+        if not base_grid[start_grid[1], start_grid[0]] or not base_grid[end_grid[1], end_grid[0]]:
             return None
         
-        temp_grid = self.warehouse.navigation_grid.copy()
+        temp_grid = base_grid
         if avoid_robots and robot_id is not None and robots is not None:
-            for other_robot in robots:
-                if other_robot.id != robot_id:
-                    rx, ry = other_robot.position
-                    rgx, rgy = int(rx // self.warehouse.grid_size), int(ry // self.warehouse.grid_size)
-                    radius = 2
-                    for dx in range(-radius, radius+1):
-                        for dy in range(-radius, radius+1):
-                            nx, ny = rgx + dx, rgy + dy
-                            if 0 <= nx < self.warehouse.grid_width and 0 <= ny < self.warehouse.grid_height:
-                                temp_grid[ny, nx] = False
+            temp_grid = self._block_other_robots(base_grid, robot_id, robots)
         
-        # A* algorithm implementation
-        open_set = []
-        heapq.heappush(open_set, (0, start_grid))
-        came_from = {}
-        g_score = {start_grid: 0}
-        f_score = {start_grid: math.sqrt((start_grid[0] - end_grid[0])**2 + (start_grid[1] - end_grid[1])**2)}
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
-        
-        while open_set:
-            _, current = heapq.heappop(open_set)
-            if current == end_grid:
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                
-                return [(x * self.warehouse.grid_size + self.warehouse.grid_size // 2, 
-                        y * self.warehouse.grid_size + self.warehouse.grid_size // 2) 
-                        for x, y in reversed(path)]
-            
-            for dx, dy in directions:
-                neighbor = (current[0] + dx, current[1] + dy)
-                if (0 <= neighbor[0] < self.warehouse.grid_width and 0 <= neighbor[1] < self.warehouse.grid_height and  temp_grid[neighbor[1], neighbor[0]]):
-                    move_cost = 1.4 if abs(dx) + abs(dy) == 2 else 1.0
-                    tentative_g = g_score.get(current, float('inf')) + move_cost
-                    if tentative_g < g_score.get(neighbor, float('inf')):
-                        came_from[neighbor] = current
-                        g_score[neighbor] = tentative_g
-                        f_score[neighbor] = tentative_g + math.sqrt((neighbor[0] - end_grid[0])**2 + (neighbor[1] - end_grid[1])**2)
-                        
-                        if neighbor not in [i[1] for i in open_set]:
-                            heapq.heappush(open_set, (f_score[neighbor], neighbor))
-        
-        return None
+        path = self._a_star(start_grid, end_grid, temp_grid, self._cost_layer(radius), deadline=deadline)
+        if path and path[-1] != self._cell_center(end_grid):
+            return None  # Ran out of time; only complete legs are any use to the waypoint search
+        return path
     
-    def _generate_fallback_path(self, start, end, robot_id, robots, aisles=None):
+    def _generate_fallback_path(self, start, end, robot_id, robots, aisles=None, deadline=None):
         if aisles is None:
             margin = 50
             waypoints = [
@@ -184,13 +484,17 @@ class Pathfinding:
         shortest_length = float('inf')
         
         for w1 in waypoints:
-            path1 = self._try_a_star_path(start, w1, robot_id, robots, avoid_robots=False)
+            if deadline is not None and time.perf_counter() > deadline:
+                break  # Keep the best detour found so far, or fall through to the perimeter route
+            path1 = self._try_a_star_path(start, w1, robot_id, robots, avoid_robots=False, deadline=deadline)
             if path1:
                 for w2 in waypoints:
+                    if deadline is not None and time.perf_counter() > deadline:
+                        break
                     if w1 != w2:
-                        path2 = self._try_a_star_path(w1, w2, robot_id, robots, avoid_robots=False)
+                        path2 = self._try_a_star_path(w1, w2, robot_id, robots, avoid_robots=False, deadline=deadline)
                         if path2:
-                            path3 = self._try_a_star_path(w2, end, robot_id, robots, avoid_robots=False)
+                            path3 = self._try_a_star_path(w2, end, robot_id, robots, avoid_robots=False, deadline=deadline)
                             if path3:
                                 full_path = path1[:-1] + path2[:-1] + path3
                                 path_length = sum(self.distance_between(full_path[i], full_path[i+1]) 
@@ -0,0 +1,61 @@
+import numpy as np
+
+class Pick_Plan:
+    # Compiled once per order: pick coordinates as an array, bitmasks over the picks for what is
+    # still to collect / already rewarded, and the path index at which each group of picks happens
+    def __init__(self, items, coords):
+        self.items = list(items)
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.remaining = (1 << len(self.items)) - 1
+        self.rewarded = 0
+        self.waypoint_picks = {}
+        self.location_bits = {}
+        for i, coord in enumerate(coords):
+            key = tuple(coord)
+            self.location_bits[key] = self.location_bits.get(key, 0) | (1 << i)
+
+    def mark_route(self, path_indices, locations):
+        self.waypoint_picks = {}
+        for index, location in zip(path_indices, locations):
+            bits = self.location_bits.get(tuple(location), 0)
+            if bits:
+                self.waypoint_picks[index] = self.waypoint_picks.get(index, 0) | bits
+
+    def mark_along(self, path, start=0, max_dist=20):
+        # Adds a waypoint for every pick still to do that path[start:] passes within max_dist of, at
+        # its closest point, so a replanned path keeps the picks it still goes by
+        pending = [i for i in range(len(self.items)) if self.remaining >> i & 1]
+        if not pending or len(path) <= start:
+            return
+        points = np.asarray(path[start:], dtype=float).reshape(-1, 2)
+        offsets = points[None, :, :] - self.coords[pending][:, None, :]
+        distances = np.einsum('ijk,ijk->ij', offsets, offsets)
+        nearest = distances.argmin(axis=1)
+        for k, i in enumerate(pending):
+            if distances[k, nearest[k]] < max_dist * max_dist:
+                index = start + int(nearest[k])
+                self.waypoint_picks[index] = self.waypoint_picks.get(index, 0) | (1 << i)
+
+    def picks_at(self, path_index):
+        return self.waypoint_picks.get(path_index, 0) & self.remaining
+
+    def bits_near(self, position, max_dist):
+        if not len(self.coords):
+            return 0
+        offsets = self.coords - position
+        near = np.flatnonzero(np.einsum('ij,ij->i', offsets, offsets) < max_dist * max_dist)
+        bits = 0
+        for i in near:
+            bits |= 1 << int(i)
+        return bits
+
+    def items_in(self, bits):
+        return [self.items[i] for i in range(len(self.items)) if bits >> i & 1]
+
+    def take(self, bits):
+        bits &= self.remaining
+        self.remaining &= ~bits
+        return self.items_in(bits)
+
+    def remaining_coords(self):
+        return [tuple(self.coords[i]) for i in range(len(self.items)) if self.remaining >> i & 1]
@@ -0,0 +1,204 @@
+import threading
+import numpy as np
+
+class Q_Table:
+    # Dense Q-values, one row per discretized state tuple. table[state] returns the row as a
+    # writable view, so table[state][action] reads and writes like the nested defaultdict it replaces.
+    def __init__(self, num_actions, capacity=256):
+        self.num_actions = num_actions
+        self.values = np.zeros((capacity, num_actions))
+        self.state_index = {}
+        self.states = []
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, state):
+        return state in self.state_index
+
+    def __getitem__(self, state):
+        return self.values[self.state_id(state)]
+
+    def _grow(self, needed):
+        capacity = self.values.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        values = np.zeros((capacity, self.num_actions))
+        values[:len(self.states)] = self.values[:len(self.states)]
+        self.values = values
+
+    def state_id(self, state, add=True):
+        index = self.state_index.get(state)
+        if index is None:
+            if not add:
+                return -1
+            index = len(self.states)
+            self._grow(index + 1)
+            self.state_index[state] = index
+            self.states.append(state)
+        return index
+
+    def state_ids(self, states, add=True):
+        return np.fromiter((self.state_id(state, add) for state in states), dtype=np.int64, count=len(states))
+
+    def items(self):
+        for index, state in enumerate(self.states):
+            yield state, self.values[index]
+
+    def rows(self, state_ids):
+        return self.values[state_ids]
+
+    def set_value(self, state, action, value):
+        state_id = self.state_id(state)  # May grow values, so look it up first
+        self.values[state_id, action] = value
+
+    def update(self, state_ids, actions, rewards, next_state_ids, alpha, gamma, weights=None):
+        # Batched one-step Q-learning; repeated (state, action) pairs accumulate their deltas
+        next_max = self.values[next_state_ids].max(axis=1)
+        td_error = rewards + gamma * next_max - self.values[state_ids, actions]
+        step = alpha * td_error if weights is None else alpha * weights * td_error
+        np.add.at(self.values, (state_ids, actions), step)
+        return td_error
+
+class Shared_Q_Table(Q_Table):
+    # One Q-store for the whole fleet. Adding rows and applying updates take a lock, so worker
+    # threads can train against it directly. Worker processes train on a pickled copy instead:
+    # checkpoint() before, deltas() after, and the owner merge()s the deltas keyed by state.
+    def __init__(self, num_actions, capacity=256):
+        super().__init__(num_actions, capacity)
+        self.lock = threading.Lock()
+        self.baseline = np.zeros((0, num_actions))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def state_id(self, state, add=True):
+        index = self.state_index.get(state)
+        if index is not None or not add:
+            return -1 if index is None else index
+        with self.lock:
+            return Q_Table.state_id(self, state)
+
+    def apply(self, state_ids, actions, steps):
+        with self.lock:
+            np.add.at(self.values, (state_ids, actions), steps)
+
+    def update(self, state_ids, actions, rewards, next_state_ids, alpha, gamma, weights=None):
+        with self.lock:
+            return Q_Table.update(self, state_ids, actions, rewards, next_state_ids, alpha, gamma, weights)
+
+    def set_value(self, state, action, value):
+        state_id = self.state_id(state)
+        with self.lock:
+            self.values[state_id, action] = value
+
+    def checkpoint(self):
+        with self.lock:
+            self.baseline = self.values[:len(self.states)].copy()
+
+    def deltas(self):
+        # States whose values moved since the last checkpoint, with how far they moved
+        with self.lock:
+            diff = self.values[:len(self.states)].copy()
+            diff[:len(self.baseline)] -= self.baseline
+            changed = np.flatnonzero(diff.any(axis=1))
+            return [self.states[i] for i in changed], diff[changed]
+
+    def merge(self, states, deltas):
+        with self.lock:
+            state_ids = np.fromiter((Q_Table.state_id(self, state) for state in states), dtype=np.int64, count=len(states))
+            np.add.at(self.values, state_ids, deltas)
+
+class Robot_Q_Table:
+    # One robot's view of a Shared_Q_Table with the Q_Table interface. With offsets the robot's value
+    # is shared + a small correction that learns at offset_rate of the shared step; corrections exist
+    # only for states the robot has updated, up to max_offsets, so per-robot memory stays bounded.
+    def __init__(self, shared, offsets=False, offset_rate=0.1, max_offsets=4096):
+        self.shared = shared
+        self.num_actions = shared.num_actions
+        self.offset_rate = offset_rate
+        self.max_offsets = max_offsets if offsets else 0
+        self.offset_rows = {}  # Shared state id -> row of offset_values
+        self.offset_values = np.zeros((min(64, self.max_offsets), self.num_actions))
+
+    @property
+    def states(self):
+        return self.shared.states
+
+    def __len__(self):
+        return len(self.shared)
+
+    def __contains__(self, state):
+        return state in self.shared
+
+    def __getitem__(self, state):
+        state_id = self.shared.state_id(state)
+        if not self.offset_rows:
+            return self.shared.values[state_id]  # Writable, like a plain Q_Table row
+        return self.rows(np.array([state_id]))[0]
+
+    def state_id(self, state, add=True):
+        return self.shared.state_id(state, add)
+
+    def state_ids(self, states, add=True):
+        return self.shared.state_ids(states, add)
+
+    def offset_ids(self, state_ids, add=False):
+        rows = np.fromiter((self.offset_rows.get(i, -1) for i in state_ids.tolist()), dtype=np.int64, count=len(state_ids))
+        if add:
+            for k in np.flatnonzero(rows < 0):
+                if len(self.offset_rows) >= self.max_offsets:
+                    break
+                row = self.offset_rows.setdefault(int(state_ids[k]), len(self.offset_rows))
+                if row >= len(self.offset_values):
+                    grown = np.zeros((min(2 * len(self.offset_values), self.max_offsets), self.num_actions))
+                    grown[:len(self.offset_values)] = self.offset_values
+                    self.offset_values = grown
+                rows[state_ids == state_ids[k]] = row
+        return rows
+
+    def rows(self, state_ids):
+        values = self.shared.values[state_ids]
+        if self.offset_rows:
+            offset_ids = self.offset_ids(np.asarray(state_ids))
+            known = offset_ids >= 0
+            values[known] += self.offset_values[offset_ids[known]]
+        return values
+
+    def items(self):
+        for state_id, state in enumerate(self.shared.states):
+            yield state, self.rows(np.array([state_id]))[0]
+
+    def corrected_items(self):
+        # Combined values for just the states this robot holds a correction for
+        for state_id in list(self.offset_rows):
+            yield self.shared.states[state_id], self.rows(np.array([state_id]))[0]
+
+    def set_value(self, state, action, value):
+        if not self.max_offsets:
+            self.shared.set_value(state, action, value)
+            return
+        state_id = self.shared.state_id(state)
+        row = self.offset_ids(np.array([state_id]), add=True)[0]
+        if row >= 0:
+            self.offset_values[row, action] = value - self.shared.values[state_id, action]
+
+    def update(self, state_ids, actions, rewards, next_state_ids, alpha, gamma, weights=None):
+        # TD errors come from this robot's combined values; the shared table takes the full step
+        next_max = self.rows(next_state_ids).max(axis=1)
+        td_error = rewards + gamma * next_max - self.rows(state_ids)[np.arange(len(state_ids)), actions]
+        step = alpha * td_error if weights is None else alpha * weights * td_error
+        self.shared.apply(state_ids, actions, step)
+        if self.max_offsets:
+            offset_ids = self.offset_ids(np.asarray(state_ids), add=True)
+            known = offset_ids >= 0
+            np.add.at(self.offset_values, (offset_ids[known], np.asarray(actions)[known]), self.offset_rate * step[known])
+        return td_error
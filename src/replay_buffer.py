@@ -0,0 +1,120 @@
+import numpy as np
+
+class Replay_Buffer:
+    # Fixed-size ring buffer of (robot id, state id, action, reward, next state id) transitions.
+    # State ids are Q_Table row indices, so storage is a handful of preallocated arrays whose
+    # memory does not change however long training runs.
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.robot_ids = np.zeros(capacity, dtype=np.int32)
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.size
+
+    def _slots(self, count):
+        slots = (self.position + np.arange(count)) % self.capacity
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+        return slots
+
+    def add(self, robot_id, state, action, reward, next_state):
+        self.add_batch([robot_id], [state], [action], [reward], [next_state])
+
+    def add_batch(self, robot_ids, states, actions, rewards, next_states):
+        slots = self._slots(len(states))
+        self.robot_ids[slots] = robot_ids
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        return slots
+
+    def sample(self, batch_size):
+        indices = np.random.randint(0, self.size, size=batch_size)
+        return indices, np.ones(batch_size)
+
+    def update_priorities(self, indices, td_errors):
+        pass
+
+    def clear(self):
+        self.size = 0
+        self.position = 0
+
+class Sum_Tree:
+    # Partial sums over a fixed number of leaves, stored heap-style in one array (root at 1,
+    # leaves from `leaves` on). Setting a batch of leaves and finding the leaves a batch of
+    # prefix sums falls in both cost O(batch * log capacity) however full the buffer is.
+    def __init__(self, capacity):
+        self.leaves = 1 << (capacity - 1).bit_length()
+        self.depth = self.leaves.bit_length() - 1
+        self.nodes = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self):
+        return self.nodes[1]
+
+    def get(self, indices):
+        return self.nodes[self.leaves + np.asarray(indices)]
+
+    def set(self, indices, values):
+        nodes = self.nodes
+        positions = self.leaves + np.asarray(indices)
+        nodes[positions] = values
+        for _ in range(self.depth):
+            positions = positions // 2  # Repeated parents just write the same sum twice
+            nodes[positions] = nodes[2 * positions] + nodes[2 * positions + 1]
+
+    def find(self, targets):
+        nodes = self.nodes
+        targets = np.array(targets, dtype=float)
+        positions = np.ones(len(targets), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * positions
+            # Rounding can leave a target just past the last non-empty leaf; never step into an empty subtree
+            go_right = (targets >= nodes[left]) & (nodes[left + 1] > 0)
+            targets -= np.where(go_right, nodes[left], 0.0)
+            positions = left + go_right
+        return positions - self.leaves
+
+    def clear(self):
+        self.nodes[:] = 0.0
+
+class Prioritized_Replay_Buffer(Replay_Buffer):
+    # Samples transitions in proportion to |TD error| ** alpha and corrects the bias with
+    # importance weights (N * P(i)) ** -beta, normalised so the largest weight is 1. The scaled
+    # priorities live in a sum tree; each batch draws one transition per equal slice of the total.
+    def __init__(self, capacity=100000, alpha=0.6, beta=0.4, epsilon=1e-3):
+        super().__init__(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.tree = Sum_Tree(capacity)
+        self.max_priority = 1.0
+
+    def add_batch(self, robot_ids, states, actions, rewards, next_states):
+        slots = super().add_batch(robot_ids, states, actions, rewards, next_states)
+        self.tree.set(slots, self.max_priority ** self.alpha)  # New transitions are replayed at least once soon
+        return slots
+
+    def sample(self, batch_size):
+        total = self.tree.total
+        targets = (np.arange(batch_size) + np.random.random(batch_size)) * (total / batch_size)
+        indices = np.minimum(self.tree.find(targets), self.size - 1)
+        probabilities = self.tree.get(indices) / total
+        weights = (self.size * probabilities) ** -self.beta
+        return indices, weights / weights.max()
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.tree.set(indices, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    def clear(self):
+        super().clear()
+        self.tree.clear()
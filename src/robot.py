@@ -1,8 +1,32 @@
 import math
+from src.pick_plan import Pick_Plan
+from src.logger import get_logger
+
+logger = get_logger(__name__)
 
 def distance_between(point1, point2):
     return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
 
+def plan_route(pathfinding, tsp_solver, robot_id, position, locations, robots=None, tsp_robots=None, deadline=None):
+    # Tour through the locations plus the A* path along it; also run by the bulk planner's workers
+    route, _ = tsp_solver.solve_tsp(locations, position, robot_id, tsp_robots, deadline)
+    full_path = []
+    stops = []  # Path index at which each route stop is reached
+
+    for i in range(len(route) - 1):
+        segment = pathfinding.find_path(route[i], route[i+1], robot_id, robots, deadline=deadline)
+        if pathfinding.last_tier == 'partial':
+            # Out of time short of this stop: end the route where the search got to; the robot
+            # replans the remaining picks from there once it arrives
+            full_path.extend(segment)
+            return route, full_path, stops
+        full_path.extend(segment[:-1])  
+        stops.append(len(full_path))
+    
+    if full_path:
+        full_path.append(route[-1]) 
+    return route, full_path, stops
+
 class Robot:
     def __init__(self, robot, warehouse):
         self.robot = robot
@@ -20,7 +44,9 @@ class Robot:
         self.radius = robot['radius']
         self.assigned_checkout = robot['assigned_checkout']
         self.reward = robot['reward']
-        self.rewarded_items = robot['rewarded_items']
+        self.pick_plan = None
+        self.charger = None
+        self.resume_goal = None  # Where to carry on to when the current path is a deadline-cut prefix
 
     def reset(self, position):
         self.position = position
@@ -31,32 +57,91 @@ class Robot:
         self.state = 'idle'
         self.current_order = None
         self.reward = 0
-        self.rewarded_items = []
+        self.pick_plan = None
+        self.charger = None
+        self.resume_goal = None
 
-    def process_robot_actions(self):
-        if self.state == 'idle' and self.order_queue:
-            self.current_order = self.order_queue[0]
-            self.state = 'collecting'
-            self.items_collected = []
-            self.rewarded_items = []
-            
-            item_locations = []
-            for item in self.current_order['items']:
-                aisle, shelf = self.warehouse.products[item]
-                if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                    item_locations.append(self.warehouse.shelf_to_coord[(aisle, shelf)])
-            
-            route, _ = self.warehouse.tsp_solver.solve_tsp(item_locations, self.position, self.id, self.warehouse.robots)
-            full_path = []
+    def start_order(self, order, robots=None):
+        self.plan_pick_route(self.begin_order(order), robots)
 
-            for i in range(len(route) - 1):
-                segment = self.warehouse.pathfinding.find_path(route[i], route[i+1], self.id)
-                full_path.extend(segment[:-1])  
-            
-            if full_path:
-                full_path.append(route[-1]) 
-                self.current_path = full_path
-                self.target_index = 0
+    def begin_order(self, order):
+        # Takes the order and sets up its pick plan; returns the shelf locations still to route through
+        self.current_order = order
+        self.state = 'collecting'
+        self.items_collected = []
+        
+        items, item_locations = [], []
+        for item in order['items']:
+            aisle, shelf = self.warehouse.products[item]
+            if (aisle, shelf) in self.warehouse.shelf_to_coord:
+                items.append(item)
+                item_locations.append(self.warehouse.shelf_to_coord[(aisle, shelf)])
+        self.pick_plan = Pick_Plan(items, item_locations)
+        return item_locations
+
+    def plan_pick_route(self, locations, robots=None):
+        return self.apply_pick_route(*plan_route(self.warehouse.pathfinding, self.warehouse.tsp_solver, self.id,
+                                                 self.position, locations, robots, self.warehouse.robots,
+                                                 self.warehouse.plan_deadline))
+
+    def route_to(self, goal):
+        # Path from here to goal under the tick's planning deadline. A partial result sets resume_goal,
+        # and the rest is planned when the robot reaches the end of it.
+        path = self.warehouse.pathfinding.find_path(self.position, goal, self.id, deadline=self.warehouse.plan_deadline)
+        self.resume_goal = goal if self.warehouse.pathfinding.last_tier == 'partial' else None
+        return path
+
+    def apply_pick_route(self, route, full_path, stops):
+        self.resume_goal = None  # Pick routes carry on through the pick plan instead
+        if full_path:
+            self.current_path = full_path
+            self.target_index = 0
+            self.pick_plan.mark_route(stops, route[1:])
+        return full_path
+
+    def collect_picks(self, bits):
+        if not bits:
+            return
+        for item in self.pick_plan.take(bits):
+            self.items_collected.append(item)
+            self.warehouse.battery.pick(self)
+            self.warehouse.metrics.inc('items_picked')
+            logger.debug("Robot %s collected %s. Total: %d/%d", self.id, item, len(self.items_collected), len(self.current_order['items']))
+
+    def follow_path(self):
+        # Plain path following with the same side-step on robot contact as the order states
+        target = self.current_path[self.target_index]
+        dx = target[0] - self.position[0]
+        dy = target[1] - self.position[1]
+        distance = math.sqrt(dx*dx + dy*dy)
+        if distance < 2:
+            self.position = target
+            self.target_index += 1
+            return
+        move_distance = min(2, distance)
+        angle = math.atan2(dy, dx)
+        for angle_offset in [0, 0.2, -0.2, 0.4, -0.4, 0.6, -0.6]:
+            test_x = self.position[0] + move_distance * math.cos(angle + angle_offset)
+            test_y = self.position[1] + move_distance * math.sin(angle + angle_offset)
+            if not self.warehouse.robots_within(self, (test_x, test_y), 2 * self.radius):
+                self.position = (test_x, test_y)
+                return
+
+    def process_robot_actions(self):
+        if self.state != 'charging' and self.warehouse.battery.is_empty(self):
+            self.warehouse.metrics.inc('stranded_ticks')
+            return
+        if self.resume_goal is not None and self.target_index >= len(self.current_path):
+            self.current_path = self.route_to(self.resume_goal)
+            self.target_index = 0
+            return
+        if self.state == 'charging':
+            if self.current_path and self.target_index < len(self.current_path):
+                self.follow_path()
+            else:
+                self.warehouse.battery.update_charging(self)
+        elif self.state == 'idle' and self.order_queue:
+            self.start_order(self.order_queue[0])
         elif self.state == 'collecting':
             if self.current_path and self.target_index < len(self.current_path):
                 target = self.current_path[self.target_index]
@@ -66,15 +151,8 @@ class Robot:
                 
                 if distance < 2:  
                     self.position = target
+                    self.collect_picks(self.pick_plan.picks_at(self.target_index))
                     self.target_index += 1
-                    for item in self.current_order['items']:
-                        if item not in self.items_collected: 
-                            aisle, shelf = self.warehouse.products[item]
-                            if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                                item_pos = self.warehouse.shelf_to_coord[(aisle, shelf)]
-                                if distance_between(self.position, item_pos) < 20:  
-                                    self.items_collected.append(item)
-                                    print(f"Robot {self.id} collected {item}. Total: {len(self.items_collected)}/{len(self.current_order['items'])}")
                 else:
                     speed = 2
                     move_distance = min(speed, distance)
@@ -82,20 +160,28 @@ class Robot:
                     new_x = self.position[0] + move_distance * math.cos(angle)
                     new_y = self.position[1] + move_distance * math.sin(angle)
                     collision = False
-                    for other_robot in self.warehouse.robots:
-                        if other_robot.id != self.id:
-                            if distance_between((new_x, new_y), other_robot.position) < 2 * self.radius:
-                                collision = True
-                                self.warehouse.collision_count += 1
-                                if not self.robot.get('collision_repath_timer', 0):
-                                    self.robot['collision_repath_timer'] = 10
-                                    current_pos = self.position
-                                    remaining_path = self.current_path[self.target_index:]
-                                    new_path = self.warehouse.pathfinding.find_path(current_pos, remaining_path[-1], self.id)
+                    if self.warehouse.robots_within(self, (new_x, new_y), 2 * self.radius):
+                        collision = True
+                        self.warehouse.collision_count += 1
+                        self.warehouse.metrics.inc('collisions')
+                        self.warehouse.pathfinding.note_collision(self.position)
+                        self.current_order['blocked_ticks'] = self.current_order.get('blocked_ticks', 0) + 1
+                        if not self.robot.get('collision_repath_timer', 0):
+                            self.robot['collision_repath_timer'] = 10
+                            self.warehouse.metrics.inc('repaths')
+                            self.current_order['repaths'] = self.current_order.get('repaths', 0) + 1
+                            current_pos = self.position
+                            remaining_path = self.current_path[self.target_index:]
+                            new_path = self.warehouse.pathfinding.find_path(current_pos, remaining_path[-1], self.id,
+                                                                            deadline=self.warehouse.plan_deadline)
+                            # A deadline-cut path stops short of the last pick; the end-of-route sweep
+                            # and replan take over from wherever it ends
+                            reached = self.warehouse.pathfinding.last_tier != 'partial'
                                     
-                                    # Replace remaining path with new path
-                                    self.current_path = self.current_path[:self.target_index] + new_path
-                                break
+                            # Replace remaining path with new path
+                            self.current_path = self.current_path[:self.target_index] + new_path
+                            self.pick_plan.mark_route([len(self.current_path) - 1] if reached else [], [remaining_path[-1]])
+                            self.pick_plan.mark_along(self.current_path, self.target_index)  # Picks the new path still passes
 
                     if self.robot.get('collision_repath_timer', 0) > 0:
                         self.robot['collision_repath_timer'] -= 1
@@ -108,56 +194,26 @@ class Robot:
                             test_x = self.position[0] + move_distance * math.cos(new_angle)
                             test_y = self.position[1] + move_distance * math.sin(new_angle)
                             
-                            alt_collision = False
-                            for other_robot in self.warehouse.robots:
-                                if other_robot.id != self.id:
-                                    if distance_between((test_x, test_y), other_robot.position) < 2 * self.radius:
-                                        alt_collision = True
-                                        break
+                            alt_collision = bool(self.warehouse.robots_within(self, (test_x, test_y), 2 * self.radius))
                             
                             if not alt_collision:
                                 self.position = (test_x, test_y)
                                 break
-                
-                for item in self.current_order['items']:
-                    if item not in self.items_collected:
-                        aisle, shelf = self.warehouse.products[item]
-                        if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                            item_pos = self.warehouse.shelf_to_coord[(aisle, shelf)]
-                            if distance_between(self.position, item_pos) < 20:
-                                self.items_collected.append(item)
-                                print(f"Robot {self.id} collected {item}. Total: {len(self.items_collected)}/{len(self.current_order['items'])}")
             
+            if self.target_index >= len(self.current_path):
+                # End of the planned route: sweep for anything the route missed
+                self.collect_picks(self.pick_plan.bits_near(self.position, 20))
             if len(self.items_collected) == len(self.current_order['items']):
-                print(f"Robot {self.id} collected all items for order {self.current_order['id']}. Heading to checkout.")
-                assigned_checkout = self.assigned_checkout
-                checkout_rect = self.warehouse.checkouts[assigned_checkout]
-                checkout_pos = (checkout_rect.centerx, checkout_rect.centery - 40)  # Position in front of checkout
-                self.current_path = self.warehouse.pathfinding.find_path(self.position, checkout_pos, self.id)
-                self.target_index = 0
+                logger.debug("Robot %s collected all items for order %s. Heading to checkout.", self.id, self.current_order['id'])
                 self.state = 'checkout'
+                self.warehouse.checkout_scheduler.book(self, self.current_order)
             elif self.target_index >= len(self.current_path):
-                remaining_items = [item for item in self.current_order['items'] 
-                                if item not in self.items_collected]
-                if remaining_items:
-                    remaining_locations = []
-                    for item in remaining_items:
-                        aisle, shelf = self.warehouse.products[item]
-                        if (aisle, shelf) in self.warehouse.shelf_to_coord:
-                            remaining_locations.append(self.warehouse.shelf_to_coord[(aisle, shelf)])
-                    
-                    if remaining_locations:
-                        route, _ = self.warehouse.tsp_solver.solve_tsp(remaining_locations, self.position, self.id, self.warehouse.robots)
-                        full_path = []
-                        for i in range(len(route) - 1):
-                            segment = self.warehouse.pathfinding.find_path(route[i], route[i+1], self.id)
-                            full_path.extend(segment[:-1])
-                        
-                        if full_path:
-                            full_path.append(route[-1])
-                            self.current_path = full_path
-                            self.target_index = 0
-                            print(f"Robot {self.id} regenerating path to {len(remaining_items)} remaining items")
+                remaining_locations = self.pick_plan.remaining_coords()
+                if remaining_locations:
+                    if self.plan_pick_route(remaining_locations):
+                        self.warehouse.metrics.inc('repaths')
+                        self.current_order['repaths'] = self.current_order.get('repaths', 0) + 1
+                        logger.debug("Robot %s regenerating path to %d remaining items", self.id, len(remaining_locations))
         elif self.state == 'checkout':
             if self.current_path and self.target_index < len(self.current_path):
                 target = self.current_path[self.target_index]
@@ -175,18 +231,19 @@ class Robot:
                     new_x = self.position[0] + move_distance * math.cos(angle)
                     new_y = self.position[1] + move_distance * math.sin(angle)
                     collision = False
-                    for other_robot in self.warehouse.robots:
-                        if other_robot.id != self.id:
-                            if distance_between((new_x, new_y), other_robot.position) < 2 * self.radius:
-                                collision = True
-                                self.warehouse.collision_count += 1
-                                if not self.robot.get('collision_repath_timer', 0):
-                                    self.robot['collision_repath_timer'] = 10 
-                                    current_pos = self.position
-                                    remaining_path = self.current_path[self.target_index:]
-                                    new_path = self.warehouse.pathfinding.find_path(current_pos, remaining_path[-1], self.id)
-                                    self.current_path = self.current_path[:self.target_index] + new_path
-                                break
+                    if self.warehouse.robots_within(self, (new_x, new_y), 2 * self.radius):
+                        collision = True
+                        self.warehouse.collision_count += 1
+                        self.warehouse.metrics.inc('collisions')
+                        self.warehouse.pathfinding.note_collision(self.position)
+                        self.current_order['blocked_ticks'] = self.current_order.get('blocked_ticks', 0) + 1
+                        if not self.robot.get('collision_repath_timer', 0):
+                            self.robot['collision_repath_timer'] = 10
+                            self.warehouse.metrics.inc('repaths')
+                            self.current_order['repaths'] = self.current_order.get('repaths', 0) + 1 
+                            remaining_path = self.current_path[self.target_index:]
+                            new_path = self.route_to(remaining_path[-1])
+                            self.current_path = self.current_path[:self.target_index] + new_path
                     
                     if self.robot.get('collision_repath_timer', 0) > 0:
                         self.robot['collision_repath_timer'] -= 1
@@ -198,19 +255,16 @@ class Robot:
                             new_angle = angle + angle_offset
                             test_x = self.position[0] + move_distance * math.cos(new_angle)
                             test_y = self.position[1] + move_distance * math.sin(new_angle)
-                            alt_collision = False
-                            for other_robot in self.warehouse.robots:
-                                if other_robot.id != self.id:
-                                    if distance_between((test_x, test_y), other_robot.position) < 2 * self.radius:
-                                        alt_collision = True
-                                        break
+                            alt_collision = bool(self.warehouse.robots_within(self, (test_x, test_y), 2 * self.radius))
                             if not alt_collision:
                                 self.position = (test_x, test_y)
                                 break
             
-            if self.target_index >= len(self.current_path):
-                print(f"Robot {self.id} completed order {self.current_order['id']} at checkout {self.assigned_checkout+1}")
-                self.current_order['status'] = 'completed'
+            if self.target_index >= len(self.current_path) and self.warehouse.checkout_scheduler.update(self):
+                logger.info("Robot %s completed order %s at checkout %d", self.id, self.current_order['id'], self.assigned_checkout + 1)
+                self.warehouse.metrics.order_completed(self.current_order, self.warehouse.tick)
+                self.warehouse.slotting.record_order(self.current_order)
+                self.warehouse.order_queue.mark(self.current_order, 'completed')
                 self.order_queue.popleft()
                 self.state = 'idle'
                 self.current_path = []
\ No newline at end of file
@@ -0,0 +1,114 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+class World_Handle:
+    # Everything a worker needs to attach: segment name, shape and dtype per array, plus the few
+    # scalars that go with them. Pickles to about a kilobyte however large the catalog is.
+    def __init__(self, key, arrays, meta):
+        self.key = key
+        self.arrays = arrays
+        self.meta = meta
+
+class Shared_World:
+    # Static world data published once into shared memory. The owner create()s it from a warehouse;
+    # workers attach() with the handle and get read-only numpy views on the same pages, so nothing
+    # heavier than the handle is pickled per worker and memory does not grow with the worker count.
+    # It has the grid attributes Pathfinding reads, so a worker can plan against it directly.
+    def __init__(self, handle, segments, owner):
+        self.handle = handle
+        self.segments = segments
+        self.owner = owner
+        self.__dict__.update(handle.meta)
+        for name, (_, shape, dtype) in handle.arrays.items():
+            array = np.ndarray(shape, dtype=dtype, buffer=segments[name].buf)
+            array.flags.writeable = False
+            setattr(self, name, array)
+
+    @classmethod
+    def create(cls, warehouse, key=None):
+        slots = sorted(warehouse.shelf_to_coord)
+        slot_index = {slot: i for i, slot in enumerate(slots)}
+        slot_distances = warehouse.slotting.slot_distances()
+        names = [name.encode() for name in warehouse.product_names]
+        arrays = {
+            'navigation_grid': warehouse.navigation_grid,
+            'cspace_grid': warehouse.pathfinding.get_cspace_grid(),
+            'shelf_slots': np.array(slots, dtype=np.int32).reshape(-1, 2),
+            'shelf_coords': np.array([warehouse.shelf_to_coord[slot] for slot in slots], dtype=float).reshape(-1, 2),
+            'product_slots': np.array([slot_index.get(tuple(warehouse.products[name]), -1) for name in warehouse.product_names], dtype=np.int32),
+            'checkout_distances': warehouse.slotting.checkout_distances(),
+            'slot_distances': np.array([slot_distances[slot] for slot in slots], dtype=float),
+            # Product names as one UTF-8 blob plus end offsets, so the catalog is shared rather than pickled
+            'product_name_bytes': np.frombuffer(b''.join(names), dtype=np.uint8),
+            'product_name_ends': np.cumsum([len(name) for name in names], dtype=np.int64)
+        }
+        segments, specs = {}, {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                segments[name] = segment
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                specs[name] = (segment.name, array.shape, array.dtype.str)
+        except Exception:
+            for segment in segments.values():
+                segment.close()
+                segment.unlink()
+            raise
+        meta = {
+            'grid_size': warehouse.grid_size,
+            'grid_width': warehouse.grid_width,
+            'grid_height': warehouse.grid_height,
+            'grid_version': warehouse.grid_version,
+            'width': warehouse.width,
+            'height': warehouse.height,
+            'robot_radius': warehouse.pathfinding.robot_radius
+        }
+        return cls(World_Handle(key, specs, meta), segments, owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        segments = {}
+        try:
+            for name, (segment_name, _, _) in handle.arrays.items():
+                segments[name] = shared_memory.SharedMemory(name=segment_name)
+        except Exception:
+            for segment in segments.values():
+                segment.close()
+            raise
+        return cls(handle, segments, owner=False)
+
+    @property
+    def product_names(self):
+        if '_product_names' not in self.__dict__:
+            blob = self.product_name_bytes.tobytes()
+            ends = self.product_name_ends.tolist()
+            self._product_names = [blob[start:end].decode() for start, end in zip([0] + ends[:-1], ends)]
+        return self._product_names
+
+    @property
+    def shelf_to_coord(self):
+        return {tuple(slot): tuple(coord) for slot, coord in zip(self.shelf_slots.tolist(), self.shelf_coords.tolist())}
+
+    @property
+    def products(self):
+        slots = self.shelf_slots.tolist()
+        return {name: tuple(slots[index]) for name, index in zip(self.product_names, self.product_slots.tolist()) if index >= 0}
+
+    def product_coords(self, names):
+        # Pick points for a list of products as an (n, 2) array; unknown or unslotted products are NaN
+        index = {name: i for i, name in enumerate(self.product_names)}
+        rows = np.array([self.product_slots[index[name]] if name in index else -1 for name in names], dtype=np.int64)
+        coords = np.full((len(rows), 2), np.nan)
+        coords[rows >= 0] = self.shelf_coords[rows[rows >= 0]]
+        return coords
+
+    def close(self):
+        # Views have to go before their segments can be closed
+        for name in self.handle.arrays:
+            self.__dict__.pop(name, None)
+        for segment in self.segments.values():
+            segment.close()
+            if self.owner:
+                segment.unlink()
+        self.segments = {}
@@ -0,0 +1,165 @@
+import heapq
+import random
+import numpy as np
+from collections import defaultdict, deque
+
+class Slotting_Optimizer:
+    # Learns pick frequency and item co-occurrence from completed orders and proposes a new
+    # product-to-slot assignment. Candidate moves swap the slots of two products, so the number of
+    # products per slot stays what the catalog layout started with.
+    def __init__(self, warehouse, history_size=500):
+        self.warehouse = warehouse
+        self.pick_counts = defaultdict(int)
+        self.pair_counts = defaultdict(int)  # (product, product) in sorted order
+        self.orders_seen = 0
+        self.history = deque(maxlen=history_size)  # Recent orders for the travel estimate
+        self.distance_cache = (None, None)
+        self.slot_distance_cache = (None, None)
+
+    def record_order(self, order):
+        items = sorted(set(order['items']))
+        for item in items:
+            self.pick_counts[item] += 1
+        for i in range(len(items)):
+            for j in range(i + 1, len(items)):
+                self.pair_counts[(items[i], items[j])] += 1
+        self.orders_seen += 1
+        self.history.append(items)
+
+    def checkout_distances(self):
+        # Walking distance from every navigable cell to the nearest checkout front, one multi-source
+        # Dijkstra per grid version
+        version, distances = self.distance_cache
+        if version == self.warehouse.grid_version:
+            return distances
+        warehouse = self.warehouse
+        grid = warehouse.navigation_grid
+        size = warehouse.grid_size
+        distances = np.full(grid.shape, np.inf)
+        heap = []
+        for checkout in warehouse.checkouts:
+            gx = min(warehouse.grid_width - 1, max(0, int(checkout.centerx // size)))
+            gy = min(warehouse.grid_height - 1, max(0, int((checkout.centery - 40) // size)))
+            distances[gy, gx] = 0.0
+            heap.append((0.0, gx, gy))
+        heapq.heapify(heap)
+        while heap:
+            dist, x, y = heapq.heappop(heap)
+            if dist > distances[y, x]:
+                continue
+            for dx, dy in warehouse.pathfinding.directions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < warehouse.grid_width and 0 <= ny < warehouse.grid_height and grid[ny, nx]:
+                    step = 1.4 if dx and dy else 1.0
+                    if dist + step < distances[ny, nx]:
+                        distances[ny, nx] = dist + step
+                        heapq.heappush(heap, (dist + step, nx, ny))
+        distances *= size
+        self.distance_cache = (warehouse.grid_version, distances)
+        return distances
+
+    def slot_distances(self):
+        version, result = self.slot_distance_cache
+        if version == self.warehouse.grid_version:
+            return result
+        distances = self.checkout_distances()
+        size = self.warehouse.grid_size
+        result = {}
+        for slot, (x, y) in self.warehouse.shelf_to_coord.items():
+            gx, gy = int(x // size), int(y // size)
+            # Pick points can sit on a blocked cell next to a shelf; take the best neighbour
+            window = distances[max(0, gy - 1):gy + 2, max(0, gx - 1):gx + 2]
+            best = window.min() if window.size else np.inf
+            result[slot] = best if np.isfinite(best) else 1e6
+        self.slot_distance_cache = (self.warehouse.grid_version, result)
+        return result
+
+    def slot_gap(self, slot_a, slot_b):
+        # Travel between two pick points: straight along an aisle, around the aisle end otherwise
+        (ax, ay), (bx, by) = self.warehouse.shelf_to_coord[slot_a], self.warehouse.shelf_to_coord[slot_b]
+        if slot_a[0] == slot_b[0]:
+            return abs(ay - by)
+        return abs(ax - bx) + abs(ay - by)
+
+    def cost(self, mapping, slot_distances, pair_weight):
+        total = sum(self.pick_counts[item] * slot_distances[mapping[item]] for item in self.pick_counts)
+        total += pair_weight * sum(count * self.slot_gap(mapping[a], mapping[b]) for (a, b), count in self.pair_counts.items())
+        return total
+
+    def tour_estimate(self, slots, slot_distances):
+        # Nearest-neighbour tour: nearest checkout out to the picks and back
+        slots = set(slots)
+        if not slots:
+            return 0.0
+        current = min(slots, key=lambda slot: slot_distances[slot])
+        tour = slot_distances[current]
+        slots.discard(current)
+        while slots:
+            nearest = min(slots, key=lambda slot: self.slot_gap(current, slot))
+            tour += self.slot_gap(current, nearest)
+            slots.discard(nearest)
+            current = nearest
+        return tour + slot_distances[current]
+
+    def estimate_travel(self, mapping, slot_distances):
+        # Mean tour per recent order
+        if not self.history:
+            return 0.0
+        total = 0.0
+        for items in self.history:
+            total += self.tour_estimate({mapping[item] for item in items if item in mapping}, slot_distances)
+        return total / len(self.history)
+
+    def optimize(self, iterations=20000, pair_weight=0.5, seed=None):
+        products = self.warehouse.products
+        mapping = dict(products)
+        slot_distances = self.slot_distances()
+        rng = random.Random(self.warehouse.seed if seed is None else seed)
+        names = [name for name in self.warehouse.product_names if mapping[name] in slot_distances]
+        partners = defaultdict(list)
+        for (a, b), count in self.pair_counts.items():
+            partners[a].append((b, count))
+            partners[b].append((a, count))
+
+        def item_cost(item, slot, skip=None):
+            cost = self.pick_counts.get(item, 0) * slot_distances[slot]
+            for other, count in partners.get(item, ()):
+                if other != skip:
+                    cost += pair_weight * count * self.slot_gap(slot, mapping[other])
+            return cost
+
+        current_cost = self.cost(mapping, slot_distances, pair_weight)
+        cost = current_cost
+        if len(names) > 1 and self.pick_counts:
+            # Only picked products can improve the objective, so one side of each swap is one of them
+            picked = [name for name in names if name in self.pick_counts]
+            for _ in range(iterations):
+                a = rng.choice(picked)
+                b = rng.choice(names)
+                slot_a, slot_b = mapping[a], mapping[b]
+                if slot_a == slot_b:
+                    continue
+                before = item_cost(a, slot_a) + item_cost(b, slot_b, skip=a)
+                mapping[a], mapping[b] = slot_b, slot_a
+                after = item_cost(a, slot_b) + item_cost(b, slot_a, skip=a)
+                if after < before - 1e-9:
+                    cost += after - before
+                else:
+                    mapping[a], mapping[b] = slot_a, slot_b
+        before_travel = self.estimate_travel(products, slot_distances)
+        after_travel = self.estimate_travel(mapping, slot_distances)
+        return {
+            'mapping': mapping,
+            'moves': sum(1 for name in names if mapping[name] != products[name]),
+            'current_cost': current_cost,
+            'proposed_cost': cost,
+            'travel_per_order': before_travel,
+            'proposed_travel_per_order': after_travel,
+            'travel_saved_per_order': before_travel - after_travel
+        }
+
+    def apply(self, proposal):
+        # Orders already compiled into pick plans keep their pick coordinates; new orders use the
+        # new slots
+        self.warehouse.apply_slotting(proposal['mapping'])
+        return proposal['moves']
@@ -0,0 +1,245 @@
+import os
+import pickle
+import random
+import time
+import zlib
+import multiprocessing
+import numpy as np
+from src.geometry import Rect
+from src.pick_plan import Pick_Plan
+from src.trace import WORLD_PARAMS, STATES, STATE_CODES
+
+SNAPSHOT_VERSION = 6
+
+def snapshot(warehouse, compress=False):
+    # Robot state goes into flat arrays (paths concatenated with offsets) and orders are stored once
+    # and referenced by id, so the buffer stays small and identity between queues survives a restore
+    robots = warehouse.robots
+    path_lengths = [len(robot.current_path) for robot in robots]
+    paths = np.array([point for robot in robots for point in robot.current_path], dtype=float).reshape(-1, 2)
+    orders = {order['id']: order for order in warehouse.order_queue}
+    for robot in robots:
+        for order in robot.order_queue:
+            orders[order['id']] = order
+        if robot.current_order:
+            orders[robot.current_order['id']] = robot.current_order
+    plans = []
+    for robot in robots:
+        plan = robot.pick_plan
+        plans.append(None if plan is None else (plan.items, plan.coords, plan.remaining, plan.rewarded,
+                                                plan.waypoint_picks, plan.location_bits))
+    state = {
+        'version': SNAPSHOT_VERSION,
+        'params': {param: getattr(warehouse, param) for param in WORLD_PARAMS},
+        'tick': warehouse.tick,
+        'collision_count': warehouse.collision_count,
+        'grid_version': warehouse.grid_version,
+        'grid_shape': warehouse.navigation_grid.shape,
+        'grid': np.packbits(warehouse.navigation_grid),
+        'obstacles': [tuple(obstacle) for obstacle in warehouse.obstacles],
+        'shelves': [tuple(shelf) for shelf in warehouse.shelves],
+        'closed_aisles': sorted(warehouse.closed_aisles),
+        'products': warehouse.products,
+        'orders': list(orders.values()),
+        'queue_status': {status: list(by_id) for status, by_id in warehouse.order_queue.by_status.items()},
+        'completed_count': warehouse.order_queue.completed_count,
+        'rejected_count': warehouse.order_queue.rejected_count,
+        'next_order_id': warehouse.order_allocator.next_order_id,
+        'positions': np.array([robot.position for robot in robots], dtype=float).reshape(-1, 2),
+        'states': np.array([STATE_CODES.get(robot.state, 255) for robot in robots], dtype=np.uint8),
+        'target_index': np.array([robot.target_index for robot in robots], dtype=np.int32),
+        'assigned_checkout': np.array([robot.assigned_checkout for robot in robots], dtype=np.int32),
+        'reward': np.array([robot.reward for robot in robots], dtype=float),
+        'repath_timer': np.array([robot.robot.get('collision_repath_timer', 0) for robot in robots], dtype=np.int32),
+        'path_lengths': np.array(path_lengths, dtype=np.int32),
+        'paths': paths,
+        'current_order': [robot.current_order['id'] if robot.current_order else None for robot in robots],
+        'robot_queues': [[order['id'] for order in robot.order_queue] for robot in robots],
+        'items_collected': [list(robot.items_collected) for robot in robots],
+        'pick_plans': plans,
+        'chargers': [robot.charger for robot in robots],
+        'resume_goals': [robot.resume_goal for robot in robots],
+        'battery_levels': warehouse.battery.levels.copy(),
+        'battery_docked': warehouse.battery.docked.copy(),
+        'charger_queues': [list(queue) for queue in warehouse.battery.charger_queues],
+        'charge_wait_start': dict(warehouse.battery.wait_start),
+        'charge_approaching': sorted(warehouse.battery.approaching),
+        'checkout_lines': [list(line) for line in warehouse.checkout_scheduler.lines],
+        'checkout_booked_until': list(warehouse.checkout_scheduler.booked_until),
+        'checkout_bookings': dict(warehouse.checkout_scheduler.bookings),
+        'checkout_service_end': dict(warehouse.checkout_scheduler.service_end),
+        'checkout_ranks': dict(warehouse.checkout_scheduler.ranks),
+        'traffic_heat': warehouse.pathfinding.traffic_heat.copy(),
+        'traffic_window': warehouse.pathfinding.traffic_window.copy(),
+        'traffic_ticks': warehouse.pathfinding.traffic_ticks,
+        'traffic_cost': None if warehouse.pathfinding.traffic_cost is None else warehouse.pathfinding.traffic_cost.copy(),
+        'traffic_epoch': warehouse.pathfinding.traffic_epoch,
+        'collision_cells': list(warehouse.pathfinding.collision_cells),
+        'random_state': random.getstate(),
+        'np_random_state': np.random.get_state()
+    }
+    buffer = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    return zlib.compress(buffer, 1) if compress else buffer
+
+def restore_into(warehouse, buffer):
+    # The warehouse must have been built with the same world parameters; layout geometry is derived
+    # from them and only the mutable parts (grid, obstacles, catalog, robots, orders) are overwritten
+    if buffer[:1] != b'\x80':
+        buffer = zlib.decompress(buffer)
+    state = pickle.loads(buffer)
+    warehouse.tick = state['tick']
+    warehouse.collision_count = state['collision_count']
+    grid = np.unpackbits(state['grid'], count=int(np.prod(state['grid_shape']))).astype(bool)
+    warehouse.navigation_grid = grid.reshape(state['grid_shape'])
+    warehouse.grid_version = state['grid_version'] + 1  # Anything cached against the old grid is stale
+    warehouse.obstacles = [Rect(obstacle) for obstacle in state['obstacles']]
+    warehouse.shelves = [Rect(shelf) for shelf in state['shelves']]
+    warehouse.closed_aisles = set(state['closed_aisles'])
+    pathfinding = warehouse.pathfinding
+    pathfinding.clear_caches()
+    # The heatmap steers every plan, so a restored copy has to carry on from the same costs and epoch
+    pathfinding.traffic_heat = state['traffic_heat'].copy()
+    pathfinding.traffic_window = state['traffic_window'].copy()
+    pathfinding.traffic_ticks = state['traffic_ticks']
+    pathfinding.traffic_cost = None if state['traffic_cost'] is None else state['traffic_cost'].copy()
+    pathfinding.traffic_epoch = state['traffic_epoch']
+    pathfinding.collision_cells = list(state['collision_cells'])
+    warehouse.bulk_planner.reset()
+    for listener in warehouse.layout_listeners:
+        listener(None)
+    warehouse.products = state['products']
+    warehouse.product_names = list(warehouse.products.keys())
+    warehouse.invalidate_static()
+
+    orders = {order['id']: order for order in state['orders']}
+    queue = warehouse.order_queue
+    queue.by_status = {status: {order_id: orders[order_id] for order_id in ids} for status, ids in state['queue_status'].items()}
+    queue.completed_count = state['completed_count']
+    queue.rejected_count = state['rejected_count']
+    warehouse.order_allocator.next_order_id = state['next_order_id']
+
+    num_robots = len(state['positions'])
+    del warehouse.robots[num_robots:]
+    while len(warehouse.robots) < num_robots:
+        warehouse.create_robot()
+    warehouse.num_robots = num_robots
+    offsets = np.concatenate([[0], np.cumsum(state['path_lengths'])])
+    for i, robot in enumerate(warehouse.robots):
+        robot.position = tuple(state['positions'][i])
+        robot.state = STATES[state['states'][i]]
+        robot.target_index = int(state['target_index'][i])
+        robot.assigned_checkout = int(state['assigned_checkout'][i])
+        robot.reward = float(state['reward'][i])
+        robot.robot['collision_repath_timer'] = int(state['repath_timer'][i])
+        robot.current_path = [tuple(point) for point in state['paths'][offsets[i]:offsets[i + 1]]]
+        current = state['current_order'][i]
+        robot.current_order = orders[current] if current is not None else None
+        robot.order_queue.clear()
+        robot.order_queue.extend(orders[order_id] for order_id in state['robot_queues'][i])
+        robot.items_collected = list(state['items_collected'][i])
+        plan = state['pick_plans'][i]
+        if plan is None:
+            robot.pick_plan = None
+        else:
+            items, coords, remaining, rewarded, waypoint_picks, location_bits = plan
+            robot.pick_plan = Pick_Plan(items, coords)
+            robot.pick_plan.remaining = remaining
+            robot.pick_plan.rewarded = rewarded
+            robot.pick_plan.waypoint_picks = waypoint_picks
+            robot.pick_plan.location_bits = location_bits
+        robot.charger = state['chargers'][i]
+        robot.resume_goal = state['resume_goals'][i]
+    battery = warehouse.battery
+    battery.levels = state['battery_levels'].copy()
+    battery.docked = state['battery_docked'].copy()
+    battery.last_positions = state['positions'].copy()
+    battery.charger_queues = [list(queue) for queue in state['charger_queues']]
+    battery.wait_start = dict(state['charge_wait_start'])
+    battery.approaching = set(state['charge_approaching'])
+    scheduler = warehouse.checkout_scheduler
+    scheduler.lines = [list(line) for line in state['checkout_lines']]
+    scheduler.booked_until = list(state['checkout_booked_until'])
+    scheduler.bookings = dict(state['checkout_bookings'])
+    scheduler.service_end = dict(state['checkout_service_end'])
+    scheduler.ranks = dict(state['checkout_ranks'])
+    random.setstate(state['random_state'])
+    np.random.set_state(state['np_random_state'])
+    warehouse.index_robots()
+    return warehouse
+
+def restore(buffer, warehouse_class):
+    if buffer[:1] != b'\x80':
+        buffer = zlib.decompress(buffer)
+    params = pickle.loads(buffer)['params']
+    return restore_into(warehouse_class(**params), buffer)
+
+def apply_scenario(warehouse, scenario):
+    for _ in range(scenario.get('add_robots', 0)):
+        warehouse.create_robot()
+    for aisle in scenario.get('block_aisles', []):
+        warehouse.close_aisle(aisle)
+    if 'seed' in scenario:
+        random.seed(scenario['seed'])
+        np.random.seed(scenario['seed'])
+
+def evaluate(warehouse, ticks, order_interval=120, max_active_orders=9):
+    # Headless stepping with the same auto-generation rule as the interactive loop
+    start_completed = warehouse.order_queue.completed_count
+    start_collisions = warehouse.collision_count
+    start_picks = warehouse.metrics.counter('items_picked').value
+    utilization = 0.0
+    start_time = time.perf_counter()
+    for tick in range(ticks):
+        if order_interval and tick % order_interval == order_interval - 1 and len(warehouse.order_queue) < max_active_orders:
+            warehouse.submit_order(warehouse.order_allocator.generate_order())
+        warehouse.step()
+        utilization += sum(robot.state != 'idle' for robot in warehouse.robots) / max(1, len(warehouse.robots))
+    cycle = warehouse.metrics.histogram('order_cycle_ticks').summary()
+    return {
+        'robots': len(warehouse.robots),
+        'ticks': ticks,
+        'orders_completed': warehouse.order_queue.completed_count - start_completed,
+        'items_picked': warehouse.metrics.counter('items_picked').value - start_picks,
+        'collisions': warehouse.collision_count - start_collisions,
+        'active_orders': len(warehouse.order_queue),
+        'utilization': utilization / ticks if ticks else 0.0,
+        'cycle_p50': cycle['p50'],
+        'cycle_p95': cycle['p95'],
+        'wall_seconds': time.perf_counter() - start_time
+    }
+
+def _run_scenario(args):
+    buffer, warehouse_class, scenario, ticks, order_interval = args
+    warehouse = restore(buffer, warehouse_class)
+    apply_scenario(warehouse, scenario)
+    result = evaluate(warehouse, ticks, order_interval)
+    result['scenario'] = scenario.get('name', 'scenario')
+    return result
+
+def fork_scenarios(warehouse, scenarios, ticks=3000, order_interval=120, processes=None, context='spawn'):
+    # Every scenario starts from the same snapshot in its own headless worker process. Spawned
+    # workers avoid inheriting the parent's display connection.
+    buffer = snapshot(warehouse)
+    jobs = [(buffer, type(warehouse), scenario, ticks, order_interval) for scenario in scenarios]
+    if processes == 0:
+        return [_run_scenario(job) for job in jobs]
+    pool = multiprocessing.get_context(context).Pool(processes or min(len(jobs), os.cpu_count() or 1))
+    try:
+        return pool.map(_run_scenario, jobs)
+    finally:
+        # Workers are shut down through the task queue so each one exits cleanly rather than being terminated
+        pool.close()
+        pool.join()
+
+def comparison_report(results):
+    columns = ('scenario', 'robots', 'orders_completed', 'items_picked', 'collisions', 'utilization', 'cycle_p50', 'cycle_p95')
+    baseline = results[0] if results else None
+    lines = ['  '.join(f"{column:>16}" for column in columns) + f"  {'orders vs base':>16}"]
+    for result in results:
+        cells = []
+        for column in columns:
+            value = result[column]
+            cells.append(f"{value:>16.2f}" if isinstance(value, float) else f"{value!s:>16}")
+        change = result['orders_completed'] - baseline['orders_completed']
+        lines.append('  '.join(cells) + f"  {change:>+16d}")
+    return '\n'.join(lines)
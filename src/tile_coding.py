@@ -0,0 +1,149 @@
+import threading
+import numpy as np
+
+ROBOT_STATES = {'idle': 0, 'collecting': 1, 'checkout': 2, 'charging': 3}
+ABSENT = 50  # Offset standing in for a missing obstacle or robot; far outside the 100 px neighbourhood
+
+# Feature columns: 0-1 coarse cell, 2-3 waypoint offset, 4-9 three obstacle offsets, 10-13 two robot offsets.
+# Each group is tiled on its own, so what is learned about one part of the state carries over to
+# every state that shares it instead of waiting for the exact tuple to come round again.
+TILE_GROUPS = (
+    (),                    # Bias per robot state
+    (0, 1),                # Where on the floor
+    (2, 3),                # Direction to the next waypoint
+    (2, 3, 4, 5),          # Waypoint against the nearest obstacle
+    (2, 3, 10, 11),        # Waypoint against the nearest robot
+    (4, 5, 6, 7, 8, 9),    # Obstacle layout
+    (10, 11, 12, 13),      # Robot layout
+)
+
+def state_features(state):
+    # Fixed-size vector for a discretize_state tuple
+    (grid_x, grid_y), (target_x, target_y), robot_state, obstacles, robots = state
+    obstacles = list(obstacles[:3]) + [(ABSENT, ABSENT)] * (3 - len(obstacles[:3]))
+    robots = list(robots[:2]) + [(ABSENT, ABSENT)] * (2 - len(robots[:2]))
+    return [grid_x, grid_y, target_x, target_y, *[v for offset in obstacles + robots for v in offset]], ROBOT_STATES.get(robot_state, 0)
+
+class Tile_Coded_Q:
+    # Linear Q over hashed tile codings of the state features, with the Q_Table interface so it can
+    # stand in for one. Weights are a fixed memory_size x actions array however many states are
+    # visited. State ids index a ring of cached tile indices (cache_size slots); replayed transitions
+    # whose slot has since been recycled read the newer state's tiles, so keep cache_size at or
+    # above the replay capacity.
+    def __init__(self, num_actions, num_tilings=4, tile_width=2.0, memory_size=1 << 16, cache_size=1 << 15):
+        self.num_actions = num_actions
+        self.num_tilings = num_tilings
+        self.tile_width = tile_width
+        self.memory_size = memory_size
+        self.cache_size = cache_size
+        self.tile_offsets = np.arange(num_tilings) * tile_width / num_tilings
+        self.active_tiles = len(TILE_GROUPS) * num_tilings
+        self.weights = np.zeros((memory_size, num_actions))
+        self.tiles = np.zeros((cache_size, self.active_tiles), dtype=np.int32)
+        self.slot_of = {}  # State -> cache slot
+        self.slot_states = []
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @property
+    def states(self):
+        return self.slot_states
+
+    def __len__(self):
+        return len(self.slot_states)
+
+    def __contains__(self, state):
+        return True  # Every state has an estimate, seen or not
+
+    def __getitem__(self, state):
+        return self.rows(np.array([self.state_id(state)]))[0]
+
+    def tile_indices(self, features, codes):
+        n = len(features)
+        tilings = np.arange(self.num_tilings)
+        tiles = np.empty((n, len(TILE_GROUPS), self.num_tilings), dtype=np.int64)
+        for group, columns in enumerate(TILE_GROUPS):
+            coords = np.floor((features[:, None, list(columns)] + self.tile_offsets[None, :, None]) / self.tile_width).astype(np.int64)
+            h = (group * self.num_tilings + tilings)[None, :] * 1000003 + codes[:, None]
+            for d in range(len(columns)):
+                h = h * 8191 + coords[:, :, d]  # Wraps on overflow, which is fine for a hash
+            tiles[:, group] = h % self.memory_size
+        return tiles.reshape(n, -1)
+
+    def state_ids(self, states, add=True):
+        ids = np.fromiter((self.slot_of.get(state, -1) for state in states), dtype=np.int64, count=len(states))
+        missing = np.flatnonzero(ids < 0)
+        if not add or not len(missing):
+            return ids
+        with self.lock:
+            new_states = {}
+            for i in missing:
+                state = states[i]
+                if state in self.slot_of:
+                    ids[i] = self.slot_of[state]
+                    continue
+                slot = self.next_slot
+                self.next_slot = (slot + 1) % self.cache_size
+                if slot < len(self.slot_states):
+                    del self.slot_of[self.slot_states[slot]]
+                    self.slot_states[slot] = state
+                else:
+                    self.slot_states.append(state)
+                self.slot_of[state] = slot
+                new_states[slot] = state
+                ids[i] = slot
+            if new_states:
+                encoded = [state_features(state) for state in new_states.values()]
+                features = np.array([features for features, _ in encoded], dtype=float)
+                codes = np.array([code for _, code in encoded], dtype=np.int64)
+                self.tiles[list(new_states)] = self.tile_indices(features, codes)
+        return ids
+
+    def state_id(self, state, add=True):
+        return int(self.state_ids([state], add)[0])
+
+    def rows(self, state_ids):
+        return self.weights[self.tiles[state_ids]].sum(axis=-2)
+
+    def estimate(self, state):
+        # Q-row straight from the weights; unlike table[state] it leaves the slot cache alone
+        features, code = state_features(state)
+        tiles = self.tile_indices(np.array([features], dtype=float), np.array([code], dtype=np.int64))
+        return self.weights[tiles[0]].sum(axis=0)
+
+    def items(self):
+        for slot, state in enumerate(self.slot_states):
+            yield state, self.rows(np.array([slot]))[0]
+
+    def update(self, state_ids, actions, rewards, next_state_ids, alpha, gamma, weights=None):
+        # Batched semi-gradient Q-learning; the step is split across the active tiles
+        state_ids = np.asarray(state_ids)
+        actions = np.asarray(actions)
+        next_max = self.rows(next_state_ids).max(axis=1)
+        td_error = rewards + gamma * next_max - self.rows(state_ids)[np.arange(len(state_ids)), actions]
+        step = alpha * td_error if weights is None else alpha * weights * td_error
+        with self.lock:
+            np.add.at(self.weights, (self.tiles[state_ids], actions[:, None]), (step / self.active_tiles)[:, None])
+        return td_error
+
+class Tile_Greedy_Policy:
+    # Frozen-policy view of a tile-coded model with the dict interface act_greedy uses. The best
+    # action is worked out from the weights for any state, visited or not; states with no estimate
+    # at all (an all-zero row) get the default so the robot falls back to its path.
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, state, default=None):
+        row = self.model.estimate(state)
+        if not row.any():
+            return default
+        return int(row.argmax())
@@ -0,0 +1,281 @@
+import bisect
+import json
+import math
+import os
+import random
+import struct
+import time
+import zlib
+import numpy as np
+
+TRACE_MAGIC = b'WHTRACE1'
+RECORD_HEADER = struct.Struct('<cI')  # Record type, payload length
+CHUNK_HEADER = struct.Struct('<IIHB')  # Start tick, ticks in chunk, robots, flags
+FLAG_COMPRESSED = 1
+FLAG_WIDE_DELTAS = 2
+POSITION_SCALE = 16  # Positions are stored in 1/16 pixel fixed point
+RANDOM_HEADER = struct.Struct('<IIiidd')  # Tick, next order id, numpy position, has_gauss and cached gaussian, Python gauss_next
+STATES = ('idle', 'collecting', 'checkout', 'charging')
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+WORLD_PARAMS = ('width', 'height', 'num_aisles', 'shelves_per_aisle', 'num_robots', 'num_checkouts',
+                'num_zones', 'num_obstacles', 'num_products', 'catalog_file', 'max_pending_orders', 'seed',
+                'num_chargers')
+
+class Trace_Recorder:
+    # Writes a run as length-prefixed records: one JSON header, order arrivals as they happen and
+    # columnar chunks of per-tick robot state. Each chunk opens with absolute positions (a keyframe)
+    # followed by per-tick deltas, so any tick can be reached by decoding a single chunk.
+    def __init__(self, filename, warehouse, chunk_ticks=256, compress=True):
+        self.filename = filename
+        self.chunk_ticks = chunk_ticks
+        self.compress = compress
+        self.file = open(filename, 'wb')
+        self.file.write(TRACE_MAGIC)
+        header = {param: getattr(warehouse, param) for param in WORLD_PARAMS}
+        header['chunk_ticks'] = chunk_ticks
+        header['planning_budget_ms'] = warehouse.planning_budget_ms
+        self._write_record(b'H', json.dumps(header).encode())
+        # Whatever drew from the generators before recording started (training, say) is carried over
+        self.record_random_state(warehouse.tick, warehouse.order_allocator.next_order_id)
+        self.start_tick = None
+        self.num_robots = 0
+        self.size = 0
+        self.positions = None
+        self.states = None
+        self.order_ids = None
+        self.collected = None
+
+    def _write_record(self, kind, payload):
+        self.file.write(RECORD_HEADER.pack(kind, len(payload)))
+        self.file.write(payload)
+
+    def _start_chunk(self, tick, num_robots):
+        self.start_tick = tick
+        self.num_robots = num_robots
+        self.size = 0
+        self.positions = np.zeros((self.chunk_ticks, num_robots, 2))
+        self.states = np.zeros((self.chunk_ticks, num_robots), dtype=np.uint8)
+        self.order_ids = np.zeros((self.chunk_ticks, num_robots), dtype=np.int32)
+        self.collected = np.zeros((self.chunk_ticks, num_robots), dtype=np.uint16)
+
+    def record_order(self, tick, order):
+        self._write_record(b'O', json.dumps({'tick': tick, 'items': order['items'], 'checkout': order['checkout'],
+                                             'checkouts': order['checkouts']}).encode())
+
+    def record_random_state(self, tick, next_order_id):
+        # Written after every order is drawn, kept or not; replay restores these instead of redrawing
+        # the orders, so exploration and sampling during the steps see the same random streams
+        _, mt, gauss_next = random.getstate()
+        _, key, pos, has_gauss, cached_gaussian = np.random.get_state()
+        header = RANDOM_HEADER.pack(tick, next_order_id, pos, has_gauss, cached_gaussian,
+                                    math.nan if gauss_next is None else gauss_next)
+        self._write_record(b'R', header + np.array(mt, dtype=np.uint32).tobytes() + key.astype(np.uint32).tobytes())
+
+    def record_tick(self, warehouse):
+        robots = warehouse.robots
+        if self.size and len(robots) != self.num_robots:
+            self.flush()
+        if not self.size:
+            self._start_chunk(warehouse.tick, len(robots))
+        row = self.size
+        for i, robot in enumerate(robots):
+            self.positions[row, i] = robot.position
+            self.states[row, i] = STATE_CODES.get(robot.state, 255)
+            self.order_ids[row, i] = robot.current_order['id'] if robot.current_order else 0
+            self.collected[row, i] = len(robot.items_collected)
+        self.size += 1
+        if self.size == self.chunk_ticks:
+            self.flush()
+
+    def flush(self):
+        if not self.size:
+            return
+        n = self.size
+        fixed = np.round(self.positions[:n] * POSITION_SCALE).astype(np.int32)
+        deltas = np.diff(fixed, axis=0)
+        flags = 0
+        if len(deltas) and np.abs(deltas).max() > np.iinfo(np.int16).max:
+            flags |= FLAG_WIDE_DELTAS
+        else:
+            deltas = deltas.astype(np.int16)
+        body = b''.join([fixed[0].tobytes(), deltas.tobytes(), self.states[:n].tobytes(),
+                         self.order_ids[:n].tobytes(), self.collected[:n].tobytes()])
+        if self.compress:
+            flags |= FLAG_COMPRESSED
+            body = zlib.compress(body, 1)
+        self._write_record(b'C', CHUNK_HEADER.pack(self.start_tick, n, self.num_robots, flags) + body)
+        self.size = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+class Trace_Reader:
+    # Indexes a trace on open by walking record headers only; chunk bodies are decoded on demand
+    def __init__(self, filename):
+        self.filename = filename
+        self.header = None
+        self.orders = []
+        self.random_states = []
+        self.chunks = []  # (start tick, ticks, robots, flags, body offset, body length)
+        self.cache = (None, None)
+        with open(filename, 'rb') as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise ValueError(f"{filename} is not a warehouse trace")
+            while True:
+                raw = f.read(RECORD_HEADER.size)
+                if len(raw) < RECORD_HEADER.size:
+                    break
+                kind, length = RECORD_HEADER.unpack(raw)
+                if kind == b'C':
+                    start, ticks, robots, flags = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                    self.chunks.append((start, ticks, robots, flags, f.tell(), length - CHUNK_HEADER.size))
+                    f.seek(length - CHUNK_HEADER.size, os.SEEK_CUR)
+                    continue
+                payload = f.read(length)
+                if len(payload) < length:
+                    break  # Truncated tail from an interrupted run
+                if kind == b'H':
+                    self.header = json.loads(payload)
+                elif kind == b'O':
+                    self.orders.append(json.loads(payload))
+                elif kind == b'R':
+                    self.random_states.append(read_random_state(payload))
+        self.chunk_starts = [chunk[0] for chunk in self.chunks]
+
+    @property
+    def first_tick(self):
+        return self.chunks[0][0] if self.chunks else 0
+
+    @property
+    def last_tick(self):
+        return self.chunks[-1][0] + self.chunks[-1][1] - 1 if self.chunks else 0
+
+    def read_chunk(self, index):
+        if self.cache[0] == index:
+            return self.cache[1]
+        start, n, robots, flags, offset, length = self.chunks[index]
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            body = f.read(length)
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        delta_type = np.int32 if flags & FLAG_WIDE_DELTAS else np.int16
+        columns = {}
+        position = 0
+        for name, dtype, shape in (('keyframe', np.int32, (robots, 2)), ('deltas', delta_type, (n - 1, robots, 2)),
+                                   ('states', np.uint8, (n, robots)), ('order_ids', np.int32, (n, robots)),
+                                   ('collected', np.uint16, (n, robots))):
+            count = int(np.prod(shape))
+            columns[name] = np.frombuffer(body, dtype, count, position).reshape(shape)
+            position += count * np.dtype(dtype).itemsize
+        fixed = np.empty((n, robots, 2), dtype=np.int64)
+        fixed[0] = columns['keyframe']
+        np.cumsum(columns['deltas'], axis=0, out=fixed[1:])
+        fixed[1:] += columns['keyframe']
+        chunk = {
+            'start_tick': start,
+            'positions': fixed / POSITION_SCALE,
+            'states': columns['states'],
+            'order_ids': columns['order_ids'],
+            'collected': columns['collected']
+        }
+        self.cache = (index, chunk)
+        return chunk
+
+    def seek(self, tick):
+        index = bisect.bisect_right(self.chunk_starts, tick) - 1
+        if index < 0 or tick > self.chunks[index][0] + self.chunks[index][1] - 1:
+            raise IndexError(f"Tick {tick} is not in the trace ({self.first_tick}-{self.last_tick})")
+        chunk = self.read_chunk(index)
+        row = tick - chunk['start_tick']
+        return {
+            'tick': tick,
+            'positions': chunk['positions'][row],
+            'states': [STATES[code] if code < len(STATES) else None for code in chunk['states'][row]],
+            'order_ids': chunk['order_ids'][row],
+            'collected': chunk['collected'][row]
+        }
+
+    def frames(self, start=None):
+        start = self.first_tick if start is None else start
+        for tick in range(start, self.last_tick + 1):
+            yield self.seek(tick)
+
+    def order_source(self):
+        return Trace_Order_Source(self.orders)
+
+class Trace_Order_Source:
+    # Same polling interface as the file and socket sources; releases each recorded order at its tick
+    def __init__(self, orders):
+        self.orders = sorted(orders, key=lambda order: order['tick'])
+        self.position = 0
+        self.exhausted = not self.orders
+
+    def poll(self, tick, max_orders):
+        orders = []
+        while self.position < len(self.orders) and len(orders) < max_orders:
+            if self.orders[self.position]['tick'] > tick:
+                break
+            orders.append(self.orders[self.position])
+            self.position += 1
+        self.exhausted = self.position >= len(self.orders)
+        return orders
+
+    def close(self):
+        self.position = len(self.orders)
+
+def read_random_state(payload):
+    tick, next_order_id, pos, has_gauss, cached_gaussian, gauss_next = RANDOM_HEADER.unpack_from(payload)
+    words = np.frombuffer(payload, np.uint32, offset=RANDOM_HEADER.size)
+    return {
+        'tick': tick,
+        'next_order_id': next_order_id,
+        'random': (3, tuple(words[:625].tolist()), None if math.isnan(gauss_next) else gauss_next),
+        'np_random': ('MT19937', words[625:].copy(), pos, has_gauss, cached_gaussian)
+    }
+
+def replay_trace(filename, warehouse_class, max_ticks=None, verify=True, tolerance=0.5, use_rl=False, rl_agent=None):
+    # Rebuilds the recorded world from its seed and steps it headless as fast as possible with the
+    # recorded order arrivals, random states and planning budget. With verify, robot positions are compared against the trace each tick
+    # and the first divergence is reported.
+    reader = Trace_Reader(filename)
+    params = {param: reader.header[param] for param in WORLD_PARAMS}
+    warehouse = warehouse_class(**params)
+    warehouse.planning_budget_ms = reader.header.get('planning_budget_ms')
+    if rl_agent is not None:
+        rl_agent.warehouse = warehouse
+    source = reader.order_source()
+    random_states = reader.random_states
+    next_state = 0
+    last_tick = reader.last_tick if max_ticks is None else min(reader.last_tick, reader.first_tick + max_ticks - 1)
+    divergence = None
+    start_time = time.perf_counter()
+    while warehouse.tick < last_tick:
+        warehouse.order_allocator.ingest_orders(source)
+        latest = None
+        while next_state < len(random_states) and random_states[next_state]['tick'] <= warehouse.tick:
+            latest = random_states[next_state]
+            next_state += 1
+        if latest is not None:
+            random.setstate(latest['random'])
+            np.random.set_state(latest['np_random'])
+            warehouse.order_allocator.next_order_id = latest['next_order_id']
+        warehouse.step(use_rl, rl_agent)
+        if verify and divergence is None and warehouse.tick >= reader.first_tick:
+            frame = reader.seek(warehouse.tick)
+            positions = np.array([robot.position for robot in warehouse.robots])
+            if positions.shape != frame['positions'].shape or np.abs(positions - frame['positions']).max() > tolerance:
+                divergence = warehouse.tick
+    elapsed = time.perf_counter() - start_time
+    return {
+        'ticks': warehouse.tick,
+        'seconds': elapsed,
+        'ticks_per_second': warehouse.tick / elapsed if elapsed else float('inf'),
+        'orders': len(reader.orders),
+        'divergence_tick': divergence,
+        'warehouse': warehouse
+    }
@@ -1,10 +1,16 @@
+import time
 import numpy as np
+from collections import defaultdict
 
 class TSP_Solver:
     def __init__(self, pathfinder):
         self.pathfinder = pathfinder
+        self.tier_counts = defaultdict(int)  # 'exact', 'estimated' or 'truncated' per solved tour
     
-    def solve_tsp(self, locations, start_pos, robot_id, robots):
+    def solve_tsp(self, locations, start_pos, robot_id, robots, deadline=None):
+        # With a deadline (a time.perf_counter() value) the best tour found by then is returned: legs
+        # not planned in time are costed by straight-line distance ('estimated'), and if insertion
+        # itself runs out the rest of the stops are chained nearest-first ('truncated')
         if not locations:
             return [], 0
     
@@ -13,19 +19,41 @@ class TSP_Solver:
         if n <= 2:
             return all_locations, self.pathfinder.distance_between(start_pos, locations[0])
         
+        tier = 'exact'
         dist_matrix = np.zeros((n, n))
         for i in range(n):
             for j in range(i+1, n): 
-                path = self.pathfinder.find_path(all_locations[i], all_locations[j], robot_id, robots, False)
-                path_length = sum(self.pathfinder.distance_between(path[k], path[k+1]) for k in range(len(path)-1))
+                if deadline is not None and time.perf_counter() > deadline:
+                    tier = 'estimated'
+                    path_length = self.pathfinder.distance_between(all_locations[i], all_locations[j])
+                else:
+                    path = self.pathfinder.find_path(all_locations[i], all_locations[j], robot_id, robots, False, deadline=deadline)
+                    path_length = self.pathfinder.path_cost(path)
                 dist_matrix[i, j] = path_length
                 dist_matrix[j, i] = path_length  
         
+        route, tier = self.insertion_route(dist_matrix, deadline, tier)
+        self.tier_counts[tier] += 1
+        total_distance = sum(dist_matrix[route[i], route[i+1]] for i in range(len(route)-1))
+        final_route = [all_locations[i] for i in route]
+        return final_route, total_distance
+
+    def insertion_route(self, dist_matrix, deadline=None, tier='exact'):
+        # Cheapest-insertion tour over a distance matrix, starting from row 0. `tier` says where the
+        # distances came from and becomes 'truncated' if the deadline cuts insertion short
+        n = len(dist_matrix)
         nearest = min(range(1, n), key=lambda i: dist_matrix[0, i])
         route = [0, nearest]
         unvisited = set(range(1, n))
         unvisited.remove(nearest)
         while unvisited:
+            if deadline is not None and time.perf_counter() > deadline:
+                tier = 'truncated'
+                while unvisited:
+                    nearest = min(unvisited, key=lambda loc: dist_matrix[route[-1], loc])
+                    route.append(nearest)
+                    unvisited.remove(nearest)
+                break
             best_insertion = None
             best_cost_increase = float('inf')
             
@@ -42,6 +70,9 @@ class TSP_Solver:
             route.insert(position, loc_to_insert)
             unvisited.remove(loc_to_insert)
         
-        total_distance = sum(dist_matrix[route[i], route[i+1]] for i in range(len(route)-1))
-        final_route = [all_locations[i] for i in route]
-        return final_route, total_distance
\ No newline at end of file
+        return route, tier
+
+    def drain_tiers(self):
+        counts = dict(self.tier_counts)
+        self.tier_counts.clear()
+        return counts
\ No newline at end of file
@@ -0,0 +1,432 @@
+import math
+import random
+import numpy as np
+from collections import deque
+
+STATE_NAMES = ['idle', 'collecting', 'checkout']
+IDLE, COLLECTING, CHECKOUT = 0, 1, 2
+
+class Batched_Obstacle_Avoidance:
+    # Runs num_envs copies of the warehouse floor in lockstep. Layout, planners and Q-tables are
+    # shared with the wrapped Obstacle_Avoidance agent; robot and order state lives in (env, robot)
+    # arrays so states, action masks, rewards and Q-updates are computed for every robot at once.
+    # Robots move simultaneously within a tick, and a blocked robot side-steps or waits instead of
+    # triggering a repath. Battery drain and charging trips are not modelled, and each order goes
+    # to the checkout it was drawn with rather than through the checkout scheduler's queues;
+    # otherwise it follows Obstacle_Avoidance.act plus Robot.process_robot_actions.
+    def __init__(self, agent, num_envs=16, num_orders=2, max_steps=500, max_items=10):
+        self.agent = agent
+        self.warehouse = agent.warehouse
+        self.num_envs = num_envs
+        self.num_orders = num_orders
+        self.max_steps = max_steps
+        self.max_items = max_items
+        self.speed = 2
+
+        robots = self.warehouse.robots
+        self.num_robots = len(robots)
+        self.robot_ids = [robot.id for robot in robots]
+        self.radius = np.array([robot.radius for robot in robots], dtype=float)
+        self.actions = np.array(agent.actions, dtype=float)
+        self.bounds = np.array([self.warehouse.width, self.warehouse.height], dtype=float)
+        self.start_positions = np.array([self.warehouse.robot_start_position(i) for i in range(self.num_robots)], dtype=float)
+        self.checkout_centers = np.array([checkout.center for checkout in self.warehouse.checkouts], dtype=float)
+        self.load_layout()
+
+        E, R, K = num_envs, self.num_robots, max_items
+        self.position = np.zeros((E, R, 2))
+        self.state = np.zeros((E, R), dtype=np.int8)
+        self.path = np.zeros((E, R, 64, 2))
+        self.path_picks = np.zeros((E, R, 64), dtype=np.int64)
+        self.path_length = np.zeros((E, R), dtype=np.int64)
+        self.target_index = np.zeros((E, R), dtype=np.int64)
+        self.pick_coords = np.zeros((E, R, K, 2))
+        self.pick_valid = np.zeros((E, R, K), dtype=bool)
+        self.remaining = np.zeros((E, R, K), dtype=bool)
+        self.rewarded = np.zeros((E, R, K), dtype=bool)
+        self.order_checkout = np.zeros((E, R), dtype=np.int64)
+        self.location_bits = [[{} for _ in range(R)] for _ in range(E)]
+        self.pending_orders = [deque() for _ in range(E)]
+
+        self.steps = np.zeros(E, dtype=np.int64)
+        self.orders_completed = np.zeros(E, dtype=np.int64)
+        self.episode_reward = np.zeros(E)
+        self.episode_collisions = np.zeros(E, dtype=np.int64)
+        self.episode_items = np.zeros(E, dtype=np.int64)
+        self.finished_episodes = []
+        self.samples = 0
+        self.state_cache = {}  # Feature row bytes -> state tuple
+        self.state_cache_size = 1 << 18
+        for e in range(E):
+            self.reset_env(e)
+
+    def load_layout(self):
+        obstacles = self.warehouse.obstacles
+        self.obstacle_rects = np.array([[o.left, o.top, o.right, o.bottom] for o in obstacles], dtype=float).reshape(-1, 4)
+        self.obstacle_slots = self.agent.static_obstacle_table.shape[2]
+        # Every route goes to a pick slot or a checkout, so all envs plan against one cost-to-go
+        # field per such goal instead of searching pair by pair
+        docks = [(checkout[0], checkout[1] - 40) for checkout in self.checkout_centers.tolist()]
+        self.goals = sorted(set(self.warehouse.shelf_to_coord.values())) + docks
+        self.goal_index = {goal: k for k, goal in enumerate(self.goals)}
+        self.dock_goals = np.arange(len(self.goals) - len(docks), len(self.goals))
+        self.fields = None
+        self.fields_key = None
+
+    def goal_fields(self):
+        pathfinding = self.warehouse.pathfinding
+        key = (self.warehouse.grid_version, pathfinding.traffic_epoch)
+        if key != self.fields_key:
+            self.fields = pathfinding.cost_to_go(self.goals)
+            self.fields_key = key
+        return self.fields
+
+    def coarse_cells(self, positions):
+        return (positions / self.bounds * self.agent.grid_size).astype(np.int64)
+
+    def reset_env(self, e):
+        self.position[e] = self.start_positions
+        self.state[e] = IDLE
+        self.path_length[e] = 0
+        self.target_index[e] = 0
+        self.pick_valid[e] = False
+        self.remaining[e] = False
+        self.rewarded[e] = False
+        self.pending_orders[e] = deque()
+        for i in range(self.num_orders):
+            order = self.warehouse.order_allocator.generate_order()
+            order['checkout'] = random.randint(0, len(self.warehouse.checkouts) - 1)
+            self.pending_orders[e].append(order)
+        self.steps[e] = 0
+        self.orders_completed[e] = 0
+        self.episode_reward[e] = 0
+        self.episode_collisions[e] = 0
+        self.episode_items[e] = 0
+
+    def _set_path(self, e, r, path, picks):
+        length = len(path)
+        if length > self.path.shape[2]:
+            capacity = self.path.shape[2]
+            while capacity < length:
+                capacity *= 2
+            grown = np.zeros(self.path.shape[:2] + (capacity, 2))
+            grown[:, :, :self.path.shape[2]] = self.path
+            grown_picks = np.zeros(self.path.shape[:2] + (capacity,), dtype=np.int64)
+            grown_picks[:, :, :self.path.shape[2]] = self.path_picks
+            self.path, self.path_picks = grown, grown_picks
+        if length:
+            self.path[e, r, :length] = path
+        self.path_picks[e, r] = 0
+        for index, bits in picks.items():
+            self.path_picks[e, r, index] |= bits
+        self.path_length[e, r] = length
+        self.target_index[e, r] = 0
+
+    def plan_picks(self, e, r, locations):
+        # The tour's distance matrix is read off the goal fields and each leg walks down its goal's
+        # field, so starting an order costs lookups rather than a search per pair of stops
+        points = [tuple(self.position[e, r])] + [tuple(location) for location in locations]
+        if len(points) < 2 or any(point not in self.goal_index for point in points[1:]):
+            return self.search_picks(e, r, locations)
+        pathfinding = self.warehouse.pathfinding
+        fields = self.goal_fields()
+        goals = np.array([self.goal_index[point] for point in points[1:]])
+        cells = np.array([pathfinding.navigable_cell(point) for point in points])
+        matrix = np.zeros((len(points), len(points)))
+        matrix[:, 1:] = fields[goals[None, :], cells[:, 1, None], cells[:, 0, None]]
+        matrix = np.triu(matrix, 1)
+        matrix += matrix.T  # Costed i -> j for i < j, like solve_tsp
+        if not np.isfinite(matrix).all():
+            return self.search_picks(e, r, locations)
+        route, _ = self.warehouse.tsp_solver.insertion_route(matrix)
+        full_path = []
+        picks = {}
+        for i in range(len(route) - 1):
+            segment = pathfinding.descend(fields[goals[route[i+1] - 1]], points[route[i]])
+            if segment is None:
+                return self.search_picks(e, r, locations)
+            full_path.extend(segment[:-1])
+            bits = self.location_bits[e][r].get(points[route[i+1]], 0)
+            if bits:
+                picks[len(full_path)] = picks.get(len(full_path), 0) | bits
+        full_path.append(points[route[-1]])
+        self._set_path(e, r, full_path, picks)
+
+    def search_picks(self, e, r, locations):
+        robot_id = self.robot_ids[r]
+        start = tuple(self.position[e, r])
+        route, _ = self.warehouse.tsp_solver.solve_tsp(locations, start, robot_id, None)
+        full_path = []
+        picks = {}
+        for i in range(len(route) - 1):
+            segment = self.warehouse.pathfinding.find_path(route[i], route[i+1], robot_id)
+            full_path.extend(segment[:-1])
+            bits = self.location_bits[e][r].get(tuple(route[i+1]), 0)
+            if bits:
+                picks[len(full_path)] = picks.get(len(full_path), 0) | bits
+        if full_path:
+            full_path.append(route[-1])
+            self._set_path(e, r, full_path, picks)
+
+    def start_order(self, e, r, order):
+        locations = []
+        for item in order['items'][:self.max_items]:
+            slot = self.warehouse.products[item]
+            if slot in self.warehouse.shelf_to_coord:
+                locations.append(self.warehouse.shelf_to_coord[slot])
+        bits = {}
+        for i, location in enumerate(locations):
+            bits[tuple(location)] = bits.get(tuple(location), 0) | (1 << i)
+        self.location_bits[e][r] = bits
+        self.pick_coords[e, r] = 0
+        self.pick_coords[e, r, :len(locations)] = np.array(locations, dtype=float).reshape(-1, 2)
+        self.pick_valid[e, r] = False
+        self.pick_valid[e, r, :len(locations)] = True
+        self.remaining[e, r] = self.pick_valid[e, r]
+        self.rewarded[e, r] = False
+        self.order_checkout[e, r] = order['checkout']
+        self.state[e, r] = COLLECTING
+        self.path_length[e, r] = 0
+        self.plan_picks(e, r, locations)
+
+    def assign_orders(self):
+        for e, r in np.argwhere(self.state == IDLE):
+            if self.pending_orders[e]:
+                self.start_order(e, r, self.pending_orders[e].popleft())
+
+    def current_targets(self):
+        has_target = self.target_index < self.path_length
+        index = np.minimum(self.target_index, self.path.shape[2] - 1)
+        targets = np.take_along_axis(self.path, index[:, :, None, None], axis=2)[:, :, 0]
+        return targets, has_target
+
+    def _first_sorted(self, within, offsets, count):
+        # First `count` neighbours in index order, then sorted as (dx, dy) tuples like discretize_state
+        order = np.argsort(~within, axis=-1, kind='stable')[..., :count]
+        selected = np.take_along_axis(within, order, axis=-1)
+        picked = np.take_along_axis(offsets, order[..., None], axis=-2)
+        keys = np.where(selected, (picked[..., 0] + 1024) * 4096 + picked[..., 1] + 1024, np.iinfo(np.int64).max)
+        keys.sort(axis=-1)
+        pairs = np.stack([keys // 4096 - 1024, keys % 4096 - 1024], axis=-1)
+        return pairs, selected.sum(axis=-1)
+
+    def state_features(self):
+        cells = self.coarse_cells(self.position)
+        targets, has_target = self.current_targets()
+        target_offsets = np.where(has_target[..., None], self.coarse_cells(targets) - cells, 0)
+
+        # Static obstacle part comes straight from the agent's per-cell lookup table
+        grid_cells = (self.position // self.warehouse.grid_size).astype(np.int64)
+        grid_x = np.clip(grid_cells[..., 0], 0, self.warehouse.grid_width - 1)
+        grid_y = np.clip(grid_cells[..., 1], 0, self.warehouse.grid_height - 1)
+        obstacles = self.agent.static_obstacle_table[grid_y, grid_x] - cells[:, :, None, :]
+        num_obstacles = self.agent.static_obstacle_counts[grid_y, grid_x]
+
+        delta = self.position[:, :, None, :] - self.position[:, None, :, :]
+        within = np.einsum('erok,erok->ero', delta, delta) < 100 ** 2
+        within &= ~np.eye(self.num_robots, dtype=bool)[None]
+        offsets = cells[:, None, :, :] - cells[:, :, None, :]
+        robots, num_robots = self._first_sorted(within, offsets, 2)
+
+        return np.concatenate([
+            cells, target_offsets, self.state[..., None].astype(np.int64),
+            num_obstacles[..., None], obstacles.reshape(cells.shape[:2] + (-1,)),
+            num_robots[..., None], robots.reshape(cells.shape[:2] + (-1,))
+        ], axis=-1)
+
+    def row_to_state(self, row):
+        row = [int(v) for v in row]
+        num_obstacles = row[5]
+        obstacles = tuple((row[6 + 2*i], row[7 + 2*i]) for i in range(num_obstacles))
+        base = 6 + 2 * self.obstacle_slots
+        num_robots = row[base]
+        robots = tuple((row[base + 1 + 2*i], row[base + 2 + 2*i]) for i in range(num_robots))
+        return ((row[0], row[1]), (row[2], row[3]), STATE_NAMES[row[4]], obstacles, robots)
+
+    def state_ids(self, active):
+        # Feature rows are turned into state tuples once and then found by their raw bytes, so a
+        # tick costs one dict lookup per (env, robot) plus the Q-table's own lookup
+        features = np.ascontiguousarray(self.state_features())
+        ids = np.full(active.shape, -1, dtype=np.int64)
+        if len(self.state_cache) > self.state_cache_size:
+            self.state_cache.clear()
+        cache = self.state_cache
+        row_type = np.dtype((np.void, features.shape[-1] * features.itemsize))
+        for r, robot_id in enumerate(self.robot_ids):
+            envs = np.flatnonzero(active[:, r])
+            if not len(envs):
+                continue
+            rows = features[envs, r]
+            states = []
+            for key, row in zip(rows.view(row_type).ravel().tolist(), rows):
+                state = cache.get(key)
+                if state is None:
+                    state = cache[key] = self.row_to_state(row)
+                states.append(state)
+            ids[envs, r] = self.agent.robot_q_tables[robot_id].state_ids(states)
+        return ids
+
+    def _point_hits_obstacle(self, points):
+        if not len(self.obstacle_rects):
+            return np.zeros(points.shape[:-1], dtype=bool)
+        x, y = points[..., 0, None], points[..., 1, None]
+        rects = self.obstacle_rects
+        return ((x >= rects[:, 0]) & (x < rects[:, 2]) & (y >= rects[:, 1]) & (y < rects[:, 3])).any(axis=-1)
+
+    def _hits_robot(self, points, positions):
+        # points (E, R, ..., 2) tested against every other robot of the same env
+        extra = points.ndim - 3
+        others = positions.reshape(positions.shape[:1] + (1,) * (1 + extra) + positions.shape[1:])
+        delta = points[..., None, :] - others
+        dist_sq = np.einsum('...k,...k->...', delta, delta)
+        limit = (2 * self.radius).reshape((1, -1) + (1,) * (extra + 1)) ** 2
+        not_self = ~np.eye(self.num_robots, dtype=bool).reshape((1, self.num_robots) + (1,) * extra + (self.num_robots,))
+        return ((dist_sq < limit) & not_self).any(axis=-1)
+
+    def valid_action_mask(self):
+        candidates = self.position[:, :, None, :] + self.actions[None, None] * self.speed
+        valid = ((candidates > 0) & (candidates < self.bounds)).all(axis=-1)
+        valid &= ~self._point_hits_obstacle(candidates)
+        valid &= ~self._hits_robot(candidates, self.position)
+        valid[~valid.any(axis=-1)] = True
+        return valid
+
+    def choose_actions(self, ids, valid):
+        E, R = ids.shape
+        scores = np.random.random((E, R, len(self.actions)))
+        random_actions = np.where(valid, scores, -1).argmax(axis=-1)
+        q = np.zeros((E, R, len(self.actions)))
+        for r, robot_id in enumerate(self.robot_ids):
+            known = ids[:, r] >= 0
+            q[known, r] = self.agent.robot_q_tables[robot_id].rows(ids[known, r])
+        informed = ((q != 0) & valid).any(axis=-1)
+        masked = np.where(valid, q, -np.inf)
+        best = masked == masked.max(axis=-1, keepdims=True)
+        greedy = np.where(best, scores, -1).argmax(axis=-1)
+        explore = np.random.random((E, R)) < self.agent.epsilon
+        return np.where(explore | ~informed, random_actions, greedy)
+
+    def compute_rewards(self, old_position, new_position, active):
+        rewards = self.agent.rewards
+        reward = np.where((old_position == new_position).all(axis=-1), rewards['idle'], 0.0)
+        collided = self._point_hits_obstacle(new_position) | self._hits_robot(new_position, new_position)
+
+        delta = new_position[:, :, None, :] - self.pick_coords
+        near = (np.einsum('erkd,erkd->erk', delta, delta) < 20 ** 2) & self.pick_valid
+        new_picks = near & ~self.rewarded & active[..., None]
+        self.rewarded |= new_picks & ~collided[..., None]
+        reward += np.where(collided, 0, rewards['collect_item'] * new_picks.sum(axis=-1) - 2 * (near & self.rewarded).sum(axis=-1))
+
+        at_checkout = (self.state == CHECKOUT) & (self.target_index >= self.path_length - 1)
+        checkout_pos = self.checkout_centers[self.order_checkout] - [0, 20]
+        arrived = at_checkout & (np.linalg.norm(new_position - checkout_pos, axis=-1) < 30)
+        reward += np.where(arrived & ~collided, rewards['checkout'] + rewards['complete_order'], 0)
+
+        targets, has_target = self.current_targets()
+        closer = np.linalg.norm(new_position - targets, axis=-1) < np.linalg.norm(old_position - targets, axis=-1)
+        reward += np.where(has_target & ~collided, np.where(closer, rewards['approaching_target'], rewards['away_from_target']), 0)
+        reward = np.where(collided, rewards['collision'] + np.where((old_position == new_position).all(axis=-1), rewards['idle'], 0), reward)
+        return np.where(active, reward, 0.0), collided & active
+
+    def update_q_values(self, ids, actions, rewards, next_ids, active):
+        for r, robot_id in enumerate(self.robot_ids):
+            envs = np.flatnonzero(active[:, r])
+            if len(envs):
+                self.agent.robot_q_tables[robot_id].update(ids[envs, r], actions[envs, r], rewards[envs, r],
+                                                           next_ids[envs, r], self.agent.alpha, self.agent.gamma)
+        if self.agent.replay is not None:
+            robot_ids = np.broadcast_to(np.array(self.robot_ids), active.shape)
+            self.agent.store_transitions(robot_ids[active], ids[active], actions[active], rewards[active], next_ids[active])
+
+    def collect(self, mask, bits):
+        picked = ((bits[..., None] >> np.arange(self.max_items)) & 1).astype(bool) & self.remaining & mask[..., None]
+        self.remaining &= ~picked
+        self.episode_items += picked.sum(axis=(1, 2))
+
+    def follow_paths(self):
+        active = self.state != IDLE
+        targets, has_target = self.current_targets()
+        has_target &= active
+        delta = targets - self.position
+        distance = np.linalg.norm(delta, axis=-1)
+
+        reached = has_target & (distance < 2)
+        self.position[reached] = targets[reached]
+        index = np.minimum(self.target_index, self.path_picks.shape[2] - 1)
+        self.collect(reached, np.take_along_axis(self.path_picks, index[..., None], axis=2)[..., 0])
+        self.target_index += reached
+
+        moving = has_target & ~reached
+        angle = np.arctan2(delta[..., 1], delta[..., 0])
+        step = np.minimum(self.speed, distance)
+        blocked = moving.copy()
+        for offset in [0.0, 0.2, -0.2, 0.4, -0.4, 0.6, -0.6]:
+            candidate = self.position + step[..., None] * np.stack([np.cos(angle + offset), np.sin(angle + offset)], axis=-1)
+            free = blocked & ~self._hits_robot(candidate, self.position)
+            if offset == 0.0:
+                self.episode_collisions += (blocked & ~free).sum(axis=1)
+            self.position[free] = candidate[free]
+            blocked &= ~free
+            if not blocked.any():
+                break
+
+    def finish_paths(self):
+        done_collecting = (self.state == COLLECTING) & ~self.remaining.any(axis=-1)
+        exhausted = (self.state != IDLE) & (self.target_index >= self.path_length)
+        for e, r in np.argwhere(done_collecting | exhausted):
+            if self.state[e, r] == COLLECTING and self.remaining[e, r].any():
+                delta = self.pick_coords[e, r] - self.position[e, r]
+                near = (np.einsum('kd,kd->k', delta, delta) < 20 ** 2) & self.remaining[e, r]
+                self.episode_items[e] += near.sum()
+                self.remaining[e, r] &= ~near
+            if self.state[e, r] == COLLECTING:
+                if self.remaining[e, r].any():
+                    locations = [tuple(c) for c in self.pick_coords[e, r][self.remaining[e, r]]]
+                    self.plan_picks(e, r, locations)
+                else:
+                    dock = self.dock_goals[self.order_checkout[e, r]]
+                    path = self.warehouse.pathfinding.descend(self.goal_fields()[dock], tuple(self.position[e, r]))
+                    if path is None:
+                        path = self.warehouse.pathfinding.find_path(tuple(self.position[e, r]), self.goals[dock], self.robot_ids[r])
+                    self._set_path(e, r, path, {})
+                    self.state[e, r] = CHECKOUT
+            elif self.state[e, r] == CHECKOUT:
+                self.state[e, r] = IDLE
+                self.orders_completed[e] += 1
+
+    def step(self):
+        self.assign_orders()
+        active = self.state != IDLE
+        ids = self.state_ids(active)
+        valid = self.valid_action_mask()
+        actions = self.choose_actions(ids, valid)
+
+        old_position = self.position.copy()
+        moved = self.position + self.actions[actions] * self.speed
+        moved = np.clip(moved, self.radius[None, :, None], self.bounds - self.radius[None, :, None])
+        self.position = np.where(active[..., None], moved, old_position)
+
+        rewards, collided = self.compute_rewards(old_position, self.position, active)
+        next_ids = self.state_ids(active)
+        self.update_q_values(ids, actions, rewards, next_ids, active)
+        self.samples += int(active.sum())
+        self.episode_reward += rewards.sum(axis=1)
+        self.episode_collisions += collided.sum(axis=1)
+
+        self.follow_paths()
+        self.finish_paths()
+        self.steps += 1
+
+        finished = []
+        done = (self.orders_completed >= self.num_orders) | (self.steps >= self.max_steps)
+        for e in np.flatnonzero(done):
+            finished.append({
+                'reward': float(self.episode_reward[e]),
+                'collisions': int(self.episode_collisions[e]),
+                'items_collected': int(self.episode_items[e]),
+                'orders_completed': int(self.orders_completed[e]),
+                'steps': int(self.steps[e])
+            })
+            self.reset_env(e)
+        self.finished_episodes.extend(finished)
+        return finished
@@ -1,42 +1,114 @@
-import pygame
 import random
+import colorsys
+import csv
+import json
+import math
+import time
 import numpy as np
-from collections import deque
-from core.order import Order_Allocator
-from core.pathfinding import Pathfinding
-from core.tsp_solver import TSP_Solver
-from core.robot import Robot
+from collections import deque, defaultdict
+from src.order import Order_Allocator, Order_Queue
+from src.pathfinding import Pathfinding
+from src.tsp_solver import TSP_Solver
+from src.robot import Robot
+from src.metrics import Metrics
+from src.trace import Trace_Recorder
+from src.slotting import Slotting_Optimizer
+from src.battery import Battery_Model
+from src.checkout import Checkout_Scheduler
+from src.bulk_planner import Bulk_Planner
+from src.geometry import Rect
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+PRODUCT_CATEGORIES = {
+    "Dairy & Bakery":   ["Milk", "Cheese", "Yogurt", "Butter", "Cream", "Custard", "Bread", "Buns", "Muffins", "Scones","Cupcakes", "Cake"],
+    "Fruits & Veg":     ["Apples", "Bananas", "Oranges", "Grapes", "Strawberries", "Blueberries", "Lettuce", "Peppers", "Tomatoes", "Cucumber", "Carrots", "Onions"],
+    "Butchery":             ["Chicken", "Beef", "Pork", "Fish", "Shrimp", "Tofu","Crab","Eggs","Viennas", "Polony", "Russian","Mince Meat"],
+    "Pastries":           ["Rice", "Pasta", "Cereal", "Flour", "Sugar", "Salt","Tumeric", "Paprika", "Masala", "Parsley", "Oil", "Sauce"],
+    "Beverages":        ["Soda", "Water", "Juice", "Coffee", "Tea", "Beer", "Ice", "Wine", "Champagne", "Cider", "Vodka", "Milkshake"],
+    "Snacks":           ["Chips", "Cookies", "Crackers", "Sweets", "Chocolate", "Nuts", "Popcorns", "Energy bars", "Pretzel", "Biscuits", "Granola", "Muesli"],
+    "Toiletries":       ["Soap", "Shampoo", "Toothpaste", "Toilet Paper", "Paper Towels", "Detergent", "Face Cloth", "Spray", "Lotion", "Roll-on", "Loafer", "Toothbrush"],
+    "Cleaning":         ["Broom", "Mop", "Floor cleaner", "Pine gel", "Dustpan", "Brush", "Dishwasher", "Splunger", "Bucket", "Vaccumm", "Cloth", "Rack"]
+}
 
 class WarehouseGenerator:
-    def __init__(self, width=800, height=600, num_aisles=8, shelves_per_aisle=6):
+    def __init__(self, width=800, height=600, num_aisles=8, shelves_per_aisle=6, num_robots=3, num_checkouts=3,
+                 num_zones=1, num_obstacles=10, num_products=None, catalog_file=None, max_pending_orders=None, seed=None,
+                 num_chargers=2):
+        # Everything random (layout, orders, exploration) draws from the seeded global generators so a
+        # run can be reproduced from its seed and recorded order arrivals
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        random.seed(self.seed)
+        np.random.seed(self.seed)
         self.width = width
         self.height = height
         self.num_aisles = num_aisles
         self.shelves_per_aisle = shelves_per_aisle
+        self.num_robots = num_robots
+        self.num_checkouts = num_checkouts
+        self.num_chargers = num_chargers
+        self.num_zones = num_zones
+        self.num_obstacles = num_obstacles
+        self.num_products = num_products
+        self.catalog_file = catalog_file
+        self.max_pending_orders = max_pending_orders
         
         self.FLOOR = (240, 240, 240)
         self.SHELF = (160, 82, 45)  # Brown for shelves
         self.AISLE = (220, 220, 220) #Light gray for aisles
-        self.ROBOT = [(0, 0, 255), (255, 0, 0), (0, 255, 0)]  # Blue, Red, Green robots
+        self.ROBOT = [self.robot_color(i) for i in range(num_robots)]  # Blue, Red, Green, then evenly spread hues
         self.CHECKOUT = (255, 215, 0)  # Gold for checkout points
+        self.CHARGER = (60, 180, 75)  # Green for charging stations
         self.TEXT_COLOR = (0, 0, 0)
         self.OBSTACLE = (128, 128, 128)  # Gray for obstacles
+        self.CLOSED_AISLE = (200, 120, 120)  # Muted red for closed aisles
         
-        pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption("AI-POWERED RETAIL WAREHOUSE ROBOTIC SIMULATION")
-        self.font = pygame.font.SysFont('Arial', 12)
-        self.clock = pygame.time.Clock()
+        if not hasattr(self, 'screen'):
+            self.screen = None  # Display, font and clock are made on first use; headless runs never import pygame
+            self.font = None
+            self.clock = None
+        self.text_cache = {}
+        self.static_surface = None
+        self.dirty_rects = []
         
+        self.robot_cell_size = 50  # Spatial hash bucket size for robot neighbour queries
+        self.robot_scan_limit = 32
+        self.robot_neighbor_slack = 16  # Covers a tick of RL plus path-following movement for both robots
+        self.robot_index = None
+        self.robot_neighbor_cache = {}
         self.create_warehouse()
         self.robots = self.create_robots()
-        self.obstacles = self.create_obstacles(10)  
+        self.obstacles = self.create_obstacles(self.num_obstacles)  
+        self.grid_version = 0
+        self.closed_aisles = set()
+        if not hasattr(self, 'layout_listeners'):
+            self.layout_listeners = []  # Called with the changed rect after every live layout edit, None for the whole map
         self.products = self.create_product_database()
-        self.order_queue = []
+        self.product_names = list(self.products.keys())
+        self.slotting_version = 0  # Bumped whenever products move, so shared copies of the slots are rebuilt
+        self.order_queue = Order_Queue(max_pending_orders)
+        self.tick = 0
         self.collision_count = 0
+        self.recorder = None
+        if not hasattr(self, 'metrics'):
+            self.metrics = Metrics()  # Kept across an R reset so exports and the endpoint keep running
+        else:
+            self.metrics.restart_ticks()
         self.pathfinding = Pathfinding(self)
         self.tsp_solver = TSP_Solver(self.pathfinding)
         self.order_allocator = Order_Allocator(self)
+        self.slotting = Slotting_Optimizer(self)
+        self.battery = Battery_Model(self)
+        self.checkout_scheduler = Checkout_Scheduler(self)
+        if not hasattr(self, 'planning_budget_ms'):
+            self.planning_budget_ms = None  # Planning time per tick; None lets every search run to completion
+        self.plan_deadline = None  # Only set while a tick is stepping
+        if not hasattr(self, 'bulk_planner'):
+            self.bulk_planner = Bulk_Planner(self)  # Kept across an R reset so a started pool keeps running
+        self.bulk_planner.reset()
+        for listener in self.layout_listeners:
+            listener(None)  # An R reset rebuilt the whole layout under any listener kept from before
         
     def create_warehouse(self):
         aisle_width = 40
@@ -46,239 +118,541 @@ class WarehouseGenerator:
         
         total_aisle_space = self.width - 2 * margin
         aisle_spacing = total_aisle_space / (self.num_aisles + 1)
+        zone_height = (self.height - 2 * margin) / self.num_zones
         
         self.shelves = []
         self.aisles = []
+        self.aisle_zones = []
         self.shelf_to_coord = {}  
         
         shelf_id = 1
-        for aisle in range(self.num_aisles):
-            aisle_x = margin + aisle_spacing * (aisle + 1)
-            aisle_rect = pygame.Rect(aisle_x - aisle_width // 2, margin, 
-                                    aisle_width, self.height - 2 * margin)
-            self.aisles.append(aisle_rect)
-            
-            shelf_spacing = (self.height - 2 * margin) / (self.shelves_per_aisle + 1)
-            for shelf in range(self.shelves_per_aisle):
-                shelf_y = margin + shelf_spacing * (shelf + 1)
-                shelf_rect = pygame.Rect(aisle_x - aisle_width // 2 - shelf_width, 
-                                    shelf_y - shelf_length // 2,
-                                    shelf_width, shelf_length)
-                self.shelves.append(shelf_rect)
-                self.shelf_to_coord[(aisle+1, shelf*2+1)] = (aisle_x - aisle_width // 4, shelf_y)
-                shelf_id += 1
-            for shelf in range(self.shelves_per_aisle):
-                shelf_y = margin + shelf_spacing * (shelf + 1)
-                shelf_rect = pygame.Rect(aisle_x + aisle_width // 2, 
-                                    shelf_y - shelf_length // 2,
-                                    shelf_width, shelf_length)
-                self.shelves.append(shelf_rect)
-                self.shelf_to_coord[(aisle+1, shelf*2+2)] = (aisle_x + aisle_width // 4, shelf_y)
-                shelf_id += 1
+        for zone in range(self.num_zones):
+            zone_top = margin + zone_height * zone
+            shelf_spacing = zone_height / (self.shelves_per_aisle + 1)
+            for aisle in range(self.num_aisles):
+                aisle_number = zone * self.num_aisles + aisle + 1
+                aisle_x = margin + aisle_spacing * (aisle + 1)
+                aisle_rect = Rect(aisle_x - aisle_width // 2, zone_top, 
+                                        aisle_width, zone_height)
+                self.aisles.append(aisle_rect)
+                self.aisle_zones.append(zone)
+                
+                for shelf in range(self.shelves_per_aisle):
+                    shelf_y = zone_top + shelf_spacing * (shelf + 1)
+                    shelf_rect = Rect(aisle_x - aisle_width // 2 - shelf_width, 
+                                        shelf_y - shelf_length // 2,
+                                        shelf_width, shelf_length)
+                    self.shelves.append(shelf_rect)
+                    self.shelf_to_coord[(aisle_number, shelf*2+1)] = (aisle_x - aisle_width // 4, shelf_y)
+                    shelf_id += 1
+                for shelf in range(self.shelves_per_aisle):
+                    shelf_y = zone_top + shelf_spacing * (shelf + 1)
+                    shelf_rect = Rect(aisle_x + aisle_width // 2, 
+                                        shelf_y - shelf_length // 2,
+                                        shelf_width, shelf_length)
+                    self.shelves.append(shelf_rect)
+                    self.shelf_to_coord[(aisle_number, shelf*2+2)] = (aisle_x + aisle_width // 4, shelf_y)
+                    shelf_id += 1
         
         self.checkouts = []
         checkout_width = 40
         checkout_height = 30
-        checkout_spacing = self.width / 4
-        for i in range(3):
+        checkout_spacing = self.width / (self.num_checkouts + 1)
+        for i in range(self.num_checkouts):
             x = checkout_spacing * (i + 1) - checkout_width // 2
             y = self.height - margin // 2 - checkout_height // 2
-            self.checkouts.append(pygame.Rect(x, y, checkout_width, checkout_height))
+            self.checkouts.append(Rect(x, y, checkout_width, checkout_height))
+
+        # Charging stations sit in the top margin, facing down into the floor
+        self.chargers = []
+        charger_width = 30
+        charger_height = 16
+        charger_spacing = self.width / (self.num_chargers + 1)
+        for i in range(self.num_chargers):
+            x = charger_spacing * (i + 1) - charger_width // 2
+            y = margin // 2 - charger_height // 2 - 5
+            self.chargers.append(Rect(x, y, charger_width, charger_height))
 
         self.grid_size = 10  
         self.grid_width = self.width // self.grid_size
         self.grid_height = self.height // self.grid_size
         self.navigation_grid = np.ones((self.grid_height, self.grid_width), dtype=bool)
         
-        for shelf in self.shelves:
-            x1, y1 = shelf.topleft[0] // self.grid_size, shelf.topleft[1] // self.grid_size
-            x2, y2 = shelf.bottomright[0] // self.grid_size, shelf.bottomright[1] // self.grid_size
-            for x in range(max(0, x1), min(self.grid_width, x2 + 1)):
-                for y in range(max(0, y1), min(self.grid_height, y2 + 1)):
-                    self.navigation_grid[y, x] = False
-        for checkout in self.checkouts:
-            x1, y1 = checkout.topleft[0] // self.grid_size, checkout.topleft[1] // self.grid_size
-            x2, y2 = checkout.bottomright[0] // self.grid_size, checkout.bottomright[1] // self.grid_size
-            for x in range(max(0, x1), min(self.grid_width, x2 + 1)):
-                for y in range(max(0, y1), min(self.grid_height, y2 + 1)):
-                    self.navigation_grid[y, x] = False
+        for rect in self.shelves + self.checkouts + self.chargers:
+            self.rasterize_rect(rect)
+
+    def rect_cells(self, rect):
+        # Grid slice covered by a rect, bottom/right edges inclusive like the original cell loops
+        x1, y1 = max(0, int(rect.left // self.grid_size)), max(0, int(rect.top // self.grid_size))
+        x2 = min(self.grid_width, int(rect.right // self.grid_size) + 1)
+        y2 = min(self.grid_height, int(rect.bottom // self.grid_size) + 1)
+        return slice(y1, max(y1, y2)), slice(x1, max(x1, x2))
+
+    def rasterize_rect(self, rect, value=False, grid=None):
+        grid = self.navigation_grid if grid is None else grid
+        grid[self.rect_cells(rect)] = value
                 
+    def blocking_rects(self):
+        return self.shelves + self.checkouts + self.chargers + self.obstacles + [self.aisles[i] for i in self.closed_aisles]
+
+    def patch_layout(self, rect):
+        # Re-derives only the cells under `rect` from the blocking rects that overlap them, then
+        # invalidates what depended on those cells instead of rebuilding the warehouse
+        rows, cols = self.rect_cells(rect)
+        before = self.navigation_grid[rows, cols].copy()
+        self.navigation_grid[rows, cols] = True
+        for other in self.blocking_rects():
+            other_rows, other_cols = self.rect_cells(other)
+            y1, y2 = max(rows.start, other_rows.start), min(rows.stop, other_rows.stop)
+            x1, x2 = max(cols.start, other_cols.start), min(cols.stop, other_cols.stop)
+            if y1 < y2 and x1 < x2:
+                self.navigation_grid[y1:y2, x1:x2] = False
+        after = self.navigation_grid[rows, cols]
+        self.invalidate_static()
+        for listener in self.layout_listeners:
+            listener(rect)
+        if np.array_equal(before, after):
+            return False  # Fully covered by another fixture; nothing navigable changed
+        opened = bool((after & ~before).any())
+        closed = bool((before & ~after).any())
+        self.grid_version += 1
+        self.pathfinding.invalidate_region(rows, cols, opened)
+        if closed:
+            self.replan_through(rows, cols)
+        return True
+
+    def replan_through(self, rows, cols):
+        pad = int(math.ceil(self.pathfinding.robot_radius / self.grid_size)) + 1
+        y1, y2 = rows.start - pad, rows.stop + pad
+        x1, x2 = cols.start - pad, cols.stop + pad
+        for robot in self.robots:
+            remaining = robot.current_path[robot.target_index:]
+            if robot.state == 'idle' or not remaining:
+                continue
+            if not any(x1 <= x // self.grid_size < x2 and y1 <= y // self.grid_size < y2 for x, y in remaining):
+                continue
+            self.metrics.inc('repaths')
+            if robot.state == 'collecting' and robot.pick_plan:
+                locations = robot.pick_plan.remaining_coords()
+                if locations:
+                    robot.plan_pick_route(locations)
+            else:
+                robot.current_path = robot.route_to(remaining[-1])
+                robot.target_index = 0
+
+    def add_obstacle(self, rect):
+        rect = Rect(rect)
+        self.obstacles.append(rect)
+        self.patch_layout(rect)
+        return rect
+
+    def remove_obstacle(self, rect):
+        self.obstacles.remove(rect)
+        self.patch_layout(rect)
+
+    def add_shelf(self, rect):
+        rect = Rect(rect)
+        self.shelves.append(rect)
+        self.patch_layout(rect)
+        return rect
+
+    def remove_shelf(self, rect):
+        # Only the fixture goes; products slotted against it keep their pick coordinates
+        self.shelves.remove(rect)
+        self.patch_layout(rect)
+
+    def close_aisle(self, index):
+        self.closed_aisles.add(index)
+        self.patch_layout(self.aisles[index])
+
+    def open_aisle(self, index):
+        self.closed_aisles.discard(index)
+        self.patch_layout(self.aisles[index])
+
+    def robot_color(self, index):
+        base_colors = [(0, 0, 255), (255, 0, 0), (0, 255, 0)]
+        if index < len(base_colors):
+            return base_colors[index]
+        hue = (index * 0.618033988749895) % 1.0  # Golden ratio keeps neighbouring ids visually distinct
+        r, g, b = colorsys.hsv_to_rgb(hue, 0.85, 0.9)
+        return (int(r * 255), int(g * 255), int(b * 255))
+
+    def robot_start_position(self, index):
+        checkout = self.checkouts[index % len(self.checkouts)]
+        rank = index // len(self.checkouts)  # Robots sharing a checkout fan out sideways
+        offset = ((rank + 1) // 2) * 25 * (1 if rank % 2 else -1)
+        return (checkout.centerx + offset, checkout.centery - 50)
+
+    def create_robot(self):
+        i = len(self.robots)
+        if i >= len(self.ROBOT):
+            self.ROBOT.append(self.robot_color(i))
+        robot_data = {
+            'id': i + 1,
+            'position': self.robot_start_position(i),  
+            'color': self.ROBOT[i],
+            'order_queue': deque(maxlen=3),
+            'current_path': [],
+            'current_order': None,
+            'target_index': 0,
+            'items_collected': [],
+            'state': 'idle',  # idle, collecting, checkout
+            'radius': 10,
+            'assigned_checkout': i % len(self.checkouts), # Spread robots evenly over the checkouts
+            'reward': 0
+        }
+        robot = Robot(robot_data, self)
+        self.robots.append(robot)
+        self.num_robots = len(self.robots)
+        return robot
+
     def create_robots(self):
-        robots = []
-        checkout_positions = [
-            (self.checkouts[0].centerx, self.checkouts[0].centery - 50),  # Robot 1 near Checkout 1
-            (self.checkouts[1].centerx, self.checkouts[1].centery - 50),  # Robot 2 near Checkout 2
-            (self.checkouts[2].centerx, self.checkouts[2].centery - 50)   # Robot 3 near Checkout 3
-        ]
-
-        for i in range(3): 
-            robot_data = {
-                'id': i + 1,
-                'position': checkout_positions[i],  
-                'color': self.ROBOT[i],
-                'order_queue': deque(maxlen=3),
-                'current_path': [],
-                'current_order': None,
-                'target_index': 0,
-                'items_collected': [],
-                'state': 'idle',  # idle, collecting, checkout
-                'radius': 10,
-                'assigned_checkout': i, # Assign each robot to a their checkout
-                'reward': 0,
-                'rewarded_items': []
-            }
-            robot = Robot(robot_data, self)
-            robots.append(robot)
-        return robots
+        self.robots = []
+        for _ in range(self.num_robots): 
+            self.create_robot()
+        return self.robots
+
+    def index_robots(self):
+        # Rebuilt once per tick; robots move at most a few pixels per tick so queries stay exact
+        # as long as the search pads by one bucket
+        self.robot_neighbor_cache = {}
+        if len(self.robots) <= self.robot_scan_limit:
+            self.robot_index = None  # Small fleets are cheaper to scan than to hash
+            return
+        index = defaultdict(list)
+        for robot in self.robots:
+            cell = (int(robot.position[0] // self.robot_cell_size), int(robot.position[1] // self.robot_cell_size))
+            index[cell].append(robot)
+        self.robot_index = index
+
+    def nearby_robots(self, position, max_dist, exclude_id=None):
+        if self.robot_index is None:
+            candidates = self.robots
+        else:
+            cx, cy = int(position[0] // self.robot_cell_size), int(position[1] // self.robot_cell_size)
+            reach = int(math.ceil(max_dist / self.robot_cell_size)) + 1
+            candidates = []
+            for gx in range(cx - reach, cx + reach + 1):
+                for gy in range(cy - reach, cy + reach + 1):
+                    candidates.extend(self.robot_index.get((gx, gy), ()))
+        return [robot for robot in candidates if robot.id != exclude_id and math.dist(position, robot.position) < max_dist]
+
+    def robots_within(self, robot, position, max_dist):
+        # Neighbour candidates are gathered once per robot and radius each tick and shared by the
+        # collision checks and RL state featurization; only the exact distance test runs per call
+        if self.robot_index is None:
+            return [other for other in self.robots if other.id != robot.id and math.dist(position, other.position) < max_dist]
+        key = (robot.id, max_dist)
+        candidates = self.robot_neighbor_cache.get(key)
+        if candidates is None:
+            candidates = self.nearby_robots(robot.position, max_dist + self.robot_neighbor_slack, robot.id)
+            self.robot_neighbor_cache[key] = candidates
+        return [other for other in candidates if math.dist(position, other.position) < max_dist]
     
     def reset_for_rl_training(self):
-        checkout_positions = [
-            (self.checkouts[0].centerx, self.checkouts[0].centery - 50),
-            (self.checkouts[1].centerx, self.checkouts[1].centery - 50),
-            (self.checkouts[2].centerx, self.checkouts[2].centery - 50)
-        ]
         for i, robot in enumerate(self.robots):
-            start_pos = checkout_positions[i % len(checkout_positions)]
-            robot.reset(start_pos)
+            robot.reset(self.robot_start_position(i))
+        self.index_robots()
+        self.battery.reset()
+        self.checkout_scheduler.reset()
         
-        self.order_queue = []
+        self.order_queue.clear()
         for i in range(len(self.robots)):
             new_order = self.order_allocator.generate_order()
-            new_order['checkout'] = i % 3 
+            new_order['checkout'] = i % len(self.checkouts) 
+            new_order['checkouts'] = [new_order['checkout']]
             self.order_queue.append(new_order)
     
+    def obstacle_candidate_cells(self, half_size=15, margin=50):
+        # Cells whose surrounding window is clear of shelves, checkouts and aisles; any obstacle
+        # centred inside such a cell cannot overlap them, so placement needs no retries
+        occupied = np.zeros_like(self.navigation_grid)
+        for rect in self.shelves + self.checkouts + self.chargers + self.aisles:
+            self.rasterize_rect(rect, True, occupied)
+
+        reach = -(-half_size // self.grid_size)
+        window = 2 * reach + 1
+        padded = np.pad(occupied, reach, constant_values=True).astype(np.int32)
+        integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.int32)
+        integral[1:, 1:] = padded.cumsum(0).cumsum(1)
+        blocked = (integral[window:, window:] - integral[:-window, window:]
+                   - integral[window:, :-window] + integral[:-window, :-window])
+
+        free = blocked == 0
+        lo = -(-margin // self.grid_size)
+        free[:lo, :] = False
+        free[:, :lo] = False
+        free[(self.height - margin - self.grid_size + 1) // self.grid_size + 1:, :] = False
+        free[:, (self.width - margin - self.grid_size + 1) // self.grid_size + 1:] = False
+        return np.flatnonzero(free)
+
     def create_obstacles(self, num_obstacles):
         obstacles = []
+        candidates = self.obstacle_candidate_cells()
+        if num_obstacles and not len(candidates):
+            logger.warning("No free floor space for obstacles, placed 0/%d", num_obstacles)
+            return obstacles
         for _ in range(num_obstacles):
-            valid_position = False
-            while not valid_position:
-                x = random.randint(50, self.width - 50)
-                y = random.randint(50, self.height - 50)
-                obstacle_rect = pygame.Rect(x - 15, y - 15, 30, 30)
-                valid_position = True
-                for shelf in self.shelves:
-                    if shelf.colliderect(obstacle_rect):
-                        valid_position = False
-                        break
-                
-                for checkout in self.checkouts:
-                    if checkout.colliderect(obstacle_rect):
-                        valid_position = False
-                        break
-                
-                for aisle in self.aisles:
-                    if aisle.colliderect(obstacle_rect):
-                        valid_position = False
-                        break
+            cell = int(candidates[random.randrange(len(candidates))])
+            gy, gx = divmod(cell, self.grid_width)
+            x = random.randint(gx * self.grid_size, gx * self.grid_size + self.grid_size - 1)
+            y = random.randint(gy * self.grid_size, gy * self.grid_size + self.grid_size - 1)
+            obstacle_rect = Rect(x - 15, y - 15, 30, 30)
             obstacles.append(obstacle_rect)
-            
-            x1, y1 = obstacle_rect.topleft[0] // self.grid_size, obstacle_rect.topleft[1] // self.grid_size
-            x2, y2 = obstacle_rect.bottomright[0] // self.grid_size, obstacle_rect.bottomright[1] // self.grid_size
-            for x in range(max(0, x1), min(self.grid_width, x2 + 1)):
-                for y in range(max(0, y1), min(self.grid_height, y2 + 1)):
-                    self.navigation_grid[y, x] = False
+            self.rasterize_rect(obstacle_rect)
                     
         return obstacles
     
+    def load_catalog(self, filename):
+        # CSV with a header row or JSON lines; each record needs 'name' and 'category',
+        # 'aisle' and 'shelf' are optional fixed slots
+        catalog = []
+        with open(filename, 'r', newline='') as f:
+            if filename.endswith('.csv'):
+                records = csv.DictReader(f)
+            else:
+                records = (json.loads(line) for line in f if line.strip())
+            for record in records:
+                slot = None
+                if record.get('aisle') not in (None, '') and record.get('shelf') not in (None, ''):
+                    slot = (int(record['aisle']), int(record['shelf']))
+                catalog.append((record['name'], record.get('category') or 'General', slot))
+        return catalog
+
+    def build_catalog(self):
+        catalog = [(item, category, None) for category, items in PRODUCT_CATEGORIES.items() for item in items]
+        if self.num_products is None:
+            return catalog
+        if self.num_products <= len(catalog):
+            return catalog[:self.num_products]
+        categories = list(PRODUCT_CATEGORIES)
+        for n in range(len(catalog), self.num_products):
+            category = categories[n % len(categories)]
+            catalog.append((f"{category} SKU {n + 1:05d}", category, None))
+        catalog.sort(key=lambda entry: categories.index(entry[1]))  # Keep categories in contiguous aisles
+        return catalog
+
     def create_product_database(self):
-        product_categories = {
-            "Dairy & Bakery":   ["Milk", "Cheese", "Yogurt", "Butter", "Cream", "Custard", "Bread", "Buns", "Muffins", "Scones","Cupcakes", "Cake"],
-            "Fruits & Veg":     ["Apples", "Bananas", "Oranges", "Grapes", "Strawberries", "Blueberries", "Lettuce", "Peppers", "Tomatoes", "Cucumber", "Carrots", "Onions"],
-            "Butchery":             ["Chicken", "Beef", "Pork", "Fish", "Shrimp", "Tofu","Crab","Eggs","Viennas", "Polony", "Russian","Mince Meat"],
-            "Pastries":           ["Rice", "Pasta", "Cereal", "Flour", "Sugar", "Salt","Tumeric", "Paprika", "Masala", "Parsley", "Oil", "Sauce"],
-            "Beverages":        ["Soda", "Water", "Juice", "Coffee", "Tea", "Beer", "Ice", "Wine", "Champagne", "Cider", "Vodka", "Milkshake"],
-            "Snacks":           ["Chips", "Cookies", "Crackers", "Sweets", "Chocolate", "Nuts", "Popcorns", "Energy bars", "Pretzel", "Biscuits", "Granola", "Muesli"],
-            "Toiletries":       ["Soap", "Shampoo", "Toothpaste", "Toilet Paper", "Paper Towels", "Detergent", "Face Cloth", "Spray", "Lotion", "Roll-on", "Loafer", "Toothbrush"],
-            "Cleaning":         ["Broom", "Mop", "Floor cleaner", "Pine gel", "Dustpan", "Brush", "Dishwasher", "Splunger", "Bucket", "Vaccumm", "Cloth", "Rack"]
-        }
+        catalog = self.load_catalog(self.catalog_file) if self.catalog_file else self.build_catalog()
+        slots = sorted(self.shelf_to_coord)
+        num_slots = len(slots)
 
+        # Products are spread over the slots in catalog order, so with one product per slot
+        # category k fills aisle k shelf by shelf; larger catalogs share slots in contiguous runs
         product_mapping = {}
         aisle_names = {} 
-        aisle_number = 1  
-        for category, items in product_categories.items():
-            aisle_names[aisle_number] = category  
-            for shelf in range(1, 13):  
-                product_mapping[items[shelf - 1]] = (aisle_number, shelf) 
-            aisle_number += 1 
+        self.shelf_labels = {}
+        for index, (name, category, slot) in enumerate(catalog):
+            if slot is None:
+                slot = slots[index * num_slots // len(catalog)]
+            product_mapping[name] = slot
+            aisle_names.setdefault(slot[0], category)
+            self.shelf_labels.setdefault(slot, name)
 
         self.aisle_names = aisle_names 
         return product_mapping
     
-    def draw(self):
-        # Fill background
-        self.screen.fill(self.FLOOR)
+    def apply_slotting(self, mapping):
+        self.products.update(mapping)
+        self.slotting_version += 1
+        self.shelf_labels = {}
+        for name in self.product_names:
+            self.shelf_labels.setdefault(self.products[name], name)
+        self.invalidate_static()
+
+    def render_text(self, text, color=None, angle=0):
+        color = self.TEXT_COLOR if color is None else color
+        key = (text, color, angle)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            import pygame
+            if self.font is None:
+                pygame.font.init()
+                self.font = pygame.font.SysFont('Arial', 12)
+            if len(self.text_cache) > 4096:  # Rewards and counters keep producing new strings
+                self.text_cache.clear()
+            surface = self.font.render(text, True, color)
+            if angle:
+                surface = pygame.transform.rotate(surface, angle)
+            self.text_cache[key] = surface
+        return surface
+
+    def init_display(self):
+        import pygame
+        if self.screen is None:
+            pygame.init()
+            self.screen = pygame.display.set_mode((self.width, self.height))
+            pygame.display.set_caption("AI-POWERED RETAIL WAREHOUSE ROBOTIC SIMULATION")
+            self.clock = pygame.time.Clock()
+        return pygame
+
+    def invalidate_static(self):
+        self.static_surface = None
+
+    def render_static(self):
+        # Everything that only changes with the layout is drawn once and re-blitted per frame
+        import pygame
+        surface = pygame.Surface((self.width, self.height))
+        surface.fill(self.FLOOR)
         
         # Draw aisles
-        for aisle in self.aisles:
-            pygame.draw.rect(self.screen, self.AISLE, aisle)
+        for i, aisle in enumerate(self.aisles):
+            pygame.draw.rect(surface, self.CLOSED_AISLE if i in self.closed_aisles else self.AISLE, aisle)
         
         # Draw shelves
         for shelf in self.shelves:
-            pygame.draw.rect(self.screen, self.SHELF, shelf)
+            pygame.draw.rect(surface, self.SHELF, shelf)
         
         # Draw obstacles
         for obstacle in self.obstacles:
-            pygame.draw.rect(self.screen, self.OBSTACLE, obstacle)
+            pygame.draw.rect(surface, self.OBSTACLE, obstacle)
         
+        # Draw charging stations
+        for i, charger in enumerate(self.chargers):
+            pygame.draw.rect(surface, self.CHARGER, charger)
+            surface.blit(self.render_text(f"C{i+1}"), (charger.right + 3, charger.y))
+
         # Draw checkout points
         for i, checkout in enumerate(self.checkouts):
-            pygame.draw.rect(self.screen, self.CHECKOUT, checkout)
-            checkout_text = self.font.render(f"Checkout {i+1}", True, self.TEXT_COLOR)
-            self.screen.blit(checkout_text, (checkout.x, checkout.y - 15))
+            pygame.draw.rect(surface, self.CHECKOUT, checkout)
+            surface.blit(self.render_text(f"Checkout {i+1}"), (checkout.x, checkout.y - 15))
         
         # Draw shelf labels, aisle group labels above each aisle
         for aisle, group in self.aisle_names.items():
-            aisle_x = self.aisles[aisle - 1].centerx
-            label_surface = self.font.render(group, True, self.TEXT_COLOR)
-            self.screen.blit(label_surface, (aisle_x - len(group) * 3, 20))
+            if aisle - 1 >= len(self.aisles):
+                continue
+            aisle_rect = self.aisles[aisle - 1]
+            surface.blit(self.render_text(group), (aisle_rect.centerx - len(group) * 3, aisle_rect.top - 20))
 
-        # Draw vertical product labels on shelves
-        for product, (aisle, shelf) in self.products.items():
+        # Draw vertical product labels on shelves, one per slot
+        for (aisle, shelf), product in self.shelf_labels.items():
             if (aisle, shelf) in self.shelf_to_coord:
                 pos = self.shelf_to_coord[(aisle, shelf)]
-                label_surface = self.font.render(product, True, self.TEXT_COLOR)
-                label_surface = pygame.transform.rotate(label_surface, 90)
-                self.screen.blit(label_surface, (pos[0] - 10, pos[1] - len(product) * 3))
-  
-        # Draw robots and their paths
-        for robot in self.robots:
-            if robot.current_path and robot.target_index < len(robot.current_path):
-                path_color = robot.color
-                for i in range(robot.target_index, len(robot.current_path) - 1):
-                    pygame.draw.line(self.screen, path_color, 
-                                robot.current_path[i],
-                                robot.current_path[i+1], 2)
-            pygame.draw.circle(self.screen, robot.color, robot.position, robot.radius)
-
-            id_text = self.font.render(f"R{robot.id}", True, (255, 255, 255))
-            self.screen.blit(id_text, (robot.position[0] - 5, robot.position[1] - 5))
-            if robot.current_order:
-                order_text = self.font.render(f"Order: {robot.current_order['id']}", 
-                                        True, self.TEXT_COLOR)
-                self.screen.blit(order_text, (robot.position[0] - 60, robot.position[1] - 40))
-                items_text = self.font.render(f"Items: {len(robot.items_collected)}/{len(robot.current_order['items'])}", 
-                                        True, self.TEXT_COLOR)
-                self.screen.blit(items_text, (robot.position[0] - 50, robot.position[1] - 25))     
-                reward_text = self.font.render(f"Reward: {int(robot.reward)}", True, self.TEXT_COLOR)
-                self.screen.blit(reward_text, (robot.position[0] - 50, robot.position[1] + 35))
-
+                surface.blit(self.render_text(product, angle=90), (pos[0] - 10, pos[1] - len(product) * 3))
 
         # Draw product location markers
         for (aisle, shelf), pos in self.shelf_to_coord.items():
-            pygame.draw.circle(self.screen, (255, 0, 125), pos, 3)                                 
+            pygame.draw.circle(surface, (255, 0, 125), pos, 3)                                 
         
         # Display instructions
-        instructions = self.font.render("Press 'O' to add new order | 'R' to reset | ESC to quit", True, self.TEXT_COLOR)
-        self.screen.blit(instructions, (self.width - 380, 10))
+        instructions = self.render_text("Press 'O' to add new order | 'S' to re-slot | 'R' to reset | ESC to quit")
+        surface.blit(instructions, (self.width - 380, 10))
+        self.static_surface = surface.convert() if pygame.display.get_surface() else surface
+    
+    def draw(self):
+        pygame = self.init_display()
+        full_redraw = self.static_surface is None
+        if full_redraw:
+            self.render_static()
+            self.screen.blit(self.static_surface, (0, 0))
+        else:
+            # Only restore the background where robots, paths and text were drawn last frame
+            for rect in self.dirty_rects:
+                self.screen.blit(self.static_surface, rect, rect)
+        
+        drawn = []
+        # Draw robots and their paths
+        for robot in self.robots:
+            if robot.current_path and robot.target_index < len(robot.current_path) - 1:
+                drawn.append(pygame.draw.lines(self.screen, robot.color, False, robot.current_path[robot.target_index:], 2))
+            drawn.append(pygame.draw.circle(self.screen, robot.color, robot.position, robot.radius))
+
+            drawn.append(self.screen.blit(self.render_text(f"R{robot.id}", (255, 255, 255)), (robot.position[0] - 5, robot.position[1] - 5)))
+            charge = self.battery.level(robot) / self.battery.capacity
+            bar = pygame.Rect(robot.position[0] - 10, robot.position[1] - robot.radius - 6, max(1, int(20 * charge)), 3)
+            drawn.append(pygame.draw.rect(self.screen, (0, 170, 0) if charge > self.battery.low_threshold else (220, 0, 0), bar))
+            if robot.current_order:
+                order_text = self.render_text(f"Order: {robot.current_order['id']}")
+                drawn.append(self.screen.blit(order_text, (robot.position[0] - 60, robot.position[1] - 40)))
+                items_text = self.render_text(f"Items: {len(robot.items_collected)}/{len(robot.current_order['items'])}")
+                drawn.append(self.screen.blit(items_text, (robot.position[0] - 50, robot.position[1] - 25)))
+                reward_text = self.render_text(f"Reward: {int(robot.reward)}")
+                drawn.append(self.screen.blit(reward_text, (robot.position[0] - 50, robot.position[1] + 35)))
 
         # Display number of collisions
-        collision_text = self.font.render(f"Collisions: {self.collision_count}", True, self.TEXT_COLOR)
-        self.screen.blit(collision_text, (10, 10))
-        pygame.display.flip()
+        collision_text = self.render_text(f"Collisions: {self.collision_count}")
+        drawn.append(self.screen.blit(collision_text, (10, 10)))
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects + drawn)
+        self.dirty_rects = [rect.inflate(2, 2) for rect in drawn]
         
-    def run(self, use_rl=False, rl_agent=None):
+    def step(self, use_rl=False, rl_agent=None):
+        self.tick += 1
+        if self.planning_budget_ms is not None:
+            # Every search this tick shares the budget and degrades rather than overrunning it
+            self.plan_deadline = time.perf_counter() + self.planning_budget_ms / 1000
+        self.index_robots()
+        self.order_allocator.assign_orders_to_robots(self.robots, self.pathfinding, self.tsp_solver)
+
+        if use_rl and rl_agent:
+            rl_agent.act_fleet(self.robots)
+        
+        for robot in self.robots:
+            robot.process_robot_actions()
+        positions = np.array([robot.position for robot in self.robots], dtype=float).reshape(-1, 2)
+        self.battery.tick(positions)
+        self.pathfinding.record_traffic(positions)
+        self.plan_deadline = None
+        self.metrics.record_tick(self)
+        if self.recorder:
+            self.recorder.record_tick(self)
+
+    def submit_order(self, order):
+        if not order or not self.order_queue.append(order):
+            return False
+        if self.recorder:
+            self.recorder.record_order(self.tick, order)
+        return True
+
+    def feed_orders(self, order_source, order_timer):
+        if order_source is not None:
+            self.order_allocator.ingest_orders(order_source)
+            return order_timer
+        order_timer += 1
+        if order_timer >= 120:
+            if len(self.order_queue) < 9:
+                new_order = self.order_allocator.generate_order()
+                if self.submit_order(new_order):
+                    logger.info("Auto-generated order #%s: %s", new_order['id'], new_order['items'])
+            order_timer = 0
+        return order_timer
+
+    def shutdown(self, order_source=None):
+        if order_source is not None:
+            order_source.close()
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        self.metrics.close()
+        self.bulk_planner.close()
+
+    def run_headless(self, ticks, use_rl=False, rl_agent=None, order_source=None, record_file=None):
+        # The run() loop without a display, events or frame cap; pygame is never imported
+        if record_file:
+            self.recorder = Trace_Recorder(record_file, self)
+        order_timer = 0
+        try:
+            for _ in range(ticks):
+                order_timer = self.feed_orders(order_source, order_timer)
+                self.step(use_rl, rl_agent)
+        finally:
+            self.shutdown(order_source)
+        return {
+            'ticks': self.tick,
+            'orders_completed': self.order_queue.completed_count,
+            'active_orders': len(self.order_queue),
+            'collisions': self.collision_count
+        }
+
+    def run(self, use_rl=False, rl_agent=None, order_source=None, record_file=None):
         running = True
+        if record_file:
+            self.recorder = Trace_Recorder(record_file, self)
         order_timer = 0
+        pygame = self.init_display()
         
         while running:
             self.clock.tick(60) 
@@ -290,30 +664,25 @@ class WarehouseGenerator:
                         running = False
                     elif event.key == pygame.K_o:
                         new_order = self.order_allocator.generate_order()
-                        if new_order:
-                            self.order_queue.append(new_order)
-                            print(f"New order #{new_order['id']} generated: {new_order['items']}")
+                        if self.submit_order(new_order):
+                            logger.info("New order #%s generated: %s", new_order['id'], new_order['items'])
+                    elif event.key == pygame.K_s:
+                        proposal = self.slotting.optimize()
+                        moves = self.slotting.apply(proposal)
+                        logger.info("Re-slotted %d products, estimated travel saved per order: %.0f px",
+                                    moves, proposal['travel_saved_per_order'])
                     elif event.key == pygame.K_r:
-                        self.__init__(self.width, self.height, self.num_aisles, self.shelves_per_aisle)
-
-            order_timer += 1
-            if order_timer >= 120:
-                if len(self.order_queue) < 9:
-                    new_order = self.order_allocator.generate_order()
-                    if new_order:
-                        self.order_queue.append(new_order)
-                        print(f"Auto-generated order #{new_order['id']}: {new_order['items']}")
-                order_timer = 0
-
-            self.order_allocator.assign_orders_to_robots(self.robots, self.pathfinding, self.tsp_solver)
-
-            if use_rl and rl_agent:
-                for robot in self.robots:
-                    if robot.state != 'idle':
-                        rl_agent.act(robot)
-            
-            for robot in self.robots:
-                robot.process_robot_actions()
+                        if self.recorder:
+                            self.recorder.close()
+                        self.__init__(self.width, self.height, self.num_aisles, self.shelves_per_aisle, self.num_robots,
+                                      self.num_checkouts, self.num_zones, self.num_obstacles, self.num_products, self.catalog_file,
+                                      self.max_pending_orders, None, self.num_chargers)
+
+            order_timer = self.feed_orders(order_source, order_timer)
+            self.step(use_rl, rl_agent)
             self.draw()
-            pygame.display.flip()
+        self.shutdown(order_source)
         pygame.quit()
+        self.screen = self.font = self.clock = None
+        self.text_cache = {}
+        self.static_surface = None
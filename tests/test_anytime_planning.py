@@ -0,0 +1,57 @@
+import math
+import random
+import time
+import pytest
+from src.warehouse import WarehouseGenerator
+from src.robot import plan_route
+
+@pytest.fixture(scope='module')
+def warehouse():
+    return WarehouseGenerator(width=1600, height=1200, num_aisles=16, num_obstacles=40, seed=5)
+
+def free_points(warehouse, count, rng):
+    grid, size = warehouse.pathfinding.get_cspace_grid(), warehouse.grid_size
+    points = []
+    while len(points) < count:
+        gx, gy = rng.randrange(warehouse.grid_width), rng.randrange(warehouse.grid_height)
+        if grid[gy, gx]:
+            points.append((gx * size + size // 2, gy * size + size // 2))
+    return points
+
+def assert_walkable(warehouse, path):
+    size = warehouse.grid_size
+    for point in path:
+        assert warehouse.navigation_grid[int(point[1] // size), int(point[0] // size)], f"{point} is inside a blocked cell"
+    for a, b in zip(path, path[1:]):
+        assert math.dist(a, b) <= math.hypot(size, size) + 1e-9, f"{a} -> {b} skips over cells"
+
+@pytest.mark.parametrize('budget', [None, 0.0, 0.0005, 0.002])
+def test_deadline_tiers_stay_on_free_cells(warehouse, budget):
+    pathfinding = warehouse.pathfinding
+    pathfinding.path_cache.clear()
+    rng = random.Random(7)
+    points = free_points(warehouse, 60, rng)
+    seen = set()
+    for start, end in zip(points[::2], points[1::2]):
+        deadline = None if budget is None else time.perf_counter() + budget
+        path = pathfinding.find_path(start, end, deadline=deadline)
+        tier = pathfinding.last_tier
+        seen.add(tier)
+        if tier == 'fallback':
+            continue
+        assert_walkable(warehouse, path)
+        goal = pathfinding._cell_center((int(end[0] // warehouse.grid_size), int(end[1] // warehouse.grid_size)))
+        assert (path[-1] == goal) == (tier != 'partial')
+    if budget is None:
+        assert seen == {'exact'}
+    if budget == 0.0:
+        assert 'partial' in seen
+
+def test_cut_short_pick_route_ends_on_the_partial_prefix(warehouse):
+    rng = random.Random(3)
+    start, *locations = free_points(warehouse, 6, rng)
+    route, full_path, stops = plan_route(warehouse.pathfinding, warehouse.tsp_solver, 1, start, locations,
+                                         deadline=time.perf_counter())
+    assert full_path
+    assert_walkable(warehouse, full_path)
+    assert len(stops) < len(locations)
@@ -0,0 +1,35 @@
+import numpy as np
+from src.warehouse import WarehouseGenerator
+
+def test_driving_and_picks_drain_and_docking_charges():
+    warehouse = WarehouseGenerator(seed=1)
+    battery = warehouse.battery
+    robot = warehouse.robots[0]
+    start = battery.level(robot)
+    x, y = robot.position
+    robot.position = (x + 30, y + 40)
+    battery.tick(np.array([r.position for r in warehouse.robots], dtype=float))
+    assert battery.level(robot) == start - 50 * battery.drain_per_px
+    battery.pick(robot, 3)
+    assert battery.level(robot) == start - 50 * battery.drain_per_px - 3 * battery.drain_per_pick
+
+    battery.docked[battery.index(robot)] = True
+    before = battery.level(robot)
+    battery.tick(np.array([r.position for r in warehouse.robots], dtype=float))
+    assert battery.level(robot) == before + battery.charge_rate
+
+def test_low_robot_charges_and_returns_to_work():
+    warehouse = WarehouseGenerator(seed=1)
+    battery = warehouse.battery
+    robot = warehouse.robots[0]
+    battery.sync(warehouse.robots)
+    battery.levels[battery.index(robot)] = 0.15 * battery.capacity
+    states = []
+    for _ in range(1500):
+        warehouse.step()
+        states.append(robot.state)
+        if states[-1] == 'idle' and 'charging' in states:
+            break
+    assert 'charging' in states and states[-1] == 'idle'
+    assert battery.level(robot) >= battery.resume_threshold * battery.capacity
+    assert robot.charger is None and not battery.docked.any()
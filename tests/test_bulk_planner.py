@@ -0,0 +1,58 @@
+import pickle
+import pytest
+from src.warehouse import WarehouseGenerator
+from src.bulk_planner import Planning_World
+from src.shared_world import Shared_World
+
+def planned_run(workers=0, use_shared_memory=True, ticks=300):
+    warehouse = WarehouseGenerator(width=1200, height=800, num_aisles=12, num_robots=6, seed=4)
+    try:
+        if workers:
+            warehouse.bulk_planner.start_pool(workers, use_shared_memory=use_shared_memory)
+        for _ in range(6):
+            warehouse.submit_order(warehouse.order_allocator.generate_order())
+        warehouse.order_allocator.assign_orders_to_robots(warehouse.robots, warehouse.pathfinding, warehouse.tsp_solver)
+        paths = [list(robot.current_path) for robot in warehouse.robots]
+        for _ in range(ticks):
+            warehouse.step()
+        batches = warehouse.metrics.counter('bulk_plan_batches').value
+        return paths, [robot.position for robot in warehouse.robots], batches
+    finally:
+        warehouse.bulk_planner.close()
+
+@pytest.fixture(scope='module')
+def inline_run():
+    return planned_run()
+
+@pytest.mark.parametrize('use_shared_memory', [True, False])
+def test_pool_planning_matches_inline(inline_run, use_shared_memory):
+    paths, positions, batches = planned_run(workers=2, use_shared_memory=use_shared_memory)
+    assert batches > 0
+    assert paths == inline_run[0]
+    assert positions == inline_run[1]
+
+def test_handle_stays_small_with_a_large_catalog():
+    warehouse = WarehouseGenerator(seed=1, num_products=20000)
+    shared = Shared_World.create(warehouse, (0, 0, 0))
+    try:
+        assert len(pickle.dumps(Planning_World(warehouse, (0,), shared))) < 4096
+        attached = Shared_World.attach(shared.handle)
+        assert attached.product_names == warehouse.product_names
+        attached.close()
+    finally:
+        shared.close()
+
+def test_reslotting_republishes_the_shared_world():
+    warehouse = WarehouseGenerator(seed=2)
+    planner = warehouse.bulk_planner
+    planner.use_shared_memory = True
+    try:
+        before = planner.current_world().world_handle.key
+        proposal = warehouse.slotting.optimize()
+        warehouse.slotting.apply(proposal)
+        world = planner.current_world()
+        assert world.world_handle.key != before
+        assert planner.shared_world.products == {name: tuple(slot) for name, slot in warehouse.products.items()
+                                                 if tuple(slot) in warehouse.shelf_to_coord}
+    finally:
+        planner.close()
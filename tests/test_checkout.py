@@ -0,0 +1,43 @@
+import math
+from src.warehouse import WarehouseGenerator
+from src.checkout import Checkout_Scheduler
+
+def booked_world(count=4, queue_slots=1):
+    warehouse = WarehouseGenerator(seed=1, num_robots=6)
+    scheduler = warehouse.checkout_scheduler = Checkout_Scheduler(warehouse, service_ticks=30, queue_slots=queue_slots)
+    robots = warehouse.robots[:count]
+    for robot in robots:
+        robot.state = 'checkout'
+        scheduler.book(robot, {'id': robot.id, 'items': [], 'checkouts': [0]})
+    return warehouse, scheduler, robots
+
+def test_line_ranks_follow_booking_order_and_overflow_holds():
+    _, scheduler, robots = booked_world()
+    assert scheduler.lines[0] == [robot.id for robot in robots]
+    spots = [scheduler.slot_position(0, 0), scheduler.slot_position(0, 1),
+             scheduler.hold_position(0, 2), scheduler.hold_position(0, 3)]
+    assert len(set(spots)) == 4
+    for robot, spot in zip(robots, spots):
+        assert robot.current_path, "every booked robot is sent somewhere, overflow included"
+        assert math.dist(robot.current_path[-1], spot) <= 15
+
+def test_service_takes_service_ticks_and_the_line_moves_up():
+    warehouse, scheduler, robots = booked_world()
+    first, second, third = robots[:3]
+    for robot in robots:
+        robot.position = robot.current_path[-1]
+        robot.target_index = len(robot.current_path)
+    assert all(scheduler.waiting(robot) for robot in robots)
+
+    start = warehouse.tick
+    assert not scheduler.update(first)  # Service starts
+    while not scheduler.update(first):
+        warehouse.tick += 1
+    assert warehouse.tick - start == scheduler.service_ticks
+    assert scheduler.lines[0] == [robot.id for robot in robots[1:]]
+    assert not scheduler.waiting(first)
+
+    scheduler.update(second)
+    scheduler.update(third)  # Overflow robot moves into the freed queue slot
+    assert math.dist(second.current_path[-1], scheduler.slot_position(0, 0)) <= 15
+    assert math.dist(third.current_path[-1], scheduler.slot_position(0, 1)) <= 15
@@ -0,0 +1,41 @@
+import pytest
+from src.warehouse import WarehouseGenerator
+
+pygame = pytest.importorskip('pygame')
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    warehouse = WarehouseGenerator(seed=1)
+    yield warehouse
+    pygame.quit()
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, 'RGB')
+
+def test_static_scene_and_labels_are_drawn_once(warehouse):
+    warehouse.draw()
+    static = warehouse.static_surface
+    label = warehouse.render_text("Checkout 1")
+    warehouse.draw()
+    assert warehouse.static_surface is static
+    assert warehouse.render_text("Checkout 1") is label
+
+    warehouse.add_obstacle((400, 20, 10, 10))
+    assert warehouse.static_surface is None
+    warehouse.draw()
+    assert warehouse.static_surface is not static
+
+def test_dirty_redraw_matches_a_full_redraw(warehouse):
+    start = [robot.position for robot in warehouse.robots]
+    for _ in range(3):
+        warehouse.submit_order(warehouse.order_allocator.generate_order())
+    warehouse.draw()
+    for _ in range(30):
+        warehouse.step()
+        warehouse.draw()
+    assert [robot.position for robot in warehouse.robots] != start
+    incremental = pixels(warehouse.screen)
+    warehouse.invalidate_static()
+    warehouse.draw()
+    assert pixels(warehouse.screen) == incremental
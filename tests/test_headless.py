@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import pytest
+from src.geometry import Rect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_RUN = """
+import sys
+import main
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+from src.trace import replay_trace
+warehouse = WarehouseGenerator(seed=1)
+agent = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator)
+agent.train(episodes=1, max_steps=20, num_orders_per_episode=1)
+agent.freeze_policy()
+warehouse.run_headless(50, use_rl=True, rl_agent=agent, record_file=sys.argv[1])
+replay_trace(sys.argv[1], WarehouseGenerator)
+print('pygame' in sys.modules)
+"""
+
+def test_headless_runs_never_import_pygame(tmp_path):
+    result = subprocess.run([sys.executable, '-c', HEADLESS_RUN, str(tmp_path / 'run.trace')],
+                            cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == 'False'
+
+def test_headless_entry_point():
+    result = subprocess.run([sys.executable, 'main.py', '--headless', '--episodes', '0', '--ticks', '30', '--seed', '1'],
+                            cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert "'collisions'" in result.stdout
+
+def test_rect_matches_pygame():
+    pygame = pytest.importorskip('pygame')
+    for args in ((10.7, 20.2, 30.9, 5.5), (-4, 3, 8, 8)):
+        ours, theirs = Rect(*args), pygame.Rect(*args)
+        assert tuple(ours) == tuple(theirs)
+        assert (ours.right, ours.bottom, ours.center) == (theirs.right, theirs.bottom, theirs.center)
+        for point in ((10, 20), (40, 25), (0, 5), (3, 10)):
+            assert ours.collidepoint(point) == bool(theirs.collidepoint(point))
+        for other in ((0, 0, 11, 21), (41, 25, 5, 5), (-10, 0, 7, 20)):
+            assert ours.colliderect(other) == bool(theirs.colliderect(other))
+        assert tuple(ours.inflate(3, 4)) == tuple(theirs.inflate(3, 4))
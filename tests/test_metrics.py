@@ -0,0 +1,32 @@
+import csv
+from src.metrics import Metrics
+from src.warehouse import WarehouseGenerator
+
+def test_exports_continue_after_a_reset(tmp_path):
+    warehouse = WarehouseGenerator(seed=1)
+    warehouse.metrics.configure_export(interval_ticks=50, csv_path=str(tmp_path / 'metrics.csv'))
+    for _ in range(120):
+        warehouse.step()
+    warehouse.__init__(seed=2)
+    assert warehouse.tick == 0
+    for _ in range(60):
+        warehouse.step()
+    rows = [row for row in csv.reader(open(tmp_path / 'metrics.csv')) if row[0] == 'values']
+    assert len(rows) == 3  # Ticks 50 and 100 before the reset, 50 after it
+
+def test_csv_header_written_once_per_field_set(tmp_path):
+    path = tmp_path / 'metrics.csv'
+    metrics = Metrics()
+    metrics.configure_export(interval_ticks=1, csv_path=str(path))
+    for tick in range(1, 4):
+        metrics.maybe_export(tick)
+    metrics.inc('new_counter')
+    metrics.maybe_export(4)
+    kinds = [row[0] for row in csv.reader(open(path))]
+    assert kinds == ['fields', 'values', 'values', 'values', 'fields', 'values']
+
+    resumed = Metrics()  # A later run appending to the same file keeps using its last header
+    resumed.inc('new_counter')
+    resumed.configure_export(interval_ticks=1, csv_path=str(path))
+    resumed.maybe_export(1)
+    assert [row[0] for row in csv.reader(open(path))][-1] == 'values'
@@ -0,0 +1,89 @@
+import numpy as np
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+
+def make_agent(seed=1, **kwargs):
+    warehouse = WarehouseGenerator(seed=seed)
+    return warehouse, Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator, **kwargs)
+
+def test_reset_rebuilds_the_obstacle_lookup():
+    warehouse, agent = make_agent(seed=1)
+    warehouse.__init__(seed=2)  # What the R key does
+    for obstacle in warehouse.obstacles:
+        assert agent.hits_obstacle(*obstacle.center)
+    fresh = Obstacle_Avoidance(WarehouseGenerator(seed=2), [], None)
+    assert (agent.static_obstacle_table == fresh.static_obstacle_table).all()
+
+    added = warehouse.add_obstacle((400, 300, 30, 30))  # Later edits still reach the agent
+    assert agent.hits_obstacle(*added.center)
+    assert len(warehouse.layout_listeners) == 1
+
+def test_frozen_tile_policy_acts_after_a_load(tmp_path):
+    path = str(tmp_path / 'weights.npz')
+    _, trained = make_agent(seed=1, value_backend='tiles')
+    for table in trained.robot_q_tables.values():
+        table.weights[:] = np.random.default_rng(0).random(table.weights.shape)
+    trained.save_q_tables(path)
+
+    warehouse, agent = make_agent(seed=1, value_backend='tiles')
+    agent.load_q_tables(path)
+    agent.freeze_policy()
+    robot = warehouse.robots[0]
+    robot.state = 'collecting'
+    state = agent.discretize_state(robot)
+    expected = int(trained.robot_q_tables[robot.id][state].argmax())
+    start = robot.position
+    assert agent.act_greedy(robot)
+    dx, dy = agent.actions[expected]
+    assert robot.position == (start[0] + 2 * dx, start[1] + 2 * dy)
+    assert len(agent.robot_q_tables[robot.id]) == 0  # Nothing was cached on the way
+
+def test_rl_leaves_charging_robots_alone():
+    warehouse, agent = make_agent(seed=1)
+    robot = warehouse.robots[0]
+    warehouse.battery.send_to_charger(robot)
+    start = robot.position
+    for _ in range(20):
+        agent.act_fleet(warehouse.robots)
+    assert robot.position == start
+    agent.freeze_policy()
+    agent.act_fleet(warehouse.robots)
+    assert robot.position == start and agent.inference_stats['decisions'] == 0
+
+def test_rl_leaves_robots_waiting_at_checkout_alone():
+    warehouse, agent = make_agent(seed=1)
+    robot = warehouse.robots[0]
+    robot.state = 'checkout'
+    warehouse.checkout_scheduler.book(robot, {'id': 1, 'items': [], 'checkouts': [0]})
+    robot.position = robot.current_path[-1]
+    robot.target_index = len(robot.current_path)
+    for _ in range(20):
+        agent.act_fleet(warehouse.robots)
+    assert robot.position == robot.current_path[-1]
+
+def test_frozen_policy_follows_the_learned_argmax():
+    warehouse, agent = make_agent(seed=1)
+    robot = warehouse.robots[0]
+    robot.state = 'collecting'
+    state = agent.discretize_state(robot)
+    table = agent.robot_q_tables[robot.id]
+    table.set_value(state, 3, 1.0)
+    table.set_value(state, 5, 0.5)
+    table.state_id(('unlearned',))  # All-zero rows stay out of the policy
+    agent.freeze_policy()
+    assert agent.greedy_policy[robot.id] == {state: 3}
+
+    size = len(table)
+    start = robot.position
+    agent.act_fleet([robot])
+    dx, dy = agent.actions[3]
+    assert robot.position == (start[0] + 2 * dx, start[1] + 2 * dy)
+    robot.position = (start[0] - 200, start[1] - 200)
+    moved = robot.position
+    agent.act_fleet([robot])  # A state it never learned: stay on the planned path
+    assert robot.position == moved
+    assert agent.inference_stats['decisions'] == 2 and agent.inference_stats['fallbacks'] == 1
+    assert len(table) == size  # Inference never adds states
+
+    agent.unfreeze_policy()
+    assert not agent.inference_mode and agent.greedy_policy == {}
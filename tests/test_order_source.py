@@ -0,0 +1,63 @@
+import json
+import socket
+from src.warehouse import WarehouseGenerator
+from src.order import Order_Queue
+from src.order_source import parse_order_record, File_Order_Source, Socket_Order_Source
+
+def test_parse_order_record_accepts_csv_and_json_fields():
+    assert parse_order_record({'tick': '5', 'items': 'Milk; Bread;', 'checkout': '', 'checkouts': '0;2'}) == \
+        {'items': ['Milk', 'Bread'], 'checkout': None, 'checkouts': [0, 2], 'tick': 5}
+    assert parse_order_record({'items': ['Soap'], 'checkout': 1}) == \
+        {'items': ['Soap'], 'checkout': 1, 'checkouts': None, 'tick': 0}
+
+def test_file_source_releases_records_by_tick(tmp_path):
+    path = tmp_path / 'orders.csv'
+    path.write_text("tick,items,checkout\n0,Milk;Bread,1\n0,Soap,0\n10,Eggs,2\n")
+    source = File_Order_Source(str(path))
+    assert [order['items'] for order in source.poll(0, 1)] == [['Milk', 'Bread']]
+    assert [order['items'] for order in source.poll(5, 10)] == [['Soap']]
+    assert not source.exhausted
+    assert [order['checkout'] for order in source.poll(10, 10)] == [2]
+    assert source.exhausted
+
+def test_looping_file_source_shifts_ticks(tmp_path):
+    path = tmp_path / 'orders.jsonl'
+    path.write_text(json.dumps({'tick': 0, 'items': ['Milk']}) + "\n" + json.dumps({'tick': 3, 'items': ['Soap']}) + "\n")
+    source = File_Order_Source(str(path), loop=True)
+    assert len(source.poll(3, 10)) == 2
+    assert source.poll(4, 10)[0]['items'] == ['Milk']
+    assert source.poll(6, 10) == [] and source.poll(7, 10)[0]['items'] == ['Soap']
+
+def test_ingest_stops_at_the_queue_bound(tmp_path):
+    path = tmp_path / 'orders.jsonl'
+    path.write_text("".join(json.dumps({'items': ['Milk', 'Nope']}) + "\n" for _ in range(5)))
+    warehouse = WarehouseGenerator(seed=1, max_pending_orders=3)
+    source = File_Order_Source(str(path))
+    accepted = warehouse.order_allocator.ingest_orders(source)
+    assert [order['items'] for order in accepted] == [['Milk']] * 3
+    assert len(source.records) == 2  # Left with the source rather than dropped
+    assert warehouse.order_queue.rejected_count == 0
+
+def test_order_queue_indexes_by_status():
+    queue = Order_Queue(capacity=2)
+    orders = [{'id': i, 'status': 'pending'} for i in range(3)]
+    assert queue.append(orders[0]) and queue.append(orders[1])
+    assert not queue.append(orders[2]) and queue.rejected_count == 1
+    queue.mark(orders[0], 'assigned')
+    assert queue.pending() == [orders[1]] and queue.free_slots() == 1
+    queue.mark(orders[0], 'completed')
+    assert len(queue) == 1 and queue.completed_count == 1
+
+def test_socket_source_buffers_json_lines():
+    source = Socket_Order_Source(max_buffered=2)
+    try:
+        with socket.create_connection(source.address) as client:
+            client.sendall(b'{"items": ["Milk"]}\nnot json\n{"items": ["Soap"]}\n{"items": ["Eggs"]}\n')
+            orders = []
+            for _ in range(100):
+                orders += source.poll(0, 10)
+                if len(orders) == 3:
+                    break
+        assert [order['items'] for order in orders] == [['Milk'], ['Soap'], ['Eggs']]
+    finally:
+        source.close()
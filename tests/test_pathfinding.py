@@ -0,0 +1,60 @@
+import random
+import numpy as np
+from src.warehouse import WarehouseGenerator
+
+def square_gaps(warehouse, radius):
+    # Distance from each cell centre to the nearest blocked cell square, by brute force
+    size = warehouse.grid_size
+    blocked = np.argwhere(~warehouse.navigation_grid)
+    cells = np.argwhere(np.ones_like(warehouse.navigation_grid))
+    gap = np.maximum(np.abs(cells[:, None, :] - blocked[None, :, :]) - 0.5, 0) * size
+    return np.hypot(gap[..., 0], gap[..., 1]).min(axis=1).reshape(warehouse.navigation_grid.shape)
+
+def test_cspace_grid_keeps_the_robot_footprint_clear():
+    warehouse = WarehouseGenerator(seed=1)
+    pathfinding = warehouse.pathfinding
+    for radius in (0, 5, 10, 17):
+        grid = pathfinding.get_cspace_grid(radius)
+        expected = warehouse.navigation_grid if radius == 0 else square_gaps(warehouse, radius) >= radius
+        assert (grid == expected).all()
+
+def test_paths_stay_on_the_cspace_grid():
+    warehouse = WarehouseGenerator(seed=2)
+    pathfinding = warehouse.pathfinding
+    grid = pathfinding.get_cspace_grid()
+    free = np.argwhere(grid)
+    rng = random.Random(0)
+    for _ in range(30):
+        (y1, x1), (y2, x2) = free[rng.randrange(len(free))], free[rng.randrange(len(free))]
+        path = pathfinding.find_path(pathfinding._cell_center((x1, y1)), pathfinding._cell_center((x2, y2)))
+        assert path
+        cells = [(int(x // warehouse.grid_size), int(y // warehouse.grid_size)) for x, y in path]
+        assert all(grid[y, x] for x, y in cells)
+        assert all(max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1 for a, b in zip(cells, cells[1:]))
+
+def test_paths_route_around_recorded_traffic():
+    warehouse = WarehouseGenerator(seed=1, num_obstacles=0)
+    pathfinding = warehouse.pathfinding
+    start, end = (100, 530), (700, 530)
+    base = pathfinding.find_path(start, end)
+    hot = np.array(base[len(base) // 3:2 * len(base) // 3], dtype=float)
+    for _ in range(pathfinding.traffic_interval - 1):
+        pathfinding.record_traffic(hot)
+    assert pathfinding.traffic_cost is None  # Folded in once per interval
+    pathfinding.record_traffic(hot)
+    assert pathfinding.traffic_epoch == 1 and pathfinding.traffic_cost.max() == pathfinding.traffic_weight
+
+    detour = pathfinding.find_path(start, end)
+    hot_cells = {(int(x // 10), int(y // 10)) for x, y in hot}
+    assert not any((int(x // 10), int(y // 10)) in hot_cells for x, y in detour)
+    assert pathfinding.path_cost(detour) < pathfinding.path_cost(base)
+
+    pathfinding.clear_traffic()
+    assert pathfinding.path_cost(pathfinding.find_path(start, end)) == pathfinding.path_cost(base)
+
+def test_collisions_heat_their_cell():
+    warehouse = WarehouseGenerator(seed=1)
+    pathfinding = warehouse.pathfinding
+    pathfinding.note_collision((105, 205))
+    pathfinding.record_traffic(np.zeros((0, 2)))
+    assert pathfinding.traffic_window[20, 10] == pathfinding.collision_heat
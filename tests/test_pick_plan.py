@@ -0,0 +1,20 @@
+from src.pick_plan import Pick_Plan
+
+def test_mark_along_keeps_picks_the_new_path_passes():
+    plan = Pick_Plan(['Milk', 'Bread', 'Soap'], [(100, 100), (100, 200), (400, 400)])
+    plan.mark_route([5, 10, 20], [(100, 100), (100, 200), (400, 400)])
+    path = [(100, 50), (105, 100), (105, 150), (105, 200), (300, 300)]
+    plan.mark_route([len(path) - 1], [(400, 400)])
+    plan.mark_along(path, 1)
+    assert plan.items_in(plan.picks_at(1)) == ['Milk']
+    assert plan.items_in(plan.picks_at(3)) == ['Bread']
+    assert plan.items_in(plan.picks_at(4)) == ['Soap']  # Only the final waypoint, as marked by the repath
+    assert sorted(plan.waypoint_picks) == [1, 3, 4]
+
+def test_mark_along_skips_collected_and_passed_picks():
+    plan = Pick_Plan(['Milk', 'Bread'], [(100, 100), (100, 200)])
+    plan.take(1)
+    path = [(100, 100), (100, 150), (100, 200)]
+    plan.mark_along(path, 1)
+    assert plan.picks_at(0) == 0
+    assert plan.items_in(plan.picks_at(2)) == ['Bread']
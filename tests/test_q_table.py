@@ -0,0 +1,54 @@
+import pickle
+import numpy as np
+from src.q_table import Shared_Q_Table, Robot_Q_Table
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+
+def test_offsets_correct_the_shared_value_per_robot():
+    shared = Shared_Q_Table(4)
+    first, second = Robot_Q_Table(shared, offsets=True, offset_rate=0.5), Robot_Q_Table(shared, offsets=True)
+    ids = shared.state_ids(['a', 'b'])
+    first.update(ids[:1], np.array([2]), np.array([1.0]), ids[1:], alpha=0.5, gamma=0.9)
+    assert shared.values[ids[0], 2] == 0.5  # The shared table takes the full step
+    assert first.rows(ids[:1])[0, 2] == 0.75  # Plus the robot's correction at offset_rate
+    assert second.rows(ids[:1])[0, 2] == 0.5
+    assert len(first.offset_rows) == 1 and not second.offset_rows
+
+def test_offsets_stay_within_their_bound():
+    shared = Shared_Q_Table(2)
+    robot = Robot_Q_Table(shared, offsets=True, max_offsets=3)
+    ids = shared.state_ids(list(range(10)))
+    robot.update(ids, np.zeros(10, dtype=np.int64), np.ones(10), ids, alpha=0.1, gamma=0.0)
+    assert len(robot.offset_rows) == 3 and len(robot.offset_values) == 3
+    assert (shared.values[ids, 0] == 0.1).all()
+
+def test_worker_deltas_merge_into_the_owner():
+    owner = Shared_Q_Table(2)
+    owner.set_value('a', 0, 1.0)
+    owner.checkpoint()
+    worker = pickle.loads(pickle.dumps(owner))
+    worker.set_value('a', 0, 1.5)
+    worker.set_value('b', 1, 2.0)
+    owner.set_value('c', 1, 3.0)
+    owner.merge(*worker.deltas())
+    assert owner['a'][0] == 1.5 and owner['b'][1] == 2.0 and owner['c'][1] == 3.0
+
+def test_shared_tables_with_offsets_survive_a_save_and_load(tmp_path):
+    path = str(tmp_path / 'q.txt')
+    warehouse = WarehouseGenerator(seed=1)
+    agent = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator, shared_q=True, robot_offsets=True)
+    rng = np.random.default_rng(0)
+    ids = agent.shared_q.state_ids([((i, i), (0, 1), 'collecting', (), ()) for i in range(20)])
+    for robot_id, table in agent.robot_q_tables.items():
+        actions = rng.integers(0, len(agent.actions), len(ids))
+        table.update(ids, actions, rng.random(len(ids)), ids[::-1], alpha=0.2, gamma=0.9)
+    agent.save_q_tables(path)
+
+    fresh = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator, shared_q=True, robot_offsets=True)
+    fresh.load_q_tables(path)
+    assert fresh.shared_q.states == agent.shared_q.states
+    assert np.allclose(fresh.shared_q.values[:len(ids)], agent.shared_q.values[:len(ids)])
+    for robot_id, table in agent.robot_q_tables.items():
+        loaded = fresh.robot_q_tables[robot_id]
+        assert set(loaded.offset_rows) == set(table.offset_rows)
+        assert np.allclose(loaded.rows(ids), table.rows(ids))
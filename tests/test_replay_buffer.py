@@ -0,0 +1,34 @@
+import numpy as np
+from src.replay_buffer import Replay_Buffer, Prioritized_Replay_Buffer, Sum_Tree
+
+def test_ring_buffer_overwrites_oldest():
+    buffer = Replay_Buffer(capacity=4)
+    buffer.add_batch(np.ones(6), np.arange(6), np.zeros(6), np.zeros(6), np.arange(6))
+    assert len(buffer) == 4
+    assert sorted(buffer.states.tolist()) == [2, 3, 4, 5]
+
+def test_sum_tree_matches_prefix_sums():
+    tree = Sum_Tree(10)
+    values = np.random.default_rng(1).random(10)
+    tree.set(np.arange(10), values)
+    tree.set([3, 3], [0.0, 0.0])  # Repeated indices keep the last value
+    values[3] = 0.0
+    assert np.isclose(tree.total, values.sum())
+    edges = np.cumsum(values)
+    targets = np.random.default_rng(2).random(1000) * values.sum()
+    assert (tree.find(targets) == np.searchsorted(edges, targets, side='right')).all()
+    assert 3 not in tree.find(np.linspace(0, values.sum(), 200))
+
+def test_prioritized_sampling_follows_priorities():
+    np.random.seed(0)
+    buffer = Prioritized_Replay_Buffer(capacity=8, alpha=1.0, beta=1.0, epsilon=0.0)
+    buffer.add_batch(np.ones(4), np.arange(4), np.zeros(4), np.zeros(4), np.arange(4))
+    buffer.update_priorities(np.arange(4), np.array([1.0, 2.0, 3.0, 4.0]))
+    counts = np.zeros(4)
+    for _ in range(500):
+        indices, weights = buffer.sample(20)
+        assert indices.max() < len(buffer)
+        counts += np.bincount(indices, minlength=4)
+    assert np.allclose(counts / counts.sum(), [0.1, 0.2, 0.3, 0.4], atol=0.01)
+    _, weights = buffer.sample(4)
+    assert weights.max() == 1.0
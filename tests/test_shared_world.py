@@ -0,0 +1,48 @@
+import pickle
+import multiprocessing
+import pytest
+import numpy as np
+from src.warehouse import WarehouseGenerator
+from src.pathfinding import Pathfinding
+from src.shared_world import Shared_World
+
+def blocked_cells(handle):
+    world = Shared_World.attach(handle)
+    try:
+        return int((~world.navigation_grid).sum()), world.product_names[-1]
+    finally:
+        world.close()
+
+def test_worker_processes_read_the_published_world():
+    warehouse = WarehouseGenerator(seed=1)
+    world = Shared_World.create(warehouse)
+    try:
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(blocked_cells, (world.handle,))
+        assert result == (int((~warehouse.navigation_grid).sum()), warehouse.product_names[-1])
+    finally:
+        world.close()
+
+def test_workers_attach_to_the_same_world_and_owner_unlinks_it():
+    warehouse = WarehouseGenerator(seed=1, num_products=500)
+    world = Shared_World.create(warehouse)
+    handle = pickle.loads(pickle.dumps(world.handle))
+    assert len(pickle.dumps(world.handle)) < 4096
+    worker = Shared_World.attach(handle)
+    try:
+        assert (worker.navigation_grid == warehouse.navigation_grid).all()
+        assert not worker.navigation_grid.flags.writeable
+        assert worker.products == warehouse.products
+        assert worker.shelf_to_coord == warehouse.shelf_to_coord
+        coords = worker.product_coords([warehouse.product_names[0], 'Nope'])
+        assert tuple(coords[0]) == warehouse.shelf_to_coord[warehouse.products[warehouse.product_names[0]]]
+        assert np.isnan(coords[1]).all()
+        path = Pathfinding(worker).find_path((100, 530), (700, 100))
+        assert path == warehouse.pathfinding.find_path((100, 530), (700, 100))
+    finally:
+        worker.close()
+        assert not hasattr(worker, 'navigation_grid')
+    assert world.navigation_grid[0, 0] == warehouse.navigation_grid[0, 0]  # Still mapped by the owner
+    world.close()
+    with pytest.raises(FileNotFoundError):
+        Shared_World.attach(handle)
@@ -0,0 +1,41 @@
+from collections import Counter
+from src.warehouse import WarehouseGenerator
+
+def skewed_world(seed=1):
+    warehouse = WarehouseGenerator(seed=seed)
+    slotting = warehouse.slotting
+    hot = warehouse.product_names[-4:]  # Picked far more often than the rest
+    for i in range(200):
+        slotting.record_order({'items': hot[:2] if i % 2 else hot[2:] + [warehouse.product_names[i % 90]]})
+    return warehouse, slotting, hot
+
+def test_proposal_moves_frequent_picks_closer_and_keeps_slot_counts():
+    warehouse, slotting, hot = skewed_world()
+    proposal = slotting.optimize(iterations=5000)
+    mapping = proposal['mapping']
+    distances = slotting.slot_distances()
+    assert proposal['moves'] > 0
+    assert proposal['proposed_cost'] < proposal['current_cost']
+    assert abs(proposal['proposed_cost'] - slotting.cost(mapping, distances, 0.5)) < 1e-6
+    assert proposal['travel_saved_per_order'] > 0
+    assert sum(distances[mapping[item]] for item in hot) < sum(distances[warehouse.products[item]] for item in hot)
+    assert Counter(mapping.values()) == Counter(warehouse.products.values())
+    assert slotting.optimize(iterations=5000) == proposal  # Seeded from the warehouse
+
+def test_apply_moves_products_and_relabels_shelves():
+    warehouse, slotting, hot = skewed_world()
+    warehouse.static_surface = object()
+    version = warehouse.slotting_version
+    proposal = slotting.optimize(iterations=5000)
+    assert slotting.apply(proposal) == proposal['moves']
+    assert warehouse.products == proposal['mapping']
+    assert warehouse.slotting_version == version + 1
+    assert warehouse.static_surface is None
+    for slot, name in warehouse.shelf_labels.items():
+        assert warehouse.products[name] == slot
+    order = warehouse.order_allocator.create_order(hot[:1])
+    robot = warehouse.robots[0]
+    robot.order_queue.append(order)
+    warehouse.order_queue.append(order)
+    warehouse.step()
+    assert robot.pick_plan.remaining_coords() == [warehouse.shelf_to_coord[proposal['mapping'][hot[0]]]]
@@ -0,0 +1,29 @@
+import pytest
+from src.warehouse import WarehouseGenerator
+from src.snapshot import snapshot, restore
+
+def warmed_up(seed, ticks=700, orders=6):
+    warehouse = WarehouseGenerator(seed=seed)
+    for _ in range(orders):
+        warehouse.submit_order(warehouse.order_allocator.generate_order())
+    for _ in range(ticks):
+        warehouse.step()
+    return warehouse
+
+@pytest.mark.parametrize('seed', [5, 1, 2])
+def test_restored_copy_steps_in_lockstep(seed):
+    original = warmed_up(seed)
+    copy = restore(snapshot(original), WarehouseGenerator)
+    for tick in range(1000):
+        original.step()
+        copy.step()
+        assert [robot.position for robot in copy.robots] == [robot.position for robot in original.robots], f"diverged at tick {tick}"
+        assert [robot.state for robot in copy.robots] == [robot.state for robot in original.robots], f"diverged at tick {tick}"
+
+def test_restore_keeps_traffic_heatmap():
+    original = warmed_up(1, ticks=200)
+    copy = restore(snapshot(original, compress=True), WarehouseGenerator)
+    assert (copy.pathfinding.traffic_heat == original.pathfinding.traffic_heat).all()
+    assert (copy.pathfinding.traffic_window == original.pathfinding.traffic_window).all()
+    assert copy.pathfinding.traffic_ticks == original.pathfinding.traffic_ticks
+    assert copy.pathfinding.traffic_epoch == original.pathfinding.traffic_epoch
@@ -0,0 +1,41 @@
+import numpy as np
+from src.tile_coding import Tile_Coded_Q
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+
+def make_state(cell, robots=()):
+    return (cell, (1, 0), 'collecting', ((3, 3),), robots)
+
+def test_updates_generalise_to_unseen_states():
+    model = Tile_Coded_Q(4)
+    seen, unseen = make_state((5, 5)), make_state((5, 5), robots=((-20, 20),))
+    ids = model.state_ids([seen])
+    for _ in range(50):
+        model.update(ids, np.array([1]), np.array([1.0]), ids, alpha=0.5, gamma=0.0)
+    assert abs(model[seen][1] - 1.0) < 0.05
+    assert np.isclose(model.estimate(unseen)[1], model[seen][1] * 5 / 7)  # Shares all but the two robot groups
+    assert model.estimate(((40, 40), (-1, 1), 'idle', (), ()))[1] == 0.0
+    assert np.allclose(model.estimate(seen), model.rows(ids)[0])
+
+def test_memory_stays_fixed_as_states_are_visited():
+    model = Tile_Coded_Q(4, memory_size=1024, cache_size=8)
+    states = [make_state((x, y)) for x in range(10) for y in range(10)]
+    ids = model.state_ids(states)
+    assert ids.max() < 8 and len(model) == 8 and len(model.slot_of) == 8
+    assert model.weights.shape == (1024, 4)
+    assert model.state_id(states[-1], add=False) == ids[-1]
+    assert model.state_id(states[0], add=False) == -1  # Its slot went to a newer state
+
+def test_tile_weights_survive_a_save_and_load(tmp_path):
+    path = str(tmp_path / 'tiles.npz')
+    warehouse = WarehouseGenerator(seed=1)
+    agent = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator, shared_q=True, value_backend='tiles')
+    assert all(table is agent.shared_q for table in agent.robot_q_tables.values())
+    agent.shared_q.weights[:] = np.random.default_rng(0).random(agent.shared_q.weights.shape)
+    agent.save_q_tables(path)
+
+    fresh = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator, shared_q=True, value_backend='tiles')
+    fresh.load_q_tables(path)
+    assert (fresh.shared_q.weights == agent.shared_q.weights).all()
+    state = make_state((7, 3))
+    assert (fresh.robot_q_tables[2][state] == agent.robot_q_tables[1][state]).all()
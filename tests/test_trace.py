@@ -0,0 +1,40 @@
+from src.warehouse import WarehouseGenerator
+from src.trace import Trace_Reader, replay_trace
+
+def test_replay_follows_the_recorded_run(tmp_path):
+    filename = str(tmp_path / 'run.trace')
+    warehouse = WarehouseGenerator(seed=1)
+    warehouse.run_headless(1500, record_file=filename)
+    reader = Trace_Reader(filename)
+    assert reader.last_tick == 1500
+    assert len(reader.orders) > 0
+
+    result = replay_trace(filename, WarehouseGenerator)
+    assert result['divergence_tick'] is None
+    assert result['ticks'] == reader.last_tick
+    replayed = result['warehouse']
+    assert replayed.order_queue.completed_count == warehouse.order_queue.completed_count
+    assert [robot.state for robot in replayed.robots] == [robot.state for robot in warehouse.robots]
+
+def test_replay_restores_random_streams(tmp_path):
+    from src.obstacle_avoid import Obstacle_Avoidance
+    filename = str(tmp_path / 'run.trace')
+    warehouse = WarehouseGenerator(seed=3, max_pending_orders=2)  # Some generated orders are dropped
+    agent = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator)
+    for _ in range(5):
+        warehouse.order_allocator.generate_order()  # Draws made before recording starts
+    warehouse.run_headless(800, use_rl=True, rl_agent=agent, record_file=filename)
+
+    replayed_world = WarehouseGenerator(seed=3)
+    replay_agent = Obstacle_Avoidance(replayed_world, replayed_world.robots, replayed_world.order_allocator)
+    result = replay_trace(filename, WarehouseGenerator, use_rl=True, rl_agent=replay_agent)
+    assert result['divergence_tick'] is None  # Exploration draws line up with the recorded run
+    assert result['warehouse'].order_allocator.next_order_id == warehouse.order_allocator.next_order_id
+
+def test_replay_uses_the_recorded_planning_budget(tmp_path):
+    filename = str(tmp_path / 'run.trace')
+    warehouse = WarehouseGenerator(seed=1)
+    warehouse.planning_budget_ms = 2.0
+    warehouse.run_headless(50, record_file=filename)
+    assert Trace_Reader(filename).header['planning_budget_ms'] == 2.0
+    assert replay_trace(filename, WarehouseGenerator)['warehouse'].planning_budget_ms == 2.0
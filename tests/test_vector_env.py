@@ -0,0 +1,34 @@
+import random
+import numpy as np
+from src.warehouse import WarehouseGenerator
+from src.obstacle_avoid import Obstacle_Avoidance
+from src.vector_env import Batched_Obstacle_Avoidance
+
+def test_cost_to_go_matches_a_star():
+    warehouse = WarehouseGenerator(seed=1)
+    pathfinding = warehouse.pathfinding
+    goals = sorted(set(warehouse.shelf_to_coord.values()))[:6]
+    fields = pathfinding.cost_to_go(goals)
+    grid = pathfinding.get_cspace_grid()
+    rng = random.Random(0)
+    free = np.argwhere(grid)
+    for _ in range(20):
+        y, x = free[rng.randrange(len(free))]
+        start = pathfinding._cell_center((int(x), int(y)))
+        k = rng.randrange(len(goals))
+        path = pathfinding.descend(fields[k], start)
+        expected = pathfinding.find_path(start, goals[k])
+        assert path is not None
+        assert abs(pathfinding.path_cost(path) - pathfinding.path_cost(expected)) < 1e-6
+        for point in path:
+            assert grid[int(point[1] // warehouse.grid_size), int(point[0] // warehouse.grid_size)]
+
+def test_batched_env_plans_without_searching():
+    warehouse = WarehouseGenerator(seed=1)
+    agent = Obstacle_Avoidance(warehouse, warehouse.robots, warehouse.order_allocator)
+    env = Batched_Obstacle_Avoidance(agent, num_envs=4, max_steps=100)
+    for _ in range(200):
+        env.step()
+    assert env.samples > 0 and env.finished_episodes
+    assert len(warehouse.pathfinding.path_cache) == 0  # Every leg came off the goal fields
+    assert len(env.state_cache) <= sum(len(table) for table in agent.robot_q_tables.values())
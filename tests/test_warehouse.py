@@ -0,0 +1,111 @@
+import math
+import numpy as np
+from src.warehouse import WarehouseGenerator
+
+def test_layout_fleet_and_catalog_scale_with_parameters():
+    warehouse = WarehouseGenerator(seed=1, num_robots=40, num_checkouts=5, num_zones=2, num_products=500)
+    assert len(warehouse.robots) == 40 and [robot.id for robot in warehouse.robots] == list(range(1, 41))
+    assert len({robot.position for robot in warehouse.robots}) == 40
+    assert len(warehouse.checkouts) == 5
+    assert len(warehouse.aisles) == 2 * warehouse.num_aisles
+    assert len(warehouse.shelf_to_coord) == 2 * warehouse.num_aisles * 2 * warehouse.shelves_per_aisle
+    assert len(warehouse.products) == 500
+    assert set(warehouse.products.values()) <= set(warehouse.shelf_to_coord)
+
+def test_default_catalog_fills_one_aisle_per_category():
+    warehouse = WarehouseGenerator(seed=1)
+    assert warehouse.products['Milk'] == (1, 1)
+    assert warehouse.products['Apples'] == (2, 1)
+    assert warehouse.aisle_names[1] == 'Dairy & Bakery'
+
+def test_catalog_file_keeps_fixed_slots(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    path.write_text("name,category,aisle,shelf\nWidget,Tools,3,4\nGadget,Tools,,\n")
+    warehouse = WarehouseGenerator(seed=1, catalog_file=str(path))
+    assert warehouse.products == {'Widget': (3, 4), 'Gadget': (5, 1)}  # Unslotted entries spread over the layout
+
+def test_spatial_hash_finds_the_same_neighbours_as_a_scan():
+    warehouse = WarehouseGenerator(seed=1, num_robots=60, num_checkouts=6)
+    warehouse.index_robots()
+    assert warehouse.robot_index is not None
+    for robot in warehouse.robots:
+        expected = {other.id for other in warehouse.robots
+                    if other.id != robot.id and math.dist(robot.position, other.position) < 60}
+        found = {other.id for other in warehouse.nearby_robots(robot.position, 60, robot.id)}
+        assert found == expected
+
+def per_cell_grid(warehouse, rects):
+    # The cell-by-cell loop create_warehouse used before rasterising by slices
+    grid = np.ones((warehouse.grid_height, warehouse.grid_width), dtype=bool)
+    size = warehouse.grid_size
+    for rect in rects:
+        x1, y1 = rect.left // size, rect.top // size
+        x2, y2 = rect.right // size, rect.bottom // size
+        for x in range(max(0, x1), min(warehouse.grid_width, x2 + 1)):
+            for y in range(max(0, y1), min(warehouse.grid_height, y2 + 1)):
+                grid[y, x] = False
+    return grid
+
+def test_rasterized_grid_matches_the_per_cell_loop():
+    for kwargs in ({}, {'num_zones': 3, 'num_checkouts': 7}, {'width': 1234, 'height': 987, 'num_aisles': 13}):
+        warehouse = WarehouseGenerator(seed=1, **kwargs)
+        expected = per_cell_grid(warehouse, warehouse.blocking_rects())
+        assert (warehouse.navigation_grid == expected).all()
+
+def test_obstacles_stay_clear_of_the_fixed_layout():
+    warehouse = WarehouseGenerator(seed=3, num_obstacles=200)
+    assert len(warehouse.obstacles) == 200
+    fixed = warehouse.shelves + warehouse.checkouts + warehouse.chargers + warehouse.aisles
+    for obstacle in warehouse.obstacles:
+        assert not any(obstacle.colliderect(rect) for rect in fixed)
+        assert 50 <= obstacle.centerx <= warehouse.width - 50 and 50 <= obstacle.centery <= warehouse.height - 50
+
+def test_layout_edits_patch_the_cspace_grid_in_place():
+    warehouse = WarehouseGenerator(seed=1, num_obstacles=0)
+    pathfinding = warehouse.pathfinding
+    before = pathfinding.get_cspace_grid()
+    free = np.argwhere(before)
+    y, x = free[len(free) // 2]
+    rect = warehouse.add_obstacle((x * 10 + 2, y * 10 + 2, 6, 6))
+    patched = pathfinding.get_cspace_grid()
+    assert not patched[y, x] and patched.sum() < before.sum()
+    pathfinding.clear_caches()
+    assert (pathfinding.get_cspace_grid() == patched).all()  # Same as a full re-dilation
+    warehouse.remove_obstacle(rect)
+    assert (pathfinding.get_cspace_grid() == before).all()
+
+def test_blocking_edit_drops_only_the_paths_it_crosses():
+    warehouse = WarehouseGenerator(seed=1, num_obstacles=0)
+    pathfinding = warehouse.pathfinding
+    crossing = pathfinding.find_path((100, 530), (700, 530))
+    elsewhere = pathfinding.find_path((215, 100), (215, 200))
+    assert len(pathfinding.path_cache) == 2
+    x, y = crossing[len(crossing) // 2]
+    version = warehouse.grid_version
+    rect = warehouse.add_obstacle((x - 5, y - 5, 10, 10))
+    assert warehouse.grid_version == version + 1
+    assert len(pathfinding.path_cache) == 1
+    assert pathfinding.find_path((215, 100), (215, 200)) == elsewhere
+    warehouse.remove_obstacle(rect)  # Opened cells may shorten any route
+    assert len(pathfinding.path_cache) == 0
+
+def test_robots_replan_around_a_new_obstacle():
+    warehouse = WarehouseGenerator(seed=1, num_obstacles=0)
+    robot = warehouse.robots[0]
+    robot.state = 'checkout'
+    robot.current_path = robot.route_to((700, 530))
+    robot.target_index = 0
+    x, y = robot.current_path[len(robot.current_path) // 2]
+    rect = warehouse.add_obstacle((x - 5, y - 5, 10, 10))
+    assert robot.current_path[-1] == (705, 535)
+    assert not any(rect.collidepoint(point) for point in robot.current_path)
+    assert warehouse.metrics.counters['repaths'].value == 1
+
+def test_closing_an_aisle_blocks_it_until_reopened():
+    warehouse = WarehouseGenerator(seed=1, num_obstacles=0)
+    grid = warehouse.navigation_grid.copy()
+    warehouse.close_aisle(2)
+    rows, cols = warehouse.rect_cells(warehouse.aisles[2])
+    assert not warehouse.navigation_grid[rows, cols].any()
+    warehouse.open_aisle(2)
+    assert (warehouse.navigation_grid == grid).all()